@@ -1,9 +1,30 @@
 from flask import Flask
+from app.config import Config
 
-def create_app():
+def create_app(config_object=Config):
     app = Flask(__name__)
+    app.config.from_object(config_object)
+    
+    from app.utils.logger import setup_logger
+    setup_logger(level=app.config['LOG_LEVEL'], log_file=app.config['LOG_FILE'])
     
     from app.routes import main_bp
     app.register_blueprint(main_bp)
     
-    return app 
\ No newline at end of file
+    from app.jobs import init_job_manager
+    init_job_manager(app)
+    
+    from app.video_cache import init_video_cache
+    init_video_cache(app)
+    
+    if app.config['RIFE_PRELOAD']:
+        from app.rife_service import init_rife_service
+        init_rife_service(app)
+    
+    from app.tile_proxy import init_tile_proxy
+    init_tile_proxy(app)
+    
+    from app.metrics import init_metrics
+    init_metrics(app)
+    
+    return app
@@ -1,7 +1,105 @@
+import os
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class Config:
     WMS_URL = "https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi"
     WMS_LAYER = "MODIS_Terra_CorrectedReflectance_TrueColor"
+    RIFE_WMS_LAYER = "VIIRS_SNPP_CorrectedReflectance_TrueColor"
     DEFAULT_BBOX = (-180, -90, 180, 90)
     DEFAULT_SIZE = (800, 600)
     INTERPOLATION_FRAMES = 7
-    VIDEO_FPS = 30 
\ No newline at end of file
+    VIDEO_FPS = 30
+
+    # Seconds before parsed GetCapabilities documents are refreshed in the background
+    WMS_CAPABILITIES_TTL = 6 * 60 * 60
+
+    # Concurrent GetMap fetching
+    WMS_FETCH_WORKERS = 8
+    WMS_MAX_CONNECTIONS_PER_HOST = 6
+    WMS_FETCH_RETRIES = 3
+    WMS_RETRY_BACKOFF = 0.5  # seconds, doubled on every retry
+    WMS_REQUEST_TIMEOUT = 30  # seconds
+    WMS_DAY_WORKERS = 4  # Days of a multi-day range fetched at once, sharing WMS_FETCH_WORKERS
+
+    # Two-tier cache of fetched GetMap rasters
+    RASTER_CACHE_DIR = os.path.join(PROJECT_ROOT, 'cache', 'rasters')
+    RASTER_CACHE_MEMORY_BYTES = 256 * 1024 * 1024
+    RASTER_CACHE_DISK_BYTES = 4 * 1024 * 1024 * 1024
+    # Seconds rasters and rendered videos covering today are reused; GIBS is still filling them in
+    RECENT_IMAGERY_MAX_AGE = 30 * 60
+
+    # Caching proxy for the map's WMS tiles (/wms); static layers are cached without expiry
+    TILE_CACHE_DIR = os.path.join(PROJECT_ROOT, 'cache', 'tiles')
+    TILE_CACHE_MEMORY_BYTES = 64 * 1024 * 1024
+    TILE_CACHE_DISK_BYTES = 2 * 1024 * 1024 * 1024
+    TILE_STATIC_DISK_BYTES = 1024 * 1024 * 1024  # Static tiles never expire, but are still evicted LRU over this
+    TILE_STATIC_LAYERS = ('Coastlines_15m', 'Reference_Features_15m', 'Reference_Labels_15m')
+    TILE_MAX_AGE = 24 * 60 * 60  # Seconds browsers may reuse tiles of past dates
+    TILE_RECENT_MAX_AGE = 5 * 60  # Same for today's tiles, which GIBS still updates
+    TILE_MAX_SIZE = 1024
+    TILE_PREFETCH_DAYS = 2  # Following dates fetched while the date slider plays
+    TILE_PREFETCH_WORKERS = 4
+    TILE_PREFETCH_QUEUE = 256
+
+    # Build one enhancement lookup table per sequence instead of per frame
+    ENHANCE_SHARED_LUT = False
+
+    # Processes decoding and enhancing whole days of multi-day ranges; None uses every CPU
+    # (threads on a single CPU), 0 always enhances in threads
+    ENHANCE_PROCESSES = None
+
+    # Number of intermediate frames blended per vectorized batch
+    BLEND_CHUNK_SIZE = 8
+
+    # Identical frame pairs are held instead of interpolated; pairs whose downsampled
+    # PSNR (dB) reaches STATIC_PAIR_PSNR are blended linearly instead of run through RIFE
+    STATIC_PAIR_PSNR = 40.0  # None disables the static check
+    SIMILARITY_THUMBNAIL = 64  # Longest side of the downsampled copies
+
+    # Memory budget for one batch of RIFE warps (all timesteps of a pair)
+    RIFE_BATCH_MEMORY_MB = 512
+
+    # Memory budget for one IFNet pass; larger frames are estimated in overlapping tiles
+    RIFE_TILE_MEMORY_MB = 1024
+    RIFE_TILE_OVERLAP = 64  # Pixels, a multiple of 32 keeps tile origins aligned
+
+    # Default flow profile: 'quality' (full-resolution flow), 'balanced' or 'fast'
+    RIFE_FLOW_PROFILE = 'quality'
+
+    # RIFE model service
+    RIFE_WEIGHTS_DIR = os.path.join(PROJECT_ROOT, 'model', 'RIFE', 'train_log')
+    RIFE_PRELOAD = True  # Load and warm up the model in create_app
+    RIFE_BACKEND = 'torchscript'  # Or 'eager'
+    RIFE_PRECISION = 'fp32'  # 'bf16' or 'int8' trade a little accuracy for speed
+    RIFE_COMPILED_CACHE_DIR = os.path.join(PROJECT_ROOT, 'cache', 'rife')
+    TORCH_NUM_THREADS = None  # Defaults to the number of CPUs
+
+    # Items buffered between the stages of a render pipeline
+    PIPELINE_QUEUE_SIZE = 4
+
+    # Background video jobs
+    JOB_WORKERS = 2
+    JOB_MAX_PENDING = 32  # Queued + running jobs before new ones are rejected
+    JOB_TTL = 60 * 60  # Seconds finished jobs stay queryable
+
+    # Rendered videos, reused for identical requests and evicted LRU over the quota
+    VIDEO_DIR = os.path.join(PROJECT_ROOT, 'app', 'static', 'videos')
+    VIDEO_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+
+    # Video encoding: 'ffmpeg' pipes raw frames to ffmpeg, 'opencv' uses cv2.VideoWriter
+    VIDEO_ENCODER = 'auto'  # ffmpeg when installed, otherwise opencv
+    FFMPEG_BINARY = 'ffmpeg'
+    VIDEO_CODEC = 'libx264'  # Or libvpx / libvpx-vp9
+    VIDEO_PRESET = 'veryfast'
+    VIDEO_CRF = 23
+    VIDEO_ENCODER_THREADS = 0  # 0 lets ffmpeg pick
+
+    # Progressive delivery: publish renders as HLS fragmented MP4 segments while encoding (needs ffmpeg)
+    VIDEO_STREAMING = True
+    VIDEO_SEGMENT_SECONDS = 2
+    VIDEO_STREAM_TTL = 60 * 60  # Seconds streams of finished renders are kept for players still on them
+
+    # Logging; DEBUG also computes per-frame statistics, which is slow
+    LOG_LEVEL = 'INFO'
+    LOG_FILE = os.path.join(PROJECT_ROOT, 'app.log')  # None logs to the console only
@@ -0,0 +1,279 @@
+import contextvars
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from itertools import chain
+
+import cv2
+import numpy as np
+
+from .config import Config
+from .metrics import record_stage
+
+
+# ffmpeg raw input formats for frames as they come out of the pipeline, so
+# colour conversion happens inside ffmpeg's threaded scaler instead of per frame
+PIXEL_FORMATS = {1: 'gray', 3: 'rgb24', 4: 'rgba'}
+
+# x264 preset names mapped onto libvpx's speed setting
+VPX_CPU_USED = {
+    'ultrafast': 8, 'superfast': 7, 'veryfast': 6, 'faster': 5, 'fast': 4,
+    'medium': 3, 'slow': 2, 'slower': 1, 'veryslow': 0,
+}
+
+# Codecs tried in order when falling back to cv2.VideoWriter
+OPENCV_CODECS = ['avc1', 'mp4v', 'XVID']
+
+# Files of a progressive HLS stream, all inside one stream directory
+STREAM_PLAYLIST = 'index.m3u8'
+STREAM_INIT = 'init.mp4'
+STREAM_SEGMENTS = 'segment_%05d.m4s'
+
+# Stream directory for encodes in the current context, see stream_to
+_stream_dir = contextvars.ContextVar('stream_dir', default=None)
+
+
+def find_ffmpeg():
+    """Return the path of the ffmpeg binary, or None if it is not installed"""
+    return shutil.which(Config.FFMPEG_BINARY)
+
+
+def streaming_supported():
+    """Return True if encodes can be published progressively, which needs ffmpeg"""
+    return bool(Config.VIDEO_STREAMING and Config.VIDEO_ENCODER != 'opencv' and find_ffmpeg())
+
+
+@contextmanager
+def stream_to(stream_dir):
+    """
+    Publish videos encoded in the enclosed block as an HLS stream in ``stream_dir``
+
+    Lets a render that calls encode_video deep inside a fetcher or
+    interpolator stream its output without every layer passing the
+    directory along.
+    """
+    token = _stream_dir.set(stream_dir)
+    try:
+        yield stream_dir
+    finally:
+        _stream_dir.reset(token)
+
+
+def concat_stream(stream_dir, output_path):
+    """
+    Join the init and media segments of a finished stream into one fragmented MP4
+
+    Returns:
+        int: Number of media segments
+    """
+    with open(os.path.join(stream_dir, STREAM_PLAYLIST)) as f:
+        segments = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    with open(output_path, 'wb') as out:
+        for name in [STREAM_INIT] + segments:
+            with open(os.path.join(stream_dir, name), 'rb') as f:
+                shutil.copyfileobj(f, out)
+    return len(segments)
+
+
+def to_uint8(frame):
+    """Scale float frames in [0, 1] to uint8; uint8 frames are returned as-is"""
+    if frame.dtype == np.uint8:
+        return frame
+    return (np.clip(frame, 0, 1) * 255).astype(np.uint8)
+
+
+def pixel_format(frame):
+    """Return the ffmpeg pixel format matching a frame's channel layout"""
+    channels = 1 if frame.ndim == 2 else frame.shape[2]
+    try:
+        return PIXEL_FORMATS[channels]
+    except KeyError:
+        raise ValueError(f"Unsupported frame shape {frame.shape}")
+
+
+def ffmpeg_command(output_path, width, height, fps, pix_fmt, codec=None, preset=None,
+                   crf=None, threads=None, stream_dir=None, segment_seconds=None):
+    """
+    Build the ffmpeg command line that encodes raw frames read from stdin
+
+    Args:
+        output_path (str): Destination file
+        width, height (int): Frame size
+        fps (int): Frames per second
+        pix_fmt (str): Raw input pixel format, see ``pixel_format``
+        codec (str, optional): libx264, libvpx or libvpx-vp9, defaults to Config.VIDEO_CODEC
+        preset (str, optional): x264 preset name, defaults to Config.VIDEO_PRESET
+        crf (int, optional): Constant rate factor, defaults to Config.VIDEO_CRF
+        threads (int, optional): Encoder threads, 0 lets ffmpeg decide
+        stream_dir (str, optional): Write an HLS stream of fragmented MP4
+            segments here instead of ``output_path``
+        segment_seconds (float, optional): Stream segment length, defaults to
+            Config.VIDEO_SEGMENT_SECONDS
+
+    Returns:
+        list: Command arguments
+    """
+    codec = codec or Config.VIDEO_CODEC
+    preset = preset or Config.VIDEO_PRESET
+    crf = Config.VIDEO_CRF if crf is None else crf
+    threads = Config.VIDEO_ENCODER_THREADS if threads is None else threads
+
+    command = [
+        find_ffmpeg() or Config.FFMPEG_BINARY, '-y', '-loglevel', 'error', '-nostdin',
+        '-f', 'rawvideo', '-pix_fmt', pix_fmt, '-s', f'{width}x{height}', '-r', str(fps),
+        '-i', 'pipe:0',
+        # 4:2:0 chroma needs even dimensions
+        '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+        '-pix_fmt', 'yuv420p', '-c:v', codec, '-threads', str(threads),
+    ]
+    if codec.startswith('libvpx'):
+        command += ['-crf', str(crf), '-b:v', '0', '-deadline', 'good',
+                    '-cpu-used', str(VPX_CPU_USED.get(preset, 4)), '-row-mt', '1']
+    else:
+        command += ['-preset', preset, '-crf', str(crf)]
+    if stream_dir:
+        segment_seconds = segment_seconds or Config.VIDEO_SEGMENT_SECONDS
+        # The playlist is rewritten after every segment, so players can start
+        # on the first one while later frames are still being rendered
+        return command + [
+            # Every segment must start on a keyframe to be playable on its own
+            '-force_key_frames', f'expr:gte(t,n_forced*{segment_seconds})',
+            '-f', 'hls', '-hls_time', str(segment_seconds), '-hls_list_size', '0',
+            '-hls_playlist_type', 'event', '-hls_segment_type', 'fmp4',
+            '-hls_fmp4_init_filename', STREAM_INIT,
+            '-hls_segment_filename', os.path.join(stream_dir, STREAM_SEGMENTS),
+            '-hls_flags', 'independent_segments+temp_file',
+            os.path.join(stream_dir, STREAM_PLAYLIST),
+        ]
+    if output_path.endswith('.mp4'):
+        # Put the index first so browsers can start playback while downloading
+        command += ['-movflags', '+faststart']
+    return command + [output_path]
+
+
+def encode_video(frames, output_path, fps=30, backend=None, stream_dir=None, **options):
+    """
+    Encode frames into a video file
+
+    Frames are streamed straight into an ffmpeg subprocess when ffmpeg is
+    available, and written with cv2.VideoWriter otherwise. With a stream
+    directory, ffmpeg writes a growing HLS stream there and ``output_path``
+    becomes its segments joined into one fragmented MP4 once encoding ends.
+
+    Args:
+        frames (iterable): RGB(A) or grayscale frames, uint8 or float in [0, 1],
+            consumed one at a time
+        output_path (str): Path to save the video
+        fps (int): Frames per second
+        backend (str, optional): 'ffmpeg', 'opencv' or 'auto', defaults to Config.VIDEO_ENCODER
+        stream_dir (str, optional): Directory for the HLS stream, defaults to the
+            one set by stream_to; ignored by the opencv backend
+        **options: codec, preset, crf and threads for the ffmpeg backend
+
+    Returns:
+        int: Number of frames written
+    """
+    frames = iter(frames)
+    first_frame = next(frames, None)
+    if first_frame is None:
+        raise ValueError("No frames to create video from")
+    frames = chain([first_frame], frames)
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    backend = backend or Config.VIDEO_ENCODER
+    if backend == 'auto':
+        backend = 'ffmpeg' if find_ffmpeg() else 'opencv'
+    stream_dir = stream_dir or _stream_dir.get()
+    if backend == 'ffmpeg':
+        count = _encode_ffmpeg(frames, first_frame, output_path, fps, stream_dir, **options)
+    elif backend == 'opencv':
+        if stream_dir:
+            logging.info("Progressive streaming needs ffmpeg, writing the video only")
+        count = _encode_opencv(frames, first_frame, output_path, fps)
+    else:
+        raise ValueError(f"Unknown video encoder backend: {backend}")
+
+    if os.path.getsize(output_path) == 0:
+        raise RuntimeError("Output video file is empty")
+    logging.info(f"Wrote {count} frames to {output_path} with {backend}")
+    return count
+
+
+def _encode_ffmpeg(frames, first_frame, output_path, fps, stream_dir=None, **options):
+    height, width = first_frame.shape[:2]
+    pix_fmt = pixel_format(first_frame)
+    command = ffmpeg_command(output_path, width, height, fps, pix_fmt, stream_dir=stream_dir, **options)
+    if stream_dir:
+        os.makedirs(stream_dir, exist_ok=True)
+
+    # stderr goes to a file so a chatty encoder can never fill a pipe and stall
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=stderr)
+        count = 0
+        # Only time spent handing frames over counts as encoding, not producing them
+        elapsed = 0.0
+        try:
+            for frame in frames:
+                start = time.perf_counter()
+                frame = to_uint8(frame)
+                if frame.shape != first_frame.shape:
+                    raise ValueError(
+                        f"Frame {count} has shape {frame.shape}, expected {first_frame.shape}"
+                    )
+                process.stdin.write(np.ascontiguousarray(frame).data)
+                count += 1
+                elapsed += time.perf_counter() - start
+            start = time.perf_counter()
+            process.stdin.close()
+            returncode = process.wait()
+            elapsed += time.perf_counter() - start
+            record_stage('encode', elapsed, frames=count)
+        except BrokenPipeError:
+            returncode = process.wait()
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        if returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode('utf-8', 'replace').strip()
+            raise RuntimeError(f"ffmpeg exited with status {returncode}: {message}")
+    if stream_dir:
+        concat_stream(stream_dir, output_path)
+    return count
+
+
+def _encode_opencv(frames, first_frame, output_path, fps):
+    height, width = first_frame.shape[:2]
+    out = None
+    for codec in OPENCV_CODECS:
+        out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+        if out.isOpened():
+            break
+        logging.debug(f"OpenCV codec {codec} is unavailable")
+    if out is None or not out.isOpened():
+        raise RuntimeError("Failed to open video writer with any codec")
+
+    conversions = {1: cv2.COLOR_GRAY2BGR, 3: cv2.COLOR_RGB2BGR, 4: cv2.COLOR_RGBA2BGR}
+    count = 0
+    elapsed = 0.0
+    try:
+        for frame in frames:
+            start = time.perf_counter()
+            frame = to_uint8(frame)
+            channels = 1 if frame.ndim == 2 else frame.shape[2]
+            # VideoWriter only takes BGR, so this backend pays a conversion per frame
+            out.write(cv2.cvtColor(frame, conversions[channels]))
+            count += 1
+            elapsed += time.perf_counter() - start
+    finally:
+        out.release()
+    record_stage('encode', elapsed, frames=count)
+    return count
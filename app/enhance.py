@@ -0,0 +1,97 @@
+import threading
+
+import cv2
+import numpy as np
+
+
+def _to_uint8(img):
+    if img.dtype == np.uint8:
+        return img
+    if np.issubdtype(img.dtype, np.floating):
+        return (np.clip(img, 0, 1) * 255 + 0.5).astype(np.uint8)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def _color_channels(img):
+    """Number of leading channels to enhance; alpha is passed through untouched"""
+    if img.ndim == 2:
+        return 1
+    return 3 if img.shape[2] == 4 else img.shape[2]
+
+
+def build_enhancement_lut(img, low=2, high=98):
+    """
+    Build a 256-entry LUT equivalent to ``equalize_hist`` followed by a
+    ``low``/``high`` percentile contrast stretch
+    
+    Args:
+        img (numpy.ndarray): uint8 image, grayscale, RGB or RGBA
+        low (float): Lower percentile of the contrast stretch
+        high (float): Upper percentile of the contrast stretch
+    
+    Returns:
+        numpy.ndarray: uint8 lookup table of shape (256,)
+    """
+    img = _to_uint8(img)
+    channels = _color_channels(img)
+    planes = [img] if img.ndim == 2 else cv2.split(img)[:channels]
+    hist = sum(cv2.calcHist([plane], [0], None, [256], [0, 256]).ravel() for plane in planes)
+    cum_hist = np.cumsum(hist)
+    total = cum_hist[-1]
+    if total == 0:
+        return np.arange(256, dtype=np.uint8)
+
+    # Histogram equalization maps each value to its cumulative frequency
+    cdf = cum_hist / total
+
+    # Percentiles of the equalized image, interpolated like np.percentile
+    def percentile(q):
+        position = q / 100 * (total - 1)
+        below = int(np.floor(position))
+        above = min(below + 1, int(total) - 1)
+        value_below = cdf[np.searchsorted(cum_hist, below, side='right')]
+        value_above = cdf[np.searchsorted(cum_hist, above, side='right')]
+        return value_below + (value_above - value_below) * (position - below)
+
+    p_low, p_high = percentile(low), percentile(high)
+    if p_high > p_low:
+        stretched = np.clip((cdf - p_low) / (p_high - p_low), 0, 1)
+    else:
+        stretched = cdf
+    return (stretched * 255 + 0.5).astype(np.uint8)
+
+
+def apply_lut(img, lut):
+    """Apply a 256-entry LUT to the color channels of a uint8 image in one pass"""
+    img = _to_uint8(img)
+    if img.ndim == 3 and img.shape[2] == 4:
+        identity = np.arange(256, dtype=np.uint8)
+        lut = np.stack([lut, lut, lut, identity], axis=-1).reshape(1, 256, 4)
+    return cv2.LUT(img, lut)
+
+
+def enhance_image(img, lut=None):
+    """Enhance a single frame, building its LUT unless one is given"""
+    if lut is None:
+        lut = build_enhancement_lut(img)
+    return apply_lut(img, lut)
+
+
+class SequenceEnhancer:
+    """
+    Enhances the frames of a sequence, optionally sharing one LUT built from
+    the first frame so brightness stays consistent across the sequence.
+    """
+
+    def __init__(self, shared=False):
+        self.shared = shared
+        self.lut = None
+        self._lock = threading.Lock()
+
+    def __call__(self, img):
+        if not self.shared:
+            return enhance_image(img)
+        with self._lock:
+            if self.lut is None:
+                self.lut = build_enhancement_lut(img)
+        return apply_lut(img, self.lut)
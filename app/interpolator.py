@@ -3,12 +3,18 @@ import numpy as np
 import cv2
 import sys
 import os
+import logging
 
 # Add the project root to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from model.RIFE.model.RIFE import Model
 from PIL import Image
 import io
+from app.blend import iter_blend, linear_alphas
+from app.similarity import DUPLICATE, STATIC, classify_pair
+from app.encoder import encode_video
+from app.config import Config
+from app.metrics import span, timed
 
 class FrameInterpolator:
     def __init__(self):
@@ -26,107 +32,80 @@ class FrameInterpolator:
         Returns:
             list: List of interpolated frames
         """
-        total_frames = (len(images) - 1) * (n_frames + 1)
-        current_frame = 0
+        return list(self.iter_interpolate_sequence(images, n_frames, progress_callback))
+
+    def iter_interpolate_sequence(self, images, n_frames=7, progress_callback=None, total_images=None):
+        """
+        Lazily interpolate between each pair of consecutive images
         
-        interpolated_sequence = []
+        Args:
+            images (iterable): Images, consumed one at a time
+            n_frames (int): Number of frames to generate between each pair
+            progress_callback (function): Callback function to report progress
+            total_images (int, optional): Number of images, needed for progress
+                reporting when ``images`` has no length
         
-        for i in range(len(images) - 1):
-            img1 = images[i]
-            img2 = images[i + 1]
-            
-            interpolated_sequence.append(img1)
-            
-            for t in range(1, n_frames + 1):
-                progress = t / (n_frames + 1)
-                interpolated = cv2.addWeighted(img1, 1 - progress, img2, progress, 0)
-                interpolated_sequence.append(interpolated)
-            
-            if progress_callback:
-                progress = (current_frame / total_frames) * 100
-                progress_callback(progress)
-            current_frame += 1
+        Yields:
+            numpy.ndarray: Interpolated frames
+        """
+        if total_images is None and hasattr(images, '__len__'):
+            total_images = len(images)
+        total_pairs = (total_images or 1) - 1
+        pairs_done = 0
+        
+        img1 = None
+        for img2 in images:
+            if img1 is not None:
+                yield img1
+                
+                if classify_pair(img1, img2, check_static=False) == DUPLICATE:
+                    # Hold the frame instead of blending it with itself
+                    for _ in range(n_frames):
+                        yield img1
+                else:
+                    yield from iter_blend(img1, img2, linear_alphas(n_frames))
+                
+                pairs_done += 1
+                if progress_callback and total_pairs > 0:
+                    progress_callback(pairs_done / total_pairs * 100)
+            img1 = img2
         
-        interpolated_sequence.append(images[-1])
-        return interpolated_sequence
+        if img1 is not None:
+            yield img1
 
     def create_video(self, frames, output_path, fps=30):
         """
         Create video from frames
         
         Args:
-            frames (list): List of numpy arrays containing the frames
+            frames (iterable): Frames to encode, consumed one at a time
             output_path (str): Path to save the video
             fps (int): Frames per second
         """
-        if not frames:
-            raise ValueError("No frames to create video from")
-        
-        height, width = frames[0].shape[:2]
-        print(f"Creating video with dimensions: {width}x{height}, {len(frames)} frames")
-        
-        # Ensure output directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        try:
-            # Try different codecs in order of preference
-            codecs = ['mp4v', 'avc1', 'XVID']
-            out = None
-            
-            for codec in codecs:
-                try:
-                    fourcc = cv2.VideoWriter_fourcc(*codec)
-                    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-                    if out.isOpened():
-                        print(f"Successfully opened video writer with codec: {codec}")
-                        break
-                except Exception as e:
-                    print(f"Failed to use codec {codec}: {str(e)}")
-            
-            if not out or not out.isOpened():
-                raise Exception("Failed to open video writer with any codec")
-            
-            # Verify first frame
-            first_frame = frames[0]
-            if first_frame.max() <= 1.0:
-                first_frame = (first_frame * 255).astype(np.uint8)
-            
-            # Debug frame info
-            print(f"Frame shape: {first_frame.shape}, dtype: {first_frame.dtype}, range: [{first_frame.min()}, {first_frame.max()}]")
-            
-            for i, frame in enumerate(frames):
-                # Ensure frame is in correct format
-                if frame.dtype != np.uint8:
-                    frame = (frame * 255).astype(np.uint8)
-                
-                # Ensure frame is in BGR format for OpenCV
-                if frame.shape[-1] == 3:  # If RGB
-                    frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                
-                success = out.write(frame)
-                if not success:
-                    print(f"Failed to write frame {i}")
-            
-            # Verify video was created
-            if os.path.getsize(output_path) == 0:
-                raise Exception("Output video file is empty")
-            
-        finally:
-            if out:
-                out.release()
-            print(f"Video saved to {output_path}")
+        encode_video(frames, output_path, fps=fps)
+        logging.info(f"Video saved to {output_path}")
 
 class RIFEInterpolator:
-    def __init__(self):
+    def __init__(self, weights_dir=None):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model = Model()
-        # Initialize model weights here if needed
-        # self.model.load_state_dict(torch.load('path/to/weights.pth'))
+        weights_dir = weights_dir or Config.RIFE_WEIGHTS_DIR
+        if os.path.exists(os.path.join(weights_dir, 'flownet.pkl')):
+            self.model.load_model(weights_dir)
+            logging.info(f"Loaded RIFE weights from {weights_dir}")
+        else:
+            logging.warning(f"No RIFE weights found in {weights_dir}, using untrained model")
         self.model.eval()
         self.model.to_device()
 
-    def _preprocess_image(self, img):
-        """Convert image to torch tensor"""
+    def warm_up(self, size=(64, 64)):
+        """Run one small inference so lazy initialisation happens off the request path"""
+        img = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        with torch.no_grad():
+            self.model.inference(self._preprocess_image(img), self._preprocess_image(img))
+
+    def _to_rgb_uint8(self, img):
+        """Convert an image to 3-channel uint8 RGB"""
         # Convert image to uint8 if it's float
         if img.dtype == np.float64 or img.dtype == np.float32:
             img = (img * 255).astype(np.uint8)
@@ -138,7 +117,11 @@ class RIFEInterpolator:
             img = cv2.cvtColor(img, cv2.COLOR_RGBA2RGB)
         elif img.shape[2] != 3:
             raise ValueError(f"Unexpected number of channels: {img.shape[2]}")
-        
+        return img
+
+    def _preprocess_image(self, img):
+        """Convert image to torch tensor"""
+        img = self._to_rgb_uint8(img)
         img = torch.from_numpy(img).permute(2, 0, 1).float() / 255.0
         return img.unsqueeze(0).to(self.device)
 
@@ -146,13 +129,27 @@ class RIFEInterpolator:
         """Convert torch tensor back to numpy array"""
         return (tensor.squeeze(0).permute(1, 2, 0).cpu().numpy() * 255).astype(np.uint8)
 
-    def interpolate_frames(self, img1, img2, num_frames):
+    def _postprocess_batch(self, tensor):
+        """Convert a (N, C, H, W) torch tensor back to a list of numpy arrays"""
+        batch = (tensor.permute(0, 2, 3, 1).cpu().numpy() * 255).astype(np.uint8)
+        return list(batch)
+
+    def interpolate_frames(self, img1, img2, num_frames, flow_profile=None):
         """Generate intermediate frames between two images"""
-        print(f"Input image shapes: {img1.shape}, {img2.shape}")
+        return self.interpolate_prepared(self.prepare_pair(img1, img2), num_frames, flow_profile)
+
+    def prepare_pair(self, img1, img2):
+        """
+        Resize, convert and move a pair of images to the model device
+        
+        Returns:
+            tuple: (img1, img2, img1_tensor, img2_tensor) for interpolate_prepared
+        """
+        logging.debug(f"Input image shapes: {img1.shape}, {img2.shape}")
         
         # Preprocess images
         # Ensure images have the same size
-        if img1.shape != img2.shape:
+        if img1.shape[:2] != img2.shape[:2]:
             height = min(img1.shape[0], img2.shape[0])
             width = min(img1.shape[1], img2.shape[1])
             # Make dimensions divisible by 32
@@ -162,99 +159,76 @@ class RIFEInterpolator:
             img2 = cv2.resize(img2, (width, height))
         
         # Ensure images are in correct format
-        if img1.dtype != np.uint8:
-            img1 = (img1 * 255).astype(np.uint8)
-        if img2.dtype != np.uint8:
-            img2 = (img2 * 255).astype(np.uint8)
+        img1 = self._to_rgb_uint8(img1)
+        img2 = self._to_rgb_uint8(img2)
         
         img1_tensor = self._preprocess_image(img1)
         img2_tensor = self._preprocess_image(img2)
         
-        print(f"Preprocessed tensor shapes: {img1_tensor.shape}, {img2_tensor.shape}")
+        logging.debug(f"Preprocessed tensor shapes: {img1_tensor.shape}, {img2_tensor.shape}")
+        return img1, img2, img1_tensor, img2_tensor
+
+    def interpolate_prepared(self, pair, num_frames, flow_profile=None):
+        """
+        Generate intermediate frames for a pair returned by prepare_pair
+        
+        Args:
+            pair (tuple): Result of prepare_pair
+            num_frames (int): Number of intermediate frames
+            flow_profile (str, optional): 'fast', 'balanced' or 'quality',
+                defaults to Config.RIFE_FLOW_PROFILE
+        """
+        img1, img2, img1_tensor, img2_tensor = pair
+        
+        # Generate intermediate frames with non-linear timesteps
+        # Use smooth step function for better transitions
+        x = np.arange(1, num_frames + 1) / (num_frames + 1)
+        timesteps = x * x * (3 - 2 * x)  # Smooth step function
+        
+        # Identical pairs are held and visually unchanged ones blended, skipping the network
+        similarity = classify_pair(img1, img2)
+        if similarity == DUPLICATE:
+            return [img1] * (num_frames + 1) + [img2]
+        if similarity == STATIC:
+            return [img1] + list(iter_blend(img1, img2, timesteps)) + [img2]
         
         # Generate intermediate frames
         frames = []
         # Add first frame
         frames.append(img1)
         
-        # Generate intermediate frames with non-linear timesteps
-        for i in range(1, num_frames + 1):
-            # Use smooth step function for better transitions
-            x = i / (num_frames + 1)
-            t = x * x * (3 - 2 * x)  # Smooth step function
-            
-            with torch.no_grad():
-                middle = self.model.inference(img1_tensor, img2_tensor, timestep=t)
-                middle = self._postprocess_image(middle)
-                frames.append(middle)
+        with torch.no_grad():
+            # Flow does not depend on the timestep, so run the network once per pair
+            # Large frames are estimated in tiles that fit the memory budget
+            with span('flow'):
+                flow_state = self.model.estimate_flow_tiled(
+                    img1_tensor, img2_tensor,
+                    max_bytes=Config.RIFE_TILE_MEMORY_MB * 1024 * 1024,
+                    overlap=Config.RIFE_TILE_OVERLAP,
+                    profile=flow_profile or Config.RIFE_FLOW_PROFILE
+                )
+            
+            # Warp all timesteps in batches bounded by the memory budget
+            for batch in timed(self.model.iter_warp_blend(
+                flow_state, timesteps,
+                max_batch_bytes=Config.RIFE_BATCH_MEMORY_MB * 1024 * 1024
+            ), 'warp', frames=len):
+                frames.extend(self._postprocess_batch(batch))
         
         # Add last frame
         frames.append(img2)
         
-        # Verify frames
-        for i, frame in enumerate(frames):
-            if frame is None:
-                print(f"Frame {i} is None")
-            else:
-                print(f"Frame {i} shape: {frame.shape}, dtype: {frame.dtype}, range: [{frame.min()}, {frame.max()}]")
+        # Verify frames; min/max scan every pixel, so only in debug mode
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            for i, frame in enumerate(frames):
+                if frame is None:
+                    logging.debug(f"Frame {i} is None")
+                else:
+                    logging.debug(f"Frame {i} shape: {frame.shape}, dtype: {frame.dtype}, range: [{frame.min()}, {frame.max()}]")
         
         return frames
 
     def create_video(self, frames, output_path, fps=30):
         """Create video from frames"""
-        if not frames:
-            raise ValueError("No frames to create video from")
-        
-        height, width = frames[0].shape[:2]
-        print(f"Creating video with dimensions: {width}x{height}, {len(frames)} frames")
-        
-        # Ensure output directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        try:
-            # Try different codecs in order of preference
-            codecs = ['mp4v', 'avc1', 'XVID']
-            out = None
-            
-            for codec in codecs:
-                try:
-                    fourcc = cv2.VideoWriter_fourcc(*codec)
-                    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-                    if out.isOpened():
-                        print(f"Successfully opened video writer with codec: {codec}")
-                        break
-                except Exception as e:
-                    print(f"Failed to use codec {codec}: {str(e)}")
-            
-            if not out or not out.isOpened():
-                raise Exception("Failed to open video writer with any codec")
-            
-            # Verify first frame
-            first_frame = frames[0]
-            if first_frame.max() <= 1.0:
-                first_frame = (first_frame * 255).astype(np.uint8)
-            
-            # Debug frame info
-            print(f"Frame shape: {first_frame.shape}, dtype: {first_frame.dtype}, range: [{first_frame.min()}, {first_frame.max()}]")
-            
-            for i, frame in enumerate(frames):
-                # Ensure frame is in correct format
-                if frame.dtype != np.uint8:
-                    frame = (frame * 255).astype(np.uint8)
-                
-                # Ensure frame is in BGR format for OpenCV
-                if frame.shape[-1] == 3:  # If RGB
-                    frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                
-                success = out.write(frame)
-                if not success:
-                    print(f"Failed to write frame {i}")
-            
-            # Verify video was created
-            if os.path.getsize(output_path) == 0:
-                raise Exception("Output video file is empty")
-            
-        finally:
-            if out:
-                out.release()
-            print(f"Video saved to {output_path}") 
\ No newline at end of file
+        encode_video(frames, output_path, fps=fps)
+        logging.info(f"Video saved to {output_path}") 
\ No newline at end of file
@@ -0,0 +1,229 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from .config import Config
+from .metrics import job_timings, observe
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation has been requested"""
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already queued or running"""
+
+
+class Job:
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.state = Job.QUEUED
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.key = None
+        self.timings = {}  # Seconds per pipeline stage, filled in while running
+        self.stream_url = None  # Progressive HLS playlist, while and after rendering
+        self.attached = 1  # Requests sharing this job; the last one to cancel stops it
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.state in (Job.DONE, Job.FAILED, Job.CANCELLED)
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested"""
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def report_progress(self, percent):
+        """Progress callback for long-running stages; also a cancellation point"""
+        self.check_cancelled()
+        # 100% is reserved for when the job has actually finished
+        self.progress = max(self.progress, min(float(percent), 99.0))
+
+    def to_dict(self, timings=False):
+        """
+        JSON-able job status
+        
+        Args:
+            timings (bool): Include seconds spent per stage; stages running in
+                parallel overlap, so they can add up to more than the elapsed time
+        """
+        data = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'state': self.state,
+            'progress': round(self.progress, 1),
+        }
+        if self.stream_url:
+            data['stream_url'] = self.stream_url
+        if self.state == Job.DONE:
+            data.update(self.result or {})
+        if self.error:
+            data['error'] = self.error
+        if timings:
+            data['timings'] = {stage: round(seconds, 4) for stage, seconds in sorted(dict(self.timings).items())}
+        return data
+
+
+class JobManager:
+    """
+    Runs video jobs on a bounded worker pool.
+
+    Jobs are plain callables that receive their Job so they can report
+    progress and honour cancellation through ``job.report_progress``.
+    Jobs submitted with a ``key`` are single-flight: while one is queued or
+    running, submitting the same key returns the existing job. Each request
+    sharing a job has to cancel it before it actually stops.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, ttl=None):
+        self.max_pending = max_pending or Config.JOB_MAX_PENDING
+        self.ttl = Config.JOB_TTL if ttl is None else ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.JOB_WORKERS, thread_name_prefix='job'
+        )
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._inflight = {}
+
+    def submit(self, kind, fn, key=None):
+        """
+        Queue ``fn(job)`` and return its Job immediately
+        
+        Args:
+            kind (str): Job type reported to clients
+            fn (callable): Work to run, called with the Job
+            key (str, optional): Attach to an unfinished job with the same key
+                instead of starting a duplicate
+        
+        Raises:
+            JobQueueFull: If max_pending jobs are already queued or running
+        """
+        with self._lock:
+            self._prune()
+            if key is not None:
+                existing = self._inflight.get(key)
+                if existing is not None and not existing.finished and not existing.cancel_requested:
+                    existing.attached += 1
+                    return existing
+            active = sum(1 for job in self._jobs.values() if not job.finished)
+            if active >= self.max_pending:
+                raise JobQueueFull(f"{active} jobs already pending")
+            job = Job(kind)
+            job.key = key
+            self._jobs[job.id] = job
+            if key is not None:
+                self._inflight[key] = job
+        job.future = self._executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Detach one request from a job, cancelling it once no request is left
+        
+        Queued jobs never start, running ones stop at their next check.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.attached = max(job.attached - 1, 0)
+            if job.attached > 0:
+                return job  # Still wanted by another request
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, Job.CANCELLED)
+        return job
+
+    def _run(self, job, fn):
+        if job.cancel_requested:
+            self._finish(job, Job.CANCELLED)
+            return
+        job.state = Job.RUNNING
+        job.started_at = time.time()
+        try:
+            with job_timings(job.timings):
+                result = fn(job)
+        except JobCancelled:
+            self._finish(job, Job.CANCELLED)
+        except Exception as e:
+            logging.exception(f"Job {job.id} ({job.kind}) failed")
+            job.error = str(e)
+            self._finish(job, Job.FAILED)
+        else:
+            job.result = result
+            job.progress = 100.0
+            self._finish(job, Job.DONE)
+
+    def _finish(self, job, state):
+        job.state = state
+        job.finished_at = time.time()
+        if job.started_at is not None:
+            observe('job_seconds', job.finished_at - job.started_at,
+                    help="Wall time of finished jobs", kind=job.kind, state=state)
+        with self._lock:
+            if job.key is not None and self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+
+    def state_counts(self):
+        """Number of known jobs in each state"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {state: 0 for state in (Job.QUEUED, Job.RUNNING, Job.DONE, Job.FAILED, Job.CANCELLED)}
+        for job in jobs:
+            counts[job.state] += 1
+        return counts
+
+    def _prune(self):
+        """Forget finished jobs older than the TTL; caller holds the lock"""
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait=True):
+        for job in list(self._jobs.values()):
+            job._cancel.set()
+        self._executor.shutdown(wait=wait)
+
+
+def init_job_manager(app):
+    """Create and register the JobManager on ``app``"""
+    manager = JobManager(
+        max_workers=app.config['JOB_WORKERS'],
+        max_pending=app.config['JOB_MAX_PENDING'],
+        ttl=app.config['JOB_TTL']
+    )
+    app.extensions['jobs'] = manager
+    return manager
+
+
+def get_job_manager():
+    """Return the JobManager of the current app"""
+    return current_app.extensions['jobs']
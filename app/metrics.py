@@ -0,0 +1,229 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = 'satinterp'
+
+# Upper bounds in seconds for stage and job duration histograms
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# Stage timings of the job running in the current context, see job_timings
+_job_timings = contextvars.ContextVar('job_timings', default=None)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+
+class MetricsRegistry:
+    """
+    Minimal thread-safe metrics store rendered in the Prometheus text format.
+
+    Counters and histograms are updated in place by the hot paths; gauges are
+    callbacks evaluated only when the metrics are scraped, so caches and
+    queues are not polled between scrapes.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._help = {}
+
+    def inc(self, name, value=1, help=None, **labels):
+        """Add ``value`` to the counter ``name``"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            if help:
+                self._help.setdefault(name, help)
+
+    def observe(self, name, value, help=None, **labels):
+        """Record ``value`` in the histogram ``name``"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+            if help:
+                self._help.setdefault(name, help)
+
+    def register_gauge(self, name, collect, help=None):
+        """
+        Register ``collect()`` as the source of gauge ``name``
+
+        ``collect`` returns a number, or a dict of label tuples to numbers.
+        Registering a name again replaces the previous callback.
+        """
+        with self._lock:
+            self._gauges[name] = collect
+            if help:
+                self._help[name] = help
+
+    def record_stage(self, stage, seconds, frames=0):
+        """Account ``seconds`` of work to ``stage`` and to the current job, if any"""
+        self.observe('stage_seconds', seconds, help="Time spent in each processing stage", stage=stage)
+        if frames:
+            self.inc('frames_total', frames, help="Frames processed by each stage", stage=stage)
+        timings = _job_timings.get()
+        if timings is not None:
+            with self._lock:
+                timings[stage] = timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def span(self, stage, frames=0):
+        """Time the enclosed block as work done by ``stage``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - start, frames)
+
+    def value(self, name, **labels):
+        """Current value of a counter, for tests and diagnostics"""
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self._histograms.items()}
+            gauges = dict(self._gauges)
+            help_text = dict(self._help)
+
+        lines = []
+
+        def header(name, kind):
+            full = f"{PREFIX}_{name}"
+            if name in help_text:
+                lines.append(f"# HELP {full} {help_text[name]}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        for name in sorted({name for name, _ in counters}):
+            full = header(name, 'counter')
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{full}{_format_labels(labels)} {value}")
+
+        for name in sorted({name for name, _ in histograms}):
+            full = header(name, 'histogram')
+            for (n, labels), (buckets, total, count) in sorted(histograms.items()):
+                if n != name:
+                    continue
+                for bound, bucket in zip(self.buckets, buckets):
+                    lines.append(f"{full}_bucket{_format_labels(labels, [('le', bound)])} {bucket}")
+                lines.append(f"{full}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{full}_sum{_format_labels(labels)} {total:.6f}")
+                lines.append(f"{full}_count{_format_labels(labels)} {count}")
+
+        for name, collect in sorted(gauges.items()):
+            try:
+                value = collect()
+            except Exception:
+                continue  # A broken collector must not take the endpoint down
+            full = header(name, 'gauge')
+            samples = value.items() if isinstance(value, dict) else [((), value)]
+            for labels, sample in sorted(samples):
+                lines.append(f"{full}{_format_labels(labels)} {sample}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+span = REGISTRY.span
+record_stage = REGISTRY.record_stage
+register_gauge = REGISTRY.register_gauge
+
+
+@contextmanager
+def job_timings(timings):
+    """Collect stage timings of the enclosed work, including threads it starts via bind_context, into ``timings``"""
+    token = _job_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _job_timings.reset(token)
+
+
+def timed(iterable, stage, frames=None):
+    """
+    Yield from ``iterable``, timing how long each item takes to produce
+
+    Args:
+        iterable: Typically a generator doing the work of ``stage``
+        stage (str): Stage the time is accounted to
+        frames (callable, optional): Returns the number of frames in an item
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        record_stage(stage, time.perf_counter() - start, frames(item) if frames else 0)
+        yield item
+
+
+def bind_context(fn):
+    """Wrap ``fn`` to run in a copy of the current context, so a worker thread reports to the same job"""
+    context = contextvars.copy_context()
+    # A context can only be entered by one thread at a time, so each call gets its own copy
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def init_metrics(app):
+    """Register scrape-time gauges for the caches, job queue and pipelines of ``app``"""
+    from .pipeline import queue_depths
+    from .raster_cache import get_raster_cache
+
+    def raster_cache_stats():
+        stats = get_raster_cache().stats()
+        return {
+            (('tier', 'memory'),): stats['hits_memory'],
+            (('tier', 'disk'),): stats['hits_disk'],
+            (('tier', 'miss'),): stats['misses'],
+        }
+
+    register_gauge('raster_cache_lookups', raster_cache_stats,
+                   help="Raster cache lookups by the tier that answered them")
+    register_gauge('raster_cache_hit_rate', lambda: get_raster_cache().stats()['hit_rate'],
+                   help="Fraction of raster lookups served from memory or disk")
+    register_gauge('raster_cache_memory_bytes', lambda: get_raster_cache().stats()['memory_bytes'],
+                   help="Bytes held by the in-memory raster cache")
+
+    video_cache = app.extensions['video_cache']
+    register_gauge('video_cache_hit_rate', lambda: video_cache.stats()['hit_rate'],
+                   help="Fraction of render requests served from the video cache")
+
+    tile_proxy = app.extensions['tile_proxy']
+    register_gauge('tile_cache_hit_rate',
+                   lambda: {(('cache', kind),): stats['hit_rate'] for kind, stats in tile_proxy.stats().items()},
+                   help="Fraction of /wms tiles served from the tile cache, for dated and static layers")
+
+    jobs = app.extensions['jobs']
+    register_gauge('jobs', lambda: {(('state', state),): count for state, count in jobs.state_counts().items()},
+                   help="Video jobs currently known, by state")
+    register_gauge('pipeline_queue_depth',
+                   lambda: {(('pipeline', name),): depth for name, depth in queue_depths().items()},
+                   help="Items buffered between the stages of running pipelines")
@@ -0,0 +1,122 @@
+import queue
+import threading
+import weakref
+
+from .config import Config
+from .metrics import bind_context
+
+_DONE = object()
+
+# Queues of running pipelines, by pipeline name, for the queue depth gauge
+_live_queues = weakref.WeakKeyDictionary()
+_live_queues_lock = threading.Lock()
+
+
+class _Failure:
+    """Wraps an exception raised by a stage so it can cross a queue"""
+    def __init__(self, error):
+        self.error = error
+
+
+def _put(out_queue, item, stop):
+    """Put ``item`` unless the pipeline is being torn down; returns False if stopped"""
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain(in_queue, stop):
+    """Yield items from ``in_queue`` until the upstream stage finishes or the pipeline stops"""
+    while not stop.is_set():
+        try:
+            item = in_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if item is _DONE:
+            return
+        if isinstance(item, _Failure):
+            raise item.error
+        yield item
+
+
+def _run_stage(produce, out_queue, stop):
+    try:
+        for item in produce():
+            if not _put(out_queue, item, stop):
+                return
+    except BaseException as e:
+        _put(out_queue, _Failure(e), stop)
+        return
+    _put(out_queue, _DONE, stop)
+
+
+def queue_depths():
+    """Return the number of items buffered in running pipelines, summed by pipeline name"""
+    with _live_queues_lock:
+        queues = list(_live_queues.items())
+    depths = {}
+    for q, name in queues:
+        depths[name] = depths.get(name, 0) + q.qsize()
+    return depths
+
+
+def iter_pipeline(source, *stages, queue_size=None, name='pipeline'):
+    """
+    Run ``source`` and each stage in its own thread, connected by bounded queues
+    
+    Every stage is a callable taking an iterable and returning an iterable, so
+    existing generator transforms can be chained unchanged. While the caller
+    consumes item i, upstream stages already work on the following items, so
+    end-to-end latency approaches that of the slowest stage.
+    
+    Args:
+        source (iterable): Items for the first stage, iterated in its own thread
+        *stages (callable): Transforms applied in order
+        queue_size (int, optional): Items buffered between stages, defaults to
+            Config.PIPELINE_QUEUE_SIZE
+        name (str): Prefix for the stage thread names, and the pipeline label of
+            the queue depth metric
+    
+    Yields:
+        Items produced by the last stage. Exceptions from any stage are re-raised
+        here; closing the generator early stops all stages.
+    """
+    queue_size = queue_size or Config.PIPELINE_QUEUE_SIZE
+    stop = threading.Event()
+    threads = []
+    queues = []
+
+    def source_producer():
+        return source
+
+    def stage_producer(stage, in_queue):
+        return lambda: stage(_drain(in_queue, stop))
+
+    upstream = None
+    for index in range(len(stages) + 1):
+        out_queue = queue.Queue(maxsize=queue_size)
+        queues.append(out_queue)
+        produce = source_producer if index == 0 else stage_producer(stages[index - 1], upstream)
+        threads.append(threading.Thread(
+            # Stage threads report timings to the job that is consuming the pipeline
+            target=bind_context(_run_stage), args=(produce, out_queue, stop),
+            name=f"{name}-{index}", daemon=True
+        ))
+        upstream = out_queue
+
+    with _live_queues_lock:
+        for q in queues:
+            _live_queues[q] = name
+    for thread in threads:
+        thread.start()
+    try:
+        yield from _drain(upstream, stop)
+    finally:
+        stop.set()
+        with _live_queues_lock:
+            for q in queues:
+                _live_queues.pop(q, None)
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .config import Config
+from .time_planner import is_recent
+
+
+class RasterCache:
+    """
+    Two-tier cache for encoded rasters: a byte-bounded in-memory LRU on top of
+    a content-addressed disk store.
+
+    Disk entries are written to a temporary file and renamed into place, so
+    several worker processes can share one cache directory. Disk eviction is
+    least-recently-used by modification time, which is bumped on every hit.
+    Concurrent misses for the same key are coalesced into one fetch.
+    """
+
+    def __init__(self, cache_dir=None, memory_bytes=None, disk_bytes=None):
+        self.cache_dir = cache_dir or Config.RASTER_CACHE_DIR
+        self.memory_bytes = Config.RASTER_CACHE_MEMORY_BYTES if memory_bytes is None else memory_bytes
+        self.disk_bytes = Config.RASTER_CACHE_DISK_BYTES if disk_bytes is None else disk_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._disk_used = None  # Scanned lazily on the first write
+        self._inflight = {}
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(layer, time_str, bbox, size, format):
+        """
+        Return the content address for a raster request
+
+        Rasters of today or later are keyed by a RECENT_IMAGERY_MAX_AGE time
+        bucket, so they are fetched again later and the partial ones age out.
+        """
+        parts = [layer, time_str, [round(float(v), 6) for v in bbox], [int(v) for v in size], format]
+        if is_recent(time_str):
+            parts.append(int(time.time() // Config.RECENT_IMAGERY_MAX_AGE))
+        canonical = json.dumps(parts, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key):
+        """Return the cached bytes for ``key`` or None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return data
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits_disk += 1
+        self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        """Store ``data`` under ``key`` in both tiers"""
+        self._remember(key, data)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            if self._disk_used is None:
+                self._disk_used = self._scan_disk_usage()
+            else:
+                self._disk_used += len(data)
+            needs_eviction = self._disk_used > self.disk_bytes
+        if needs_eviction:
+            self._evict_disk()
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Return the cached bytes for ``key``, calling ``fetch()`` on a miss
+
+        While one caller fetches a key, others missing the same key wait for
+        its result, or its exception, instead of fetching it again.
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            # The key may have been stored between the miss and taking the lock
+            data = self._memory.get(key)
+            if data is not None:
+                return data
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+
+        try:
+            data = fetch()
+            self.put(key, data)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(data)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+        return data
+
+    def _remember(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_used -= len(previous)
+            self._memory[key] = data
+            self._memory_used += len(data)
+            while self._memory_used > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+    def _iter_disk_entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _scan_disk_usage(self):
+        return sum(size for _, size, _ in self._iter_disk_entries())
+
+    def _evict_disk(self):
+        """Delete least recently used files until usage is below 90% of the quota"""
+        entries = sorted(self._iter_disk_entries(), key=lambda entry: entry[2])
+        used = sum(size for _, size, _ in entries)
+        target = self.disk_bytes * 0.9
+        removed = 0
+        for path, size, _ in entries:
+            if used <= target:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass  # Already evicted by another process
+            used -= size
+        with self._lock:
+            self._disk_used = used
+        logging.info(f"Evicted {removed} rasters from {self.cache_dir}")
+
+    def stats(self):
+        """Return hit/miss counters and current memory usage"""
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                'hits_memory': self.hits_memory,
+                'hits_disk': self.hits_disk,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+                'memory_bytes': self._memory_used,
+                'memory_entries': len(self._memory),
+            }
+
+
+_raster_cache = None
+_raster_cache_lock = threading.Lock()
+
+
+def get_raster_cache():
+    """Return the process-wide RasterCache"""
+    global _raster_cache
+    with _raster_cache_lock:
+        if _raster_cache is None:
+            _raster_cache = RasterCache()
+        return _raster_cache
@@ -0,0 +1,86 @@
+import logging
+
+from .pipeline import iter_pipeline
+
+# Percent of a render's progress given to fetching; interpolation dominates the run time
+FETCH_PROGRESS_SHARE = 10
+
+
+def render_rife_animation(fetcher, interpolator, bbox, size, start_date, end_date,
+                          output_path, fps=60, frames_between=15, progress_callback=None,
+                          flow_profile=None):
+    """
+    Fetch daily images, interpolate them with RIFE and encode a video
+    
+    Fetching, pair preprocessing, RIFE inference and encoding run as
+    overlapping pipeline stages: pair i+1 is fetched and prepared while pair i
+    is interpolated and earlier frames are encoded.
+    
+    Args:
+        fetcher (WMSImageFetcher): Fetcher for the animation layer
+        interpolator (RIFEService or RIFEInterpolator): Model used for interpolation
+        bbox (tuple): (minx, miny, maxx, maxy)
+        size (tuple): (width, height)
+        start_date (datetime): First day
+        end_date (datetime): Last day
+        output_path (str): Path to save the video
+        fps (int): Frames per second of the output video
+        frames_between (int): Interpolated frames between consecutive days
+        progress_callback (function, optional): Called with percent complete
+            after every fetched image and interpolated pair; raising from it,
+            e.g. on cancellation, stops the render
+        flow_profile (str, optional): RIFE flow profile, 'fast', 'balanced' or 'quality'
+    
+    Returns:
+        str: Path to the saved video file
+    """
+    total_pairs = max((end_date - start_date).days, 1)
+
+    def report(percent):
+        if progress_callback:
+            progress_callback(percent)
+
+    images = fetcher.iter_image_sequence(
+        bbox=bbox,
+        size=size,
+        time_start=start_date,
+        time_end=end_date,
+        interval_minutes=1440,  # Daily images
+        progress_callback=lambda percent: report(percent * FETCH_PROGRESS_SHARE / 100)
+    )
+
+    def prepare(images):
+        previous = None
+        paired = False
+        for img in images:
+            if previous is not None:
+                paired = True
+                yield interpolator.prepare_pair(previous, img)
+            previous = img
+        if previous is None:
+            raise ValueError("No valid images found for the selected dates")
+        if not paired:
+            # A single image still makes a one-frame video
+            yield (previous,)
+
+    def interpolate(pairs):
+        last = None
+        for i, pair in enumerate(pairs):
+            if len(pair) == 1:
+                last = pair[0]
+                continue
+            logging.info(f"Interpolating between frames {i} and {i + 1}")
+            frames = interpolator.interpolate_prepared(pair, frames_between, flow_profile)
+            yield from frames[:-1]  # Exclude last frame except for final pair
+            last = frames[-1]
+            # Also the cancellation point of the render, once fetching is done
+            report(FETCH_PROGRESS_SHARE + (100 - FETCH_PROGRESS_SHARE) * min((i + 1) / total_pairs, 1))
+        if last is not None:
+            yield last  # Add final frame
+
+    frames = iter_pipeline(images, prepare, interpolate, name='rife')
+    try:
+        interpolator.create_video(frames, output_path, fps=fps)
+    finally:
+        frames.close()
+    return output_path
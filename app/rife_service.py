@@ -0,0 +1,79 @@
+import logging
+import os
+import threading
+
+import torch
+from flask import current_app
+
+from .interpolator import RIFEInterpolator
+
+
+class RIFEService:
+    """
+    Process-wide RIFE model shared by all requests.
+
+    Inference is serialised by a lock so concurrent requests do not
+    oversubscribe the torch thread pool; encoding does not need the model
+    and runs outside it.
+    """
+
+    def __init__(self, weights_dir=None, num_threads=None, backend='eager', precision='fp32',
+                 compiled_cache_dir=None):
+        num_threads = num_threads or os.cpu_count() or 1
+        torch.set_num_threads(num_threads)
+        self.interpolator = RIFEInterpolator(weights_dir)
+        if backend == 'torchscript':
+            self.interpolator.model.compile(precision, compiled_cache_dir)
+        elif backend != 'eager':
+            raise ValueError(f"Unknown RIFE backend: {backend}")
+        self._lock = threading.Lock()
+        logging.info(f"RIFE service ready with {num_threads} torch threads")
+
+    def warm_up(self):
+        with self._lock:
+            self.interpolator.warm_up()
+
+    def interpolate_frames(self, img1, img2, num_frames, flow_profile=None):
+        """Generate intermediate frames between two images"""
+        return self.interpolate_prepared(self.prepare_pair(img1, img2), num_frames, flow_profile)
+
+    def prepare_pair(self, img1, img2):
+        """Preprocess a pair; runs outside the lock so it overlaps with inference"""
+        return self.interpolator.prepare_pair(img1, img2)
+
+    def interpolate_prepared(self, pair, num_frames, flow_profile=None):
+        """Generate intermediate frames for a pair returned by prepare_pair"""
+        with self._lock:
+            return self.interpolator.interpolate_prepared(pair, num_frames, flow_profile)
+
+    def create_video(self, frames, output_path, fps=30):
+        """Create video from frames"""
+        return self.interpolator.create_video(frames, output_path, fps=fps)
+
+
+_service_lock = threading.Lock()
+
+
+def init_rife_service(app):
+    """Create, warm up and register the RIFE service on ``app``"""
+    with _service_lock:
+        service = app.extensions.get('rife_service')
+        if service is None:
+            service = RIFEService(
+                weights_dir=app.config['RIFE_WEIGHTS_DIR'],
+                num_threads=app.config['TORCH_NUM_THREADS'],
+                backend=app.config['RIFE_BACKEND'],
+                precision=app.config['RIFE_PRECISION'],
+                compiled_cache_dir=app.config['RIFE_COMPILED_CACHE_DIR']
+            )
+            service.warm_up()
+            app.extensions['rife_service'] = service
+        return service
+
+
+def get_rife_service():
+    """Return the RIFE service of the current app, creating it if it was not preloaded"""
+    service = current_app.extensions.get('rife_service')
+    if service is None:
+        service = init_rife_service(current_app._get_current_object())
+    return service
@@ -1,13 +1,82 @@
-from flask import Blueprint, render_template, request, jsonify, send_file
-from .wms_handler import WMSImageFetcher
-from .interpolator import FrameInterpolator, RIFEInterpolator
-from datetime import datetime, timedelta
+import hashlib
+import logging
 import os
-import uuid
-import numpy as np
+from flask import Blueprint, render_template, request, jsonify, send_file, send_from_directory, current_app, Response
+from werkzeug.exceptions import NotFound
+from .wms_handler import get_fetcher
+from .interpolator import FrameInterpolator
+from .rife_service import get_rife_service
+from .render import render_rife_animation
+from .jobs import get_job_manager, JobQueueFull
+from model.RIFE.model.RIFE import FLOW_PROFILES
+from .video_cache import get_video_cache
+from .metrics import REGISTRY
+from .encoder import STREAM_PLAYLIST, stream_to, streaming_supported
+from .tile_proxy import get_tile_proxy
+from datetime import datetime, timedelta
 
 main_bp = Blueprint('main', __name__)
 
+HLS_MIMETYPE = 'application/vnd.apple.mpegurl'
+
+# Served until ffmpeg writes the first segment, so players can attach right away
+PENDING_PLAYLIST = "#EXTM3U\n#EXT-X-VERSION:7\n#EXT-X-TARGETDURATION:{}\n#EXT-X-PLAYLIST-TYPE:EVENT\n"
+
+def _enqueue(kind, params, render):
+    """
+    Queue ``render(video_path, progress_callback)`` as a background job
+    
+    ``render`` may return a dict of extra fields for the finished job, such as
+    days that had to be left out.
+    
+    Requests are content-addressed by ``kind`` and ``params``: a video that
+    was already rendered is returned immediately, and an identical request
+    that is still rendering is shared rather than started twice. When ffmpeg
+    is available the render is also published as an HLS stream whose URL the
+    job reports as soon as it starts, so playback can begin before it ends.
+    
+    Returns:
+        Response: 200 with the video URL on a cache hit, 202 with the job id
+        and status URL otherwise, or 503 if the queue is full
+    """
+    cache = get_video_cache()
+    key = cache.make_key(kind, params)
+    video_filename = cache.filename(kind, key)
+    video_url = f"/static/videos/{video_filename}"
+    
+    if cache.lookup(video_filename):
+        return jsonify({"state": "done", "progress": 100, "video_url": video_url}), 200
+    
+    def run(job):
+        result = {"video_url": video_url}
+        # A duplicate may have finished between the lookup and this job starting
+        if cache.lookup(video_filename):
+            return result
+        
+        def render_to(path):
+            result.update(render(path, job.report_progress) or {})
+        
+        if not streaming_supported():
+            cache.render(video_filename, render_to)
+            return result
+        
+        stream = cache.stream_name(video_filename)
+        stream_dir = cache.open_stream(stream)
+        job.stream_url = f"/streams/{stream}/{STREAM_PLAYLIST}"
+        try:
+            with stream_to(stream_dir):
+                cache.render(video_filename, render_to)
+        except BaseException:
+            cache.remove_stream(stream)
+            raise
+        return result
+    
+    try:
+        job = get_job_manager().submit(kind, run, key=key)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"job_id": job.id, "status_url": f"/jobs/{job.id}"}), 202
+
 @main_bp.route('/')
 def index():
     return render_template('index.html')
@@ -26,37 +95,48 @@ def generate_video():
     }
     
     Returns:
-        str: URL path to generated video
+        JSON: Job id and status URL; the finished job reports the video URL
     """
     data = request.json
     
-    # Initialize WMS fetcher
-    wms_fetcher = WMSImageFetcher(
-        wms_url='https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi',
-        layer_name='MODIS_Terra_CorrectedReflectance_TrueColor'
-    )
-    
-    # Get images
-    images = wms_fetcher.get_image_sequence(
-        bbox=data['bbox'],
-        size=(800, 600),  # Adjust size as needed
-        time_start=datetime.fromisoformat(data['time_start'].replace('Z', '+00:00')),
-        time_end=datetime.fromisoformat(data['time_end'].replace('Z', '+00:00')),
-        interval_minutes=60  # Adjust interval as needed
+    # Get the shared WMS fetcher
+    wms_fetcher = get_fetcher(
+        current_app.config['WMS_URL'],
+        current_app.config['WMS_LAYER']
     )
+    time_start = datetime.fromisoformat(data['time_start'].replace('Z', '+00:00'))
+    time_end = datetime.fromisoformat(data['time_end'].replace('Z', '+00:00'))
+    interval_minutes = 60  # Adjust interval as needed
+    total_images = int((time_end - time_start) / timedelta(minutes=interval_minutes)) + 1
+    
+    def render(video_path, progress_callback):
+        # Lazily fetch images
+        images = wms_fetcher.iter_image_sequence(
+            bbox=data['bbox'],
+            size=(800, 600),  # Adjust size as needed
+            time_start=time_start,
+            time_end=time_end,
+            interval_minutes=interval_minutes
+        )
     
-    # Initialize interpolator
-    interpolator = FrameInterpolator()
-    
-    # Generate interpolated frames
-    interpolated_frames = interpolator.interpolate_sequence(images)
-    
-    # Create video
-    output_path = os.path.join('app', 'static', 'videos', 'output.mp4')
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    interpolator.create_video(interpolated_frames, output_path)
+        # Initialize interpolator
+        interpolator = FrameInterpolator()
     
-    return '/static/videos/output.mp4'
+        # Stream interpolated frames straight into the encoder
+        interpolated_frames = interpolator.iter_interpolate_sequence(
+            images, progress_callback=progress_callback, total_images=total_images
+        )
+        interpolator.create_video(interpolated_frames, video_path)
+    
+    params = {
+        "layer": current_app.config['WMS_LAYER'],
+        "bbox": data['bbox'],
+        "size": (800, 600),
+        "time_start": time_start,
+        "time_end": time_end,
+        "interval_minutes": interval_minutes,
+    }
+    return _enqueue('video', params, render)
 
 @main_bp.route('/generate-daily-video', methods=['POST'])
 def generate_daily_video():
@@ -71,49 +151,98 @@ def generate_daily_video():
     }
     
     Returns:
-        str: URL path to generated video
+        JSON: Job id and status URL; the finished job reports the video URL
     """
     data = request.json
     
-    # Initialize WMS fetcher
-    wms_fetcher = WMSImageFetcher(
-        wms_url='https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi',
-        layer_name='MODIS_Terra_CorrectedReflectance_TrueColor'
+    # Get the shared WMS fetcher
+    wms_fetcher = get_fetcher(
+        current_app.config['WMS_URL'],
+        current_app.config['WMS_LAYER']
     )
     
     # Parse the date
     selected_date = data['date']  # Pass the date string directly
+    fps = data.get('fps', 10)
+    
+    def render(video_path, progress_callback):
+        # Generate the daily video
+        wms_fetcher.get_daily_video(
+            bbox=data['bbox'],
+            size=(800, 600),  # Adjust size as needed
+            date=selected_date,
+            output_path=video_path,
+            fps=fps,
+            progress_callback=progress_callback
+        )
     
-    # Generate a unique filename for the video
-    date_str = selected_date.replace('-', '')
-    video_filename = f"daily_video_{date_str}_{uuid.uuid4().hex[:8]}.mp4"
-    video_path = os.path.join('app', 'static', 'videos', video_filename)
-    
-    # Ensure the directory exists
-    os.makedirs(os.path.dirname(video_path), exist_ok=True)
-    
-    # Generate the daily video
-    wms_fetcher.get_daily_video(
-        bbox=data['bbox'],
-        size=(800, 600),  # Adjust size as needed
-        date=selected_date,
-        output_path=video_path,
-        fps=data.get('fps', 10)
-    )
-    
-    # Return the URL to the video
-    video_url = f"/static/videos/{video_filename}"
-    return jsonify({"video_url": video_url})
+    params = {
+        "layer": current_app.config['WMS_LAYER'],
+        "bbox": data['bbox'],
+        "size": (800, 600),
+        "date": selected_date,
+        "fps": fps,
+    }
+    return _enqueue('daily-video', params, render)
 
 @main_bp.route('/videos/<filename>')
 def serve_video(filename):
     """Serve the generated video file"""
+    # conditional answers Range requests, so players can seek without a full download
     return send_file(
-        os.path.join('app', 'static', 'videos', filename),
+        get_video_cache().path(filename),
         mimetype='video/mp4',
-        as_attachment=False
+        as_attachment=False,
+        conditional=True
     )
 
+@main_bp.route('/streams/<stream>/<filename>')
+def serve_stream(stream, filename):
+    """Serve the growing HLS playlist and the fragmented MP4 segments of a render"""
+    stream_dir = get_video_cache().stream_dir(stream)
+    if stream.startswith('.') or not os.path.isdir(stream_dir):
+        raise NotFound()
+    
+    if filename == STREAM_PLAYLIST:
+        # The playlist changes after every segment, so it must never be cached
+        path = os.path.join(stream_dir, filename)
+        if os.path.exists(path):
+            response = send_file(path, mimetype=HLS_MIMETYPE, conditional=False)
+        else:
+            response = Response(PENDING_PLAYLIST.format(current_app.config['VIDEO_SEGMENT_SECONDS']),
+                                mimetype=HLS_MIMETYPE)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    # Segments never change once written
+    return send_from_directory(stream_dir, filename, mimetype='video/mp4', conditional=True,
+                               max_age=current_app.config['VIDEO_STREAM_TTL'])
+
+@main_bp.route('/wms')
+def wms_tile():
+    """Serve a map tile from the shared tile cache, fetching it from the WMS on a miss"""
+    proxy = get_tile_proxy()
+    try:
+        params = proxy.normalize(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Sent by the map while the date slider plays forward
+    prefetch = request.args.get('PREFETCH', type=int)
+    if prefetch:
+        proxy.prefetch(params, prefetch)
+    
+    try:
+        data = proxy.get_tile(params)
+    except Exception as e:
+        logging.warning(f"Tile {params['LAYERS']} at {params.get('TIME')} failed: {str(e)}")
+        return jsonify({"error": "Upstream WMS request failed"}), 502
+    
+    response = Response(data, mimetype=params['FORMAT'])
+    response.set_etag(hashlib.sha256(data).hexdigest())
+    response.headers['Cache-Control'] = proxy.cache_control(params)
+    return response.make_conditional(request)
+
 @main_bp.route('/generate-multi-day-video', methods=['POST'])
 def generate_multi_day_video():
     """
@@ -128,133 +257,117 @@ def generate_multi_day_video():
     }
     
     Returns:
-        str: URL path to generated video
+        JSON: Job id and status URL; the finished job reports the video URL
+        and, if some days could not be fetched, ``failed_days``
     """
     data = request.json
     
-    # Initialize WMS fetcher
-    wms_fetcher = WMSImageFetcher(
-        wms_url='https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi',
-        layer_name='MODIS_Terra_CorrectedReflectance_TrueColor'
+    # Get the shared WMS fetcher
+    wms_fetcher = get_fetcher(
+        current_app.config['WMS_URL'],
+        current_app.config['WMS_LAYER']
     )
     
-    # Generate a unique filename for the video
-    start_date_str = data['start_date'].replace('-', '')
-    end_date_str = data['end_date'].replace('-', '')
-    video_filename = f"multi_day_video_{start_date_str}_{end_date_str}_{uuid.uuid4().hex[:8]}.mp4"
-    video_path = os.path.join('app', 'static', 'videos', video_filename)
-    
-    # Ensure the directory exists
-    os.makedirs(os.path.dirname(video_path), exist_ok=True)
-    
-    # Generate the multi-day video
-    wms_fetcher.get_multi_day_video(
-        bbox=data['bbox'],
-        size=(800, 600),  # Adjust size as needed
-        start_date=data['start_date'],
-        end_date=data['end_date'],
-        output_path=video_path,
-        fps=data.get('fps', 10)
-    )
+    fps = data.get('fps', 10)
     
-    # Return the URL to the video
-    video_url = f"/static/videos/{video_filename}"
-    return jsonify({"video_url": video_url})
+    def render(video_path, progress_callback):
+        failed_days = []
+        
+        # Generate the multi-day video; days that cannot be fetched are left out
+        wms_fetcher.get_multi_day_video(
+            bbox=data['bbox'],
+            size=(800, 600),  # Adjust size as needed
+            start_date=data['start_date'],
+            end_date=data['end_date'],
+            output_path=video_path,
+            fps=fps,
+            progress_callback=progress_callback,
+            on_day_failed=lambda day, error: failed_days.append({"date": day, "error": str(error)})
+        )
+        if failed_days:
+            return {"failed_days": failed_days}
+    
+    params = {
+        "layer": current_app.config['WMS_LAYER'],
+        "bbox": data['bbox'],
+        "size": (800, 600),
+        "start_date": data['start_date'],
+        "end_date": data['end_date'],
+        "fps": fps,
+    }
+    return _enqueue('multi-day-video', params, render)
 
 @main_bp.route('/generate-rife-animation', methods=['POST'])
 def generate_rife_animation():
     """Generate smooth animation using RIFE interpolation"""
     data = request.json
     
-    # Initialize WMS fetcher and RIFE interpolator
-    wms_fetcher = WMSImageFetcher(
-        wms_url='https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi',
-        layer_name='VIIRS_SNPP_CorrectedReflectance_TrueColor'
+    # Get the shared WMS fetcher and RIFE model
+    wms_fetcher = get_fetcher(
+        current_app.config['WMS_URL'],
+        current_app.config['RIFE_WMS_LAYER']
     )
     
-    interpolator = RIFEInterpolator()
+    interpolator = get_rife_service()
     
     # Get start and end dates
     start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
     end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
-    
-    # Fetch satellite images
-    images = wms_fetcher.get_image_sequence(
-        bbox=data['bbox'],
-        size=data['size'],
-        time_start=start_date,
-        time_end=end_date,
-        interval_minutes=1440  # Daily images
-    )
-    
-    # Ensure images are in correct format
-    processed_images = []
-    for img in images:
-        if img is not None:
-            try:
-                if img.dtype == np.float64 or img.dtype == np.float32:
-                    img = (img * 255).astype(np.uint8)
-                processed_images.append(img)
-            except Exception as e:
-                print(f"Error processing image: {e}")
-                continue
-    
-    if not processed_images:
-        return jsonify({"error": "No valid images found for the selected dates"}), 400
-    
-    # Generate interpolated frames between each pair of images
-    all_frames = []
+    fps = data.get('fps', 60)
     frames_between = 15  # Increased number of frames for smoother transitions
     
-    print(f"Processing {len(processed_images)} images")
-    
-    for i in range(len(processed_images) - 1):
-        print(f"Interpolating between frames {i} and {i+1}")
-        frames = interpolator.interpolate_frames(
-            processed_images[i], 
-            processed_images[i + 1],
-            frames_between
+    # Trade flow accuracy for speed on previews
+    flow_profile = data.get('flow_profile', current_app.config['RIFE_FLOW_PROFILE'])
+    if flow_profile not in FLOW_PROFILES:
+        return jsonify({"error": f"Unknown flow profile: {flow_profile}"}), 400
+    
+    def render(video_path, progress_callback):
+        # Fetch, interpolate and encode as overlapping pipeline stages
+        render_rife_animation(
+            wms_fetcher,
+            interpolator,
+            bbox=data['bbox'],
+            size=data['size'],
+            start_date=start_date,
+            end_date=end_date,
+            output_path=video_path,
+            fps=fps,
+            frames_between=frames_between,
+            progress_callback=progress_callback,
+            flow_profile=flow_profile
         )
-        if not frames:
-            print(f"No frames generated for pair {i}")
-            continue
-        all_frames.extend(frames[:-1])  # Exclude last frame except for final pair
-    all_frames.append(processed_images[-1])  # Add final frame
-    
-    if not all_frames:
-        return jsonify({"error": "Failed to generate any frames"}), 400
-    
-    print(f"Total frames generated: {len(all_frames)}")
-    
-    # Generate unique filename
-    video_filename = f"rife_animation_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}_{uuid.uuid4().hex[:8]}.mp4"
-    video_path = os.path.join('app', 'static', 'videos', video_filename)
     
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(video_path), exist_ok=True)
-    
-    # Create video with higher FPS
-    interpolator.create_video(all_frames, video_path, fps=data.get('fps', 60))
-    
-    # Return video URL
-    return jsonify({"video_url": f"/static/videos/{video_filename}"})
+    params = {
+        "layer": current_app.config['RIFE_WMS_LAYER'],
+        "bbox": data['bbox'],
+        "size": data['size'],
+        "start_date": start_date,
+        "end_date": end_date,
+        "fps": fps,
+        "frames_between": frames_between,
+        "flow_profile": flow_profile,
+    }
+    return _enqueue('rife-animation', params, render)
 
-    video_path = None
-    try:
-        # ... existing code ...
-        
-        video_filename = f"rife_animation_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}_{uuid.uuid4().hex[:8]}.mp4"
-        video_path = os.path.join('app', 'static', 'videos', video_filename)
-        
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(video_path), exist_ok=True)
-        
-        # Create video
-        interpolator.create_video(all_frames, video_path, fps=data.get('fps', 30))
-        
-        # Return video URL
-        return jsonify({"video_url": f"/static/videos/{video_filename}"})
-    except Exception as e:
-        if video_path and os.path.exists(video_path):
-            os.remove(video_path)
-        return jsonify({"error": str(e)}), 500 
\ No newline at end of file
+@main_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report the state and percent complete of a video job, with ?timings=1 its time per stage"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    timings = request.args.get('timings', '').lower() in ('1', 'true', 'yes')
+    return jsonify(job.to_dict(timings=timings))
+
+@main_bp.route('/jobs/<job_id>', methods=['DELETE'])
+@main_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running video job"""
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+@main_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage timings, frame and byte counters, cache hit rates and queue depths for Prometheus"""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
\ No newline at end of file
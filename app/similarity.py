@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+from .config import Config
+from .metrics import inc
+
+# How consecutive frames relate, see classify_pair
+DUPLICATE = 'duplicate'
+STATIC = 'static'
+MOVING = 'moving'
+
+
+def is_duplicate(img1, img2):
+    """True if two frames are the same array or byte-identical"""
+    if img1 is img2:
+        return True  # Repeated timestamps share one array
+    return img1.shape == img2.shape and img1.dtype == img2.dtype and np.array_equal(img1, img2)
+
+
+def thumbnail(img, size=None):
+    """Area-downsample ``img`` so its longest side is at most ``size``, as float32"""
+    size = size or Config.SIMILARITY_THUMBNAIL
+    height, width = img.shape[:2]
+    scale = size / max(height, width)
+    if scale < 1:
+        dsize = (max(1, round(width * scale)), max(1, round(height * scale)))
+        img = cv2.resize(img, dsize, interpolation=cv2.INTER_AREA)
+    return img.astype(np.float32)
+
+
+def downsampled_psnr(img1, img2, size=None):
+    """
+    PSNR in dB between downsampled copies of two frames
+
+    Downsampling first makes the check cheap and ignores pixel noise, so it
+    measures whether anything visibly moved.
+    """
+    a, b = thumbnail(img1, size), thumbnail(img2, size)
+    mse = float(np.mean((a - b) ** 2))
+    if mse == 0:
+        return float('inf')
+    peak = 255.0 if img1.dtype == np.uint8 else 1.0
+    return 10 * np.log10(peak ** 2 / mse)
+
+
+def classify_pair(img1, img2, check_static=True):
+    """
+    Classify a pair of consecutive frames as DUPLICATE, STATIC or MOVING
+
+    Args:
+        img1, img2 (numpy.ndarray): Consecutive frames
+        check_static (bool): Also look for STATIC pairs, whose downsampled PSNR
+            reaches Config.STATIC_PAIR_PSNR. Callers that blend linearly anyway
+            only need duplicates.
+
+    Returns:
+        str: DUPLICATE if byte-identical, STATIC if visually unchanged, else MOVING
+    """
+    static_psnr = Config.STATIC_PAIR_PSNR if check_static else None
+    if is_duplicate(img1, img2):
+        kind = DUPLICATE
+    elif static_psnr is not None and img1.shape == img2.shape and \
+            downsampled_psnr(img1, img2) >= static_psnr:
+        kind = STATIC
+    else:
+        kind = MOVING
+    inc('frame_pairs_total', help="Consecutive frame pairs by similarity", kind=kind)
+    return kind
@@ -9,7 +9,7 @@ function initMap() {
             // Primary layer - VIIRS SNPP (Suomi NPP satellite)
             new ol.layer.Tile({
                 source: new ol.source.TileWMS({
-                    url: 'https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi',
+                    url: '/wms',  // Caching proxy in front of GIBS
                     params: {
                         'LAYERS': 'VIIRS_SNPP_CorrectedReflectance_TrueColor',
                         'FORMAT': 'image/jpeg',
@@ -29,7 +29,7 @@ function initMap() {
             // Add coastlines
             new ol.layer.Tile({
                 source: new ol.source.TileWMS({
-                    url: 'https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi',
+                    url: '/wms',  // Caching proxy in front of GIBS
                     params: {
                         'LAYERS': 'Coastlines_15m',
                         'FORMAT': 'image/png',
@@ -45,7 +45,7 @@ function initMap() {
             // Add country/administrative borders
             new ol.layer.Tile({
                 source: new ol.source.TileWMS({
-                    url: 'https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi',
+                    url: '/wms',  // Caching proxy in front of GIBS
                     params: {
                         'LAYERS': 'Reference_Features_15m',
                         'FORMAT': 'image/png',
@@ -61,7 +61,7 @@ function initMap() {
             // Add place labels
             new ol.layer.Tile({
                 source: new ol.source.TileWMS({
-                    url: 'https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi',
+                    url: '/wms',  // Caching proxy in front of GIBS
                     params: {
                         'LAYERS': 'Reference_Labels_15m',
                         'FORMAT': 'image/png',
@@ -210,10 +210,12 @@ function addLayerControls() {
     addRestoreButton();
 }
 
-function updateWMSLayer(date) {
+function updateWMSLayer(date, prefetch) {
     const layer = map.getLayers().getArray()[0];  // Get the satellite layer
     layer.getSource().updateParams({
-        'TIME': date
+        'TIME': date,
+        // Asks the proxy to warm the next days' tiles; undefined params are left out
+        'PREFETCH': prefetch
     });
 }
 
@@ -287,7 +289,7 @@ function addDateSlider() {
         normalizedDate.setHours(0, 0, 0, 0); // Normalize to start of day
         slider.value = normalizedDate.getTime();
         updateDateDisplay(normalizedDate);
-        updateWMSLayer(normalizedDate.toISOString().split('T')[0]);
+        updateWMSLayer(normalizedDate.toISOString().split('T')[0], isPlaying ? 2 : undefined);
     }
     
     // Initialize date display
@@ -379,15 +381,72 @@ function addDateSlider() {
     controlsDiv.insertBefore(dateSliderContainer, referenceControls.nextSibling);
 }
 
+// Poll interval for background video jobs
+const JOB_POLL_INTERVAL_MS = 1000;
+
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+let activeHls = null;
+
+// Play a video file, or an HLS playlist that may still be growing
+function playVideo(url) {
+    const videoPlayer = document.getElementById('video-player');
+    const video = document.getElementById('interpolated-video');
+    const source = video.querySelector('source');
+    
+    if (activeHls) {
+        activeHls.destroy();
+        activeHls = null;
+    }
+    
+    if (url.endsWith('.m3u8') && !video.canPlayType('application/vnd.apple.mpegurl')) {
+        if (typeof Hls === 'undefined' || !Hls.isSupported()) return false;
+        source.removeAttribute('src');
+        activeHls = new Hls();
+        activeHls.loadSource(url);
+        activeHls.attachMedia(video);
+    } else {
+        source.src = url;
+        source.type = url.endsWith('.m3u8') ? 'application/vnd.apple.mpegurl' : 'video/mp4';
+        video.load();  // Important: reload the video with new source
+    }
+    videoPlayer.style.display = 'block';
+    video.play().catch(() => {});  // Autoplay may be blocked; the controls still work
+    return true;
+}
+
+// Poll a job until it finishes, reporting progress along the way
+async function waitForJob(statusUrl, onProgress, isCancelled) {
+    while (true) {
+        // A cancelled job may keep running for others who requested the same animation
+        if (isCancelled && isCancelled()) return null;
+        const response = await fetch(statusUrl);
+        if (!response.ok) throw new Error('Failed to get job status');
+        
+        const job = await response.json();
+        if (job.state === 'done') return job;
+        if (job.state === 'failed') throw new Error(job.error || 'Animation generation failed');
+        if (job.state === 'cancelled') return null;
+        
+        onProgress(job);
+        await sleep(JOB_POLL_INTERVAL_MS);
+    }
+}
+
 async function generateSmoothAnimation() {
     const startDate = document.getElementById('start-date').value;
     const endDate = document.getElementById('end-date').value;
+    const flowProfile = document.getElementById('flow-profile').value;
     const extent = map.getView().calculateExtent();
     const size = map.getSize();
     
     const loadingDiv = document.getElementById('loading');
+    const loadingText = document.getElementById('loading-text');
+    const cancelButton = document.getElementById('cancel-animation');
     loadingDiv.style.display = 'block';
-    loadingDiv.textContent = 'Generating smooth animation...';
+    loadingText.textContent = 'Generating smooth animation...';
     
     try {
         const response = await fetch('/generate-rife-animation', {
@@ -400,26 +459,49 @@ async function generateSmoothAnimation() {
                 start_date: startDate,
                 end_date: endDate,
                 size: size,
-                fps: 30
+                fps: 30,
+                flow_profile: flowProfile
             })
         });
         
         if (!response.ok) throw new Error('Animation generation failed');
         
-        const data = await response.json();
+        let data = await response.json();
+        
+        // Identical animations are served straight from the cache
+        if (!data.video_url) {
+            const { job_id, status_url } = data;
+            
+            let cancelled = false;
+            cancelButton.style.display = 'inline-block';
+            cancelButton.onclick = () => {
+                cancelled = true;
+                fetch(`/jobs/${job_id}/cancel`, { method: 'POST' });
+                loadingText.textContent = 'Cancelling...';
+            };
+            
+            // Start playing the first segments while the rest is still rendering
+            let streaming = false;
+            data = await waitForJob(status_url, (job) => {
+                if (job.stream_url && !streaming) {
+                    streaming = playVideo(job.stream_url);
+                }
+                const state = job.state === 'queued' ? 'Queued' : 'Generating smooth animation';
+                loadingText.textContent = `${state}... ${Math.round(job.progress)}%`;
+            }, () => cancelled);
+            if (!data) return;  // Cancelled
+            if (streaming) return;  // The stream ends by itself once rendering is done
+        }
         
         // Display the video
-        const videoPlayer = document.getElementById('video-player');
-        const video = document.getElementById('interpolated-video');
-        const source = video.querySelector('source');
-        source.src = data.video_url;
-        video.load();  // Important: reload the video with new source
-        videoPlayer.style.display = 'block';
+        playVideo(data.video_url);
         
     } catch (error) {
         console.error('Failed to generate animation:', error);
         alert('Failed to generate animation');
     } finally {
+        cancelButton.style.display = 'none';
+        cancelButton.onclick = null;
         loadingDiv.style.display = 'none';
     }
 }
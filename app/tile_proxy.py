@@ -0,0 +1,208 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from flask import current_app
+
+from .config import Config
+from .metrics import bind_context, inc
+from .raster_cache import RasterCache
+from .time_planner import is_recent
+from .utils.http import get_with_retry
+
+# Image formats the proxy will request and serve
+FORMATS = ('image/png', 'image/jpeg')
+
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+class TileProxy:
+    """
+    Shared, caching front for the WMS tiles shown on the map.
+
+    Tile requests are normalised, so parameter order, case, float noise in
+    the bbox and client-side cache busters all map to one cache key, and
+    only parameters that change the image are forwarded upstream. Tiles of
+    static reference layers never expire and are kept in their own LRU
+    cache, so dated imagery cannot push them out. Dated imagery goes to a
+    bounded LRU cache, and tiles for today or without a TIME are keyed by a
+    time bucket, since GIBS keeps adding swaths to them during the day.
+
+    Args:
+        wms_url (str, optional): Upstream WMS, defaults to Config.WMS_URL
+        cache (RasterCache, optional): Cache for dated tiles
+        static_cache (RasterCache, optional): Cache for static layers
+        static_layers (iterable, optional): Defaults to Config.TILE_STATIC_LAYERS
+    """
+
+    def __init__(self, wms_url=None, cache=None, static_cache=None, static_layers=None):
+        self.wms_url = wms_url or Config.WMS_URL
+        self.cache = cache or RasterCache(
+            os.path.join(Config.TILE_CACHE_DIR, 'dated'), Config.TILE_CACHE_MEMORY_BYTES, Config.TILE_CACHE_DISK_BYTES
+        )
+        # Static tiles never expire, but their keys include client-chosen bboxes, so the quota stays finite
+        self.static_cache = static_cache or RasterCache(
+            os.path.join(Config.TILE_CACHE_DIR, 'static'), Config.TILE_CACHE_MEMORY_BYTES,
+            Config.TILE_STATIC_DISK_BYTES
+        )
+        self.static_layers = set(Config.TILE_STATIC_LAYERS if static_layers is None else static_layers)
+        self._prefetch_executor = ThreadPoolExecutor(
+            max_workers=Config.TILE_PREFETCH_WORKERS, thread_name_prefix='tile-prefetch'
+        )
+        self._prefetching = set()
+        self._lock = threading.Lock()
+
+    def normalize(self, args):
+        """
+        Reduce raw query arguments to the canonical GetMap parameters
+
+        Raises:
+            ValueError: If the request is not a GetMap the proxy can serve
+        """
+        args = {key.upper(): str(value).strip() for key, value in args.items()}
+        if args.get('REQUEST', 'GetMap').lower() != 'getmap':
+            raise ValueError("Only GetMap requests are proxied")
+        layers = args.get('LAYERS')
+        if not layers:
+            raise ValueError("LAYERS is required")
+        image_format = args.get('FORMAT', 'image/png').lower()
+        if image_format not in FORMATS:
+            raise ValueError(f"Unsupported FORMAT {image_format}")
+        version = args.get('VERSION', '1.3.0')
+        if version not in ('1.1.1', '1.3.0'):
+            raise ValueError(f"Unsupported VERSION {version}")
+        try:
+            width, height = int(args.get('WIDTH', 256)), int(args.get('HEIGHT', 256))
+            bbox = [float(v) for v in args['BBOX'].split(',')]
+        except (KeyError, ValueError):
+            raise ValueError("WIDTH, HEIGHT and a numeric BBOX are required")
+        if len(bbox) != 4:
+            raise ValueError("BBOX needs four values")
+        if not (0 < width <= Config.TILE_MAX_SIZE and 0 < height <= Config.TILE_MAX_SIZE):
+            raise ValueError(f"Tiles are limited to {Config.TILE_MAX_SIZE} pixels a side")
+
+        params = {
+            'SERVICE': 'WMS',
+            'REQUEST': 'GetMap',
+            'VERSION': version,
+            'LAYERS': layers,
+            'STYLES': args.get('STYLES', ''),
+            'FORMAT': image_format,
+            'TRANSPARENT': 'TRUE' if args.get('TRANSPARENT', '').lower() == 'true' else 'FALSE',
+            # 1.3.0 renamed SRS to CRS
+            'CRS' if version == '1.3.0' else 'SRS': (args.get('CRS') or args.get('SRS') or 'EPSG:4326').upper(),
+            'WIDTH': str(width),
+            'HEIGHT': str(height),
+            'BBOX': ','.join(repr(round(v, 9)) for v in bbox),
+        }
+        # Static layers look the same on every date
+        if args.get('TIME') and not self.is_static(params):
+            params['TIME'] = args['TIME']
+        return params
+
+    def is_static(self, params):
+        return all(layer in self.static_layers for layer in params['LAYERS'].split(','))
+
+    def is_recent(self, params):
+        """True for tiles that may still change: today's imagery, or no TIME at all"""
+        return 'TIME' not in params or is_recent(params['TIME'])
+
+    def key(self, params):
+        """Cache key of a normalised request"""
+        parts = sorted(params.items())
+        if not self.is_static(params) and self.is_recent(params):
+            # Recent tiles expire by moving to a new key; old ones age out of the LRU
+            parts.append(('bucket', int(time.time() // Config.TILE_RECENT_MAX_AGE)))
+        return hashlib.sha256(json.dumps(parts, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+    def cache_control(self, params):
+        """Cache-Control header for a tile"""
+        if self.is_static(params):
+            return 'public, max-age=31536000, immutable'
+        if self.is_recent(params):
+            return f'public, max-age={Config.TILE_RECENT_MAX_AGE}'
+        return f'public, max-age={Config.TILE_MAX_AGE}'
+
+    def get_tile(self, params):
+        """Return the encoded tile for normalised ``params``, fetching it once on a miss"""
+        cache = self.static_cache if self.is_static(params) else self.cache
+        return cache.get_or_fetch(self.key(params), lambda: self._fetch(params))
+
+    def _fetch(self, params):
+        response = get_with_retry(self.wms_url, params=params)
+        content_type = response.headers.get('Content-Type', '').split(';')[0]
+        # WMS errors come back as XML with status 200 and must not be cached
+        if not content_type.startswith('image/'):
+            raise ValueError(f"WMS returned {content_type or 'no content type'} "
+                             f"for {params['LAYERS']}: {response.text[:200]}")
+        inc('tile_bytes_fetched_total', len(response.content), help="Bytes of map tiles fetched upstream")
+        return response.content
+
+    def prefetch(self, params, days):
+        """
+        Warm the cache with the same tile on the following ``days`` dates
+
+        Used while the date slider plays forward. Dates after today are
+        skipped, and so is anything beyond TILE_PREFETCH_QUEUE tiles in flight.
+        """
+        time_str = params.get('TIME')
+        if not time_str or not DATE_PATTERN.match(time_str):
+            return 0
+        start = date.fromisoformat(time_str)
+        today = datetime.now(timezone.utc).date()
+        queued = 0
+        for offset in range(1, min(days, Config.TILE_PREFETCH_DAYS) + 1):
+            day = start + timedelta(days=offset)
+            if day > today:
+                break
+            future_params = dict(params, TIME=day.isoformat())
+            key = self.key(future_params)
+            with self._lock:
+                if key in self._prefetching or len(self._prefetching) >= Config.TILE_PREFETCH_QUEUE:
+                    continue
+                self._prefetching.add(key)
+            self._prefetch_executor.submit(bind_context(self._prefetch_one), key, future_params)
+            queued += 1
+        return queued
+
+    def _prefetch_one(self, key, params):
+        try:
+            self.get_tile(params)
+            inc('tiles_prefetched_total', help="Map tiles fetched ahead of the date slider")
+        except Exception as e:
+            logging.debug(f"Prefetching {params['LAYERS']} at {params['TIME']} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._prefetching.discard(key)
+
+    def stats(self):
+        return {'dated': self.cache.stats(), 'static': self.static_cache.stats()}
+
+    def shutdown(self, wait=False):
+        self._prefetch_executor.shutdown(wait=wait)
+
+
+def init_tile_proxy(app):
+    """Create and register the TileProxy on ``app``"""
+    cache_dir = app.config['TILE_CACHE_DIR']
+    proxy = TileProxy(
+        app.config['WMS_URL'],
+        cache=RasterCache(os.path.join(cache_dir, 'dated'), app.config['TILE_CACHE_MEMORY_BYTES'],
+                          app.config['TILE_CACHE_DISK_BYTES']),
+        static_cache=RasterCache(os.path.join(cache_dir, 'static'), app.config['TILE_CACHE_MEMORY_BYTES'],
+                                 app.config['TILE_STATIC_DISK_BYTES']),
+        static_layers=app.config['TILE_STATIC_LAYERS'],
+    )
+    app.extensions['tile_proxy'] = proxy
+    return proxy
+
+
+def get_tile_proxy():
+    """Return the TileProxy of the current app"""
+    return current_app.extensions['tile_proxy']
@@ -0,0 +1,181 @@
+import bisect
+import re
+from datetime import datetime, timedelta, timezone
+
+_DURATION_RE = re.compile(
+    r'^P(?:(?P<years>\d+)Y)?(?:(?P<months>\d+)M)?(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?'
+    r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$'
+)
+
+# Period assumed when a layer advertises no TIME dimension (GIBS imagery is daily)
+DEFAULT_PERIOD = (0, timedelta(days=1))
+
+
+def parse_duration(text):
+    """
+    Parse an ISO 8601 duration such as ``P1D`` or ``PT10M``
+    
+    Returns:
+        tuple: (months, timedelta); calendar months are kept separate
+    """
+    match = _DURATION_RE.match(text.strip())
+    if not match or text.strip() in ('P', 'PT'):
+        raise ValueError(f"Invalid ISO 8601 duration: {text}")
+    parts = {k: float(v) if v else 0 for k, v in match.groupdict().items()}
+    months = int(parts['years']) * 12 + int(parts['months'])
+    delta = timedelta(weeks=parts['weeks'], days=parts['days'], hours=parts['hours'],
+                      minutes=parts['minutes'], seconds=parts['seconds'])
+    return months, delta
+
+
+def parse_time(text):
+    """Parse a WMS time value into a naive UTC datetime"""
+    text = text.strip()
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    return to_utc(datetime.fromisoformat(text))
+
+
+def to_utc(dt):
+    """Convert an aware datetime to naive UTC, leaving naive values as they are"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def is_recent(value):
+    """
+    True if ``value`` falls on the current UTC day or later
+    
+    GIBS keeps adding swaths to such imagery during the day, so anything
+    cached for it goes stale. ``value`` is a WMS time string, date or
+    datetime; other values are never recent.
+    """
+    try:
+        if isinstance(value, str):
+            value = parse_time(value)
+        elif isinstance(value, datetime):
+            value = to_utc(value)
+    except ValueError:
+        return False
+    if isinstance(value, datetime):
+        value = value.date()
+    elif not hasattr(value, 'isoformat'):
+        return False
+    return value >= datetime.now(timezone.utc).date()
+
+
+def _add_months(dt, months):
+    month_index = dt.month - 1 + months
+    year = dt.year + month_index // 12
+    month = month_index % 12 + 1
+    # Clamp to the last day of the target month
+    for day in (dt.day, 30, 29, 28):
+        try:
+            return dt.replace(year=year, month=month, day=day)
+        except ValueError:
+            continue
+
+
+class TimeDimension:
+    """
+    Available timestamps of a WMS layer, parsed from its TIME dimension.
+
+    Values are either ``start/end/period`` intervals or discrete instants,
+    e.g. ``2000-02-24/2024-05-01/P1D`` or ``2024-01-01,2024-01-08``.
+    """
+
+    def __init__(self, intervals=None, instants=None):
+        self.intervals = intervals or []  # [(start, end, (months, timedelta))]
+        self.instants = sorted(instants or [])
+
+    @classmethod
+    def from_positions(cls, positions):
+        """Build from owslib ``timepositions``, returning None when empty"""
+        intervals, instants = [], []
+        for position in positions or []:
+            position = position.strip()
+            if not position:
+                continue
+            parts = position.split('/')
+            if len(parts) == 3:
+                intervals.append((parse_time(parts[0]), parse_time(parts[1]),
+                                  parse_duration(parts[2])))
+            else:
+                instants.append(parse_time(parts[0]))
+        if not intervals and not instants:
+            return None
+        return cls(intervals, instants)
+
+    @classmethod
+    def from_layer(cls, layer):
+        """Build from an owslib layer ContentMetadata, or None without a TIME dimension"""
+        return cls.from_positions(getattr(layer, 'timepositions', None))
+
+    @property
+    def period(self):
+        """Shortest advertised period, used to choose the TIME string format"""
+        if self.intervals:
+            return min((p for _, _, p in self.intervals),
+                       key=lambda p: p[0] * timedelta(days=28) + p[1])
+        return DEFAULT_PERIOD
+
+    def snap(self, dt):
+        """Return the latest available timestamp at or before ``dt``, or None"""
+        dt = to_utc(dt)
+        best = None
+        for start, end, (months, delta) in self.intervals:
+            if dt < start:
+                continue
+            limit = min(dt, end)
+            if months:
+                steps = (limit.year - start.year) * 12 + limit.month - start.month
+                candidate = _add_months(start, steps)
+                if candidate > limit:
+                    candidate = _add_months(start, steps - 1)
+            elif delta:
+                candidate = start + delta * ((limit - start) // delta)
+            else:
+                candidate = start
+            if best is None or candidate > best:
+                best = candidate
+        index = bisect.bisect_right(self.instants, dt)
+        if index and (best is None or self.instants[index - 1] > best):
+            best = self.instants[index - 1]
+        return best
+
+    def format(self, dt):
+        """Format a timestamp as a WMS TIME value"""
+        months, delta = self.period
+        if (months or delta >= timedelta(days=1)) and dt.time() == datetime.min.time():
+            return dt.strftime('%Y-%m-%d')
+        return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def plan_timestamps(times, dimension=None):
+    """
+    Collapse requested times onto the distinct timestamps a layer provides
+    
+    Args:
+        times (list): Requested datetimes
+        dimension (TimeDimension, optional): Layer TIME dimension; without one
+            the layer is assumed to be daily
+    
+    Returns:
+        tuple: (list of distinct WMS TIME strings to fetch, list mapping each
+            requested time to an index into that list)
+    """
+    unique = []
+    positions = {}
+    index_map = []
+    for dt in times:
+        snapped = dimension.snap(dt) if dimension is not None else None
+        if snapped is not None:
+            time_str = dimension.format(snapped)
+        else:
+            time_str = to_utc(dt).strftime('%Y-%m-%d')
+        if time_str not in positions:
+            positions[time_str] = len(unique)
+            unique.append(time_str)
+        index_map.append(positions[time_str])
+    return unique, index_map
@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import Config
+
+# Status codes worth retrying; everything else is returned to the caller
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_lock = threading.Lock()
+_session = None
+_host_semaphores = {}
+
+
+def get_session():
+    """Return the process-wide keep-alive HTTP session"""
+    global _session
+    with _lock:
+        if _session is None:
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=Config.WMS_MAX_CONNECTIONS_PER_HOST
+            )
+            _session = requests.Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def host_semaphore(url):
+    """Return the semaphore limiting concurrent requests to the host of ``url``"""
+    host = urlsplit(url).netloc
+    with _lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(Config.WMS_MAX_CONNECTIONS_PER_HOST)
+            _host_semaphores[host] = semaphore
+        return semaphore
+
+
+def get_with_retry(url, params=None, retries=None, backoff=None, timeout=None):
+    """
+    GET ``url`` over the shared session, retrying transient failures
+    
+    Args:
+        url (str): Request URL
+        params (dict): Query string parameters
+        retries (int): Number of retries after the first attempt
+        backoff (float): Initial delay in seconds, doubled after every retry
+        timeout (float): Per-request timeout in seconds
+    
+    Returns:
+        requests.Response: The successful response
+    """
+    retries = Config.WMS_FETCH_RETRIES if retries is None else retries
+    backoff = Config.WMS_RETRY_BACKOFF if backoff is None else backoff
+    timeout = Config.WMS_REQUEST_TIMEOUT if timeout is None else timeout
+    session = get_session()
+
+    for attempt in range(retries + 1):
+        try:
+            with host_semaphore(url):
+                response = session.get(url, params=params, timeout=timeout)
+            if response.status_code not in RETRY_STATUS_CODES:
+                response.raise_for_status()
+                return response
+            error = requests.HTTPError(
+                f"{response.status_code} Server Error for url: {response.url}",
+                response=response
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+
+        if attempt == retries:
+            raise error
+        delay = backoff * (2 ** attempt)
+        logging.warning(f"Request to {url} failed ({error}), retrying in {delay:.1f}s")
+        time.sleep(delay)
@@ -1,11 +1,18 @@
 import logging
 
-def setup_logger():
+def setup_logger(level=logging.INFO, log_file='app.log'):
+    """
+    Configure the root logger once per process
+    
+    Args:
+        level (int or str): Root log level; DEBUG also enables per-frame diagnostics
+        log_file (str, optional): Also log to this file; None logs to the console only
+    """
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file))
     logging.basicConfig(
-        level=logging.INFO,
+        level=level,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('app.log'),
-            logging.StreamHandler()
-        ]
-    ) 
\ No newline at end of file
+        handlers=handlers
+    )
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from flask import current_app
+
+from .config import Config
+from .time_planner import is_recent
+
+
+class VideoCache:
+    """
+    Content-addressed store for rendered videos.
+
+    A video's filename is derived from a canonical hash of the request that
+    produced it, so identical requests map to the same file. Renders write to
+    a temporary file that is renamed into place only on success, so a
+    half-written video is never served. The directory is kept under a disk
+    quota by evicting the least recently used videos, judged by modification
+    time, which is bumped on every hit.
+
+    Renders can also be published progressively as HLS streams, one directory
+    per video under ``streams/``. Streams only bridge the time until the video
+    itself is ready, so they are dropped after ``stream_ttl`` seconds.
+    """
+
+    def __init__(self, video_dir=None, max_bytes=None, stream_ttl=None):
+        self.video_dir = video_dir or Config.VIDEO_DIR
+        self.max_bytes = Config.VIDEO_CACHE_BYTES if max_bytes is None else max_bytes
+        self.stream_ttl = Config.VIDEO_STREAM_TTL if stream_ttl is None else stream_ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(kind, params):
+        """
+        Return the content address for a render request
+
+        Renders covering today are keyed by a RECENT_IMAGERY_MAX_AGE time
+        bucket, so a later request renders the day again with newer imagery.
+        """
+        parts = [kind, _canonical(params)]
+        if any(is_recent(value) for value in params.values()):
+            parts.append(int(time.time() // Config.RECENT_IMAGERY_MAX_AGE))
+        canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def filename(kind, key, ext='.mp4'):
+        return f"{kind.replace('-', '_')}_{key[:16]}{ext}"
+
+    def path(self, filename):
+        return os.path.join(self.video_dir, filename)
+
+    @staticmethod
+    def stream_name(filename):
+        return os.path.splitext(filename)[0]
+
+    def stream_dir(self, name):
+        return os.path.join(self.video_dir, 'streams', name)
+
+    def open_stream(self, name):
+        """Return an empty stream directory for ``name``, discarding any left by an earlier attempt"""
+        self.remove_stream(name)
+        self.evict_streams()
+        path = self.stream_dir(name)
+        os.makedirs(path)
+        return path
+
+    def remove_stream(self, name):
+        shutil.rmtree(self.stream_dir(name), ignore_errors=True)
+
+    def evict_streams(self):
+        """Delete streams not written to for ``stream_ttl`` seconds"""
+        root = os.path.join(self.video_dir, 'streams')
+        try:
+            names = os.listdir(root)
+        except FileNotFoundError:
+            return
+        cutoff = time.time() - self.stream_ttl
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                expired = os.stat(path).st_mtime < cutoff
+            except FileNotFoundError:
+                continue
+            if expired:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def lookup(self, filename):
+        """Return True if ``filename`` has already been rendered, marking it as used"""
+        path = self.path(filename)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def render(self, filename, render):
+        """
+        Call ``render(tmp_path)`` and atomically move the result to ``filename``
+
+        The temporary file is removed if rendering fails, and the directory is
+        trimmed back under quota afterwards.
+        """
+        os.makedirs(self.video_dir, exist_ok=True)
+        root, ext = os.path.splitext(filename)
+        fd, tmp_path = tempfile.mkstemp(dir=self.video_dir, prefix=f".{root}.", suffix=ext)
+        os.close(fd)
+        try:
+            render(tmp_path)
+            if os.path.getsize(tmp_path) == 0:
+                raise RuntimeError("Render produced no video")
+            os.replace(tmp_path, self.path(filename))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.evict(keep=(filename,))
+        return self.path(filename)
+
+    def _iter_entries(self):
+        try:
+            names = os.listdir(self.video_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.startswith('.'):
+                continue  # Renders in progress
+            path = os.path.join(self.video_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if os.path.isfile(path):
+                yield path, stat.st_size, stat.st_mtime
+
+    def evict(self, keep=()):
+        """Delete least recently used videos until usage is within the quota"""
+        entries = sorted(self._iter_entries(), key=lambda entry: entry[2])
+        used = sum(size for _, size, _ in entries)
+        keep = {self.path(name) for name in keep}
+        removed = 0
+        for path, size, _ in entries:
+            if used <= self.max_bytes:
+                break
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass  # Already evicted by another process
+            used -= size
+        if removed:
+            logging.info(f"Evicted {removed} videos from {self.video_dir}")
+        return used
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _canonical(value):
+    """Normalise request parameters so equivalent requests hash identically"""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return round(float(value), 6)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def init_video_cache(app):
+    """Create and register the VideoCache on ``app``"""
+    cache = VideoCache(app.config['VIDEO_DIR'], app.config['VIDEO_CACHE_BYTES'],
+                       app.config['VIDEO_STREAM_TTL'])
+    app.extensions['video_cache'] = cache
+    return cache
+
+
+def get_video_cache():
+    """Return the VideoCache of the current app"""
+    return current_app.extensions['video_cache']
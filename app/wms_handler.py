@@ -4,20 +4,204 @@ import numpy as np
 from PIL import Image
 import io
 import logging
-from functools import lru_cache
-from skimage import exposure
-import cv2
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from itertools import chain, groupby, islice
+from .config import Config
+from .utils.http import get_with_retry
+from .raster_cache import RasterCache, get_raster_cache
+from .time_planner import TimeDimension, plan_timestamps
+from .enhance import SequenceEnhancer
+from .blend import iter_blend, linear_alphas
+from .similarity import DUPLICATE, classify_pair
+from .encoder import encode_video
+from .metrics import bind_context, inc, span
+
+
+class WMSClientRegistry:
+    """
+    Process-wide, thread-safe cache of parsed WMS capabilities and fetchers.
+
+    Capabilities are downloaded once per WMS URL and shared by every fetcher
+    for that URL. Once older than ``ttl`` seconds they are refreshed on a
+    background thread while callers keep using the previous document.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = Config.WMS_CAPABILITIES_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._clients = {}  # wms_url -> {'wms', 'loaded_at', 'refreshing'}
+        self._load_locks = {}  # wms_url -> lock serialising the first load
+        self._fetchers = {}  # (wms_url, layer_name) -> WMSImageFetcher
+
+    def get_client(self, wms_url):
+        """
+        Return a ready WebMapService for ``wms_url``
+
+        The first call for a URL blocks while capabilities are parsed; later
+        calls return immediately, scheduling a background refresh when stale.
+        """
+        with self._lock:
+            entry = self._clients.get(wms_url)
+            if entry is not None:
+                if (not entry['refreshing']
+                        and time.monotonic() - entry['loaded_at'] > self.ttl):
+                    entry['refreshing'] = True
+                    threading.Thread(
+                        target=self._refresh, args=(wms_url,), daemon=True
+                    ).start()
+                return entry['wms']
+            load_lock = self._load_locks.setdefault(wms_url, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._clients.get(wms_url)
+            if entry is None:
+                logging.info(f"Loading WMS capabilities from {wms_url}")
+                wms = WebMapService(wms_url)
+                entry = {'wms': wms, 'loaded_at': time.monotonic(), 'refreshing': False}
+                with self._lock:
+                    self._clients[wms_url] = entry
+            return entry['wms']
+
+    def _refresh(self, wms_url):
+        try:
+            wms = WebMapService(wms_url)
+        except Exception as e:
+            logging.warning(f"Failed to refresh WMS capabilities for {wms_url}: {str(e)}")
+            with self._lock:
+                entry = self._clients.get(wms_url)
+                if entry is not None:
+                    entry['refreshing'] = False
+            return
+        with self._lock:
+            self._clients[wms_url] = {
+                'wms': wms, 'loaded_at': time.monotonic(), 'refreshing': False
+            }
+        logging.info(f"Refreshed WMS capabilities for {wms_url}")
+
+    def get_fetcher(self, wms_url, layer_name):
+        """Return the shared WMSImageFetcher for (wms_url, layer_name)"""
+        key = (wms_url, layer_name)
+        with self._lock:
+            fetcher = self._fetchers.get(key)
+            if fetcher is None:
+                fetcher = WMSImageFetcher(wms_url, layer_name, registry=self)
+                self._fetchers[key] = fetcher
+        return fetcher
+
+    def clear(self):
+        """Drop all cached capabilities and fetchers"""
+        with self._lock:
+            self._clients.clear()
+            self._load_locks.clear()
+            self._fetchers.clear()
+
+
+_registry = WMSClientRegistry()
+
+
+def get_registry():
+    """Return the process-wide WMSClientRegistry"""
+    return _registry
+
+
+def get_fetcher(wms_url, layer_name):
+    """Return a ready, shared WMSImageFetcher for the given WMS URL and layer"""
+    return _registry.get_fetcher(wms_url, layer_name)
+
+
+def decode_image(data):
+    """Decode an encoded GetMap response into a uint8 RGB(A) or grayscale array"""
+    with span('decode', frames=1):
+        img_data = Image.open(io.BytesIO(data))
+        if img_data.mode not in ('L', 'RGB', 'RGBA'):
+            # Palette and 16-bit images would otherwise decode to raw indices/values
+            has_alpha = 'A' in img_data.mode or 'transparency' in img_data.info
+            img_data = img_data.convert('RGBA' if has_alpha else 'RGB')
+        return np.array(img_data)
+
+
+def decode_and_enhance(raw_images, shared_lut=False):
+    """Decode and enhance the encoded rasters of one sequence; runs in the enhancement processes"""
+    enhancer = SequenceEnhancer(shared=shared_lut)
+    images = []
+    for data in raw_images:
+        img = decode_image(data)
+        with span('enhance', frames=1):
+            images.append(enhancer(img))
+    return images
+
+
+_enhance_pool = None
+_enhance_pool_lock = threading.Lock()
+
+
+def get_enhance_pool():
+    """Return the process pool that decodes and enhances whole days, or None if disabled"""
+    global _enhance_pool
+    processes = Config.ENHANCE_PROCESSES
+    if processes is None:
+        # On one CPU the pickling round trip only adds cost
+        processes = os.cpu_count() or 1
+        if processes == 1:
+            return None
+    if processes == 0:
+        return None
+    with _enhance_pool_lock:
+        if _enhance_pool is None:
+            # spawn, since forking a process that runs torch and HTTP threads can deadlock
+            _enhance_pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _enhance_pool
+
+
+def _reset_enhance_pool(pool):
+    """Drop a broken pool so the next call to get_enhance_pool starts a fresh one"""
+    global _enhance_pool
+    with _enhance_pool_lock:
+        if _enhance_pool is pool:
+            _enhance_pool = None
+
+
+def peek(iterable, n):
+    """
+    Look at the first ``n`` items of an iterable without consuming them
+    
+    Returns:
+        tuple: (list of up to n leading items, iterator over all items)
+    """
+    iterator = iter(iterable)
+    head = list(islice(iterator, n))
+    return head, chain(head, iterator)
+
 
 class WMSImageFetcher:
-    def __init__(self, wms_url, layer_name):
-        self.wms = WebMapService(wms_url)
+    def __init__(self, wms_url, layer_name, registry=None, cache=None):
+        self.wms_url = wms_url
+        self._registry = registry or _registry
+        self.cache = cache or get_raster_cache()
+        self._time_dimension = None
         self.layer_name = layer_name
         # Standard bounds for the Earth in EPSG:4326
         self.max_bounds = (-180, -90, 180, 90)
         # Default interval in minutes between satellite images
         self.default_interval = 60  # 1 hour
 
-    def get_image_sequence(self, bbox, size, time_start, time_end, interval_minutes):
+    @property
+    def wms(self):
+        """Shared WebMapService client with cached capabilities"""
+        return self._registry.get_client(self.wms_url)
+
+    def get_image_sequence(self, bbox, size, time_start, time_end, interval_minutes,
+                           max_workers=None, shared_lut=None, progress_callback=None):
         """
         Fetch a sequence of satellite images from WMS service
         
@@ -27,82 +211,339 @@ class WMSImageFetcher:
             time_start (datetime): Start time
             time_end (datetime): End time
             interval_minutes (int): Time interval between images
+            max_workers (int, optional): Concurrent GetMap requests, defaults to
+                Config.WMS_FETCH_WORKERS. Use 1 for serial fetching.
+            shared_lut (bool, optional): Enhance every frame with the first
+                frame's LUT, defaults to Config.ENHANCE_SHARED_LUT
+            progress_callback (function, optional): Called with the percentage
+                of the requested timeline delivered so far
         
         Returns:
-            list: List of numpy arrays containing the images
+            list: List of uint8 numpy arrays containing the images, in timestamp order
+        """
+        return list(self.iter_image_sequence(
+            bbox, size, time_start, time_end, interval_minutes,
+            max_workers=max_workers, shared_lut=shared_lut,
+            progress_callback=progress_callback
+        ))
+
+    def iter_image_sequence(self, bbox, size, time_start, time_end, interval_minutes,
+                            max_workers=None, shared_lut=None, progress_callback=None):
+        """
+        Lazily fetch a sequence of satellite images from WMS service
+
+        Takes the same arguments as get_image_sequence. At most ``max_workers``
+        frames are fetched ahead of the consumer, so memory stays bounded no
+        matter how long the sequence is.
+
+        Yields:
+            numpy.ndarray: uint8 images in timestamp order
         """
         try:
-            images = []
-            current_time = time_start
-            
             # Validate inputs
             if not all(isinstance(x, (int, float)) for x in bbox):
                 raise ValueError("Invalid bbox coordinates")
             if time_end <= time_start:
                 raise ValueError("End time must be after start time")
             
-            # Ensure bbox is within valid Earth bounds
-            minx, miny, maxx, maxy = bbox
-            min_x, min_y, max_x, max_y = self.max_bounds
-            
-            # Prevent wrapping around the globe
-            if maxx - minx > 360:
-                maxx = minx + 360
-                logging.warning("Longitude span too large, limiting to 360 degrees")
-            
-            # Clamp to valid Earth bounds
-            minx = max(min_x, minx)
-            miny = max(min_y, miny)
-            maxx = min(max_x, maxx)
-            maxy = min(max_y, maxy)
-            
-            # Ensure the bbox doesn't cross the antimeridian (180/-180 line)
-            if minx < -180 and maxx > 180:
-                logging.warning("Bbox crosses antimeridian, adjusting to prevent image repetition")
-                if abs(minx + 180) < abs(maxx - 180):
-                    minx = -180
-                else:
-                    maxx = 180
-            
-            # Create adjusted bbox
-            adjusted_bbox = (minx, miny, maxx, maxy)
-            logging.info(f"Adjusted bbox: {adjusted_bbox}")
-                
-            while current_time <= time_end:
-                img = self.wms.getmap(
-                    layers=[self.layer_name],
-                    srs='EPSG:4326',
-                    bbox=adjusted_bbox,
-                    size=size,
-                    format='image/png',
-                    time=current_time.strftime('%Y-%m-%d')  # Format as YYYY-MM-DD
-                )
-                
-                # Convert to numpy array
-                img_data = Image.open(io.BytesIO(img.read()))
-                img_array = np.array(img_data)
-                
-                # Enhance image clarity by histogram equalization
-                img_array = exposure.equalize_hist(img_array)
+            adjusted_bbox, times, index_map = self._plan_sequence(
+                bbox, time_start, time_end, interval_minutes
+            )
 
-                # Enhance image clarity by contrast stretching
-                p2, p98 = np.percentile(img_array, (2, 98))
-                img_array = exposure.rescale_intensity(img_array, in_range=(p2, p98))
-                images.append(img_array)
-                
-                current_time += timedelta(minutes=interval_minutes)
+            max_workers = max_workers or Config.WMS_FETCH_WORKERS
+            def fetch(time_str):
+                return self._decode_image(self.get_cached_image(time_str, adjusted_bbox, size))
+
+            # Enhance image clarity with a uint8 histogram-equalization + contrast-stretch LUT
+            if shared_lut is None:
+                shared_lut = Config.ENHANCE_SHARED_LUT
+            enhancer = SequenceEnhancer(shared=shared_lut)
 
-            return images
+            # index_map is non-decreasing, so each fetched frame is needed only
+            # until the timeline moves past it
+            fetched = self._iter_fetched(fetch, times, max_workers)
+            delivered = 0
+            for _, repeats in groupby(index_map):
+                raw = next(fetched)
+                with span('enhance', frames=1):
+                    image = enhancer(raw)
+                for _ in repeats:
+                    yield image
+                    delivered += 1
+                    if progress_callback:
+                        progress_callback(delivered / len(index_map) * 100)
         except Exception as e:
             logging.error(f"Error fetching images: {str(e)}")
             raise 
 
-    @lru_cache(maxsize=100)
-    def get_cached_image(self, time_str, bbox_str):
-        # Implement caching for frequently requested images
-        pass 
+    def _plan_sequence(self, bbox, time_start, time_end, interval_minutes):
+        """
+        Plan the GetMap requests for a timeline
+        
+        Returns:
+            tuple: (adjusted bbox, distinct WMS TIME strings, index into them
+                for each requested time)
+        """
+        adjusted_bbox = self._adjust_bbox(bbox)
+        logging.info(f"Adjusted bbox: {adjusted_bbox}")
+
+        requested = []
+        current_time = time_start
+        while current_time <= time_end:
+            requested.append(current_time)
+            current_time += timedelta(minutes=interval_minutes)
+
+        # Only fetch the distinct timestamps the layer actually provides
+        times, index_map = plan_timestamps(requested, self.get_time_dimension())
+        logging.info(f"Planned {len(times)} GetMap requests for {len(requested)} timestamps")
+        return adjusted_bbox, times, index_map
 
-    def get_daily_video(self, bbox, size, date, output_path=None, fps=10):
+    def iter_days(self, bbox, size, start_date, end_date, max_days=None, shared_lut=None,
+                  on_day_failed=None, progress_callback=None):
+        """
+        Fetch the days of a date range in parallel and yield their images in date order
+        
+        Up to ``max_days`` days are fetched at once, each with an equal share of
+        Config.WMS_FETCH_WORKERS, and every GetMap still goes through the
+        per-host connection limit. Each day is then decoded and enhanced in
+        one call to the enhancement process pool, outside the GIL. Days are
+        yielded in order as soon as they and all earlier days are ready, so
+        at most ``max_days`` days are held in memory.
+        
+        A day that fails is logged, reported to ``on_day_failed`` and left out
+        instead of aborting the range.
+        
+        Args:
+            bbox (tuple): (minx, miny, maxx, maxy)
+            size (tuple): (width, height)
+            start_date (datetime): First day
+            end_date (datetime): Last day, inclusive
+            max_days (int, optional): Days in flight, defaults to Config.WMS_DAY_WORKERS
+            shared_lut (bool, optional): Share one enhancement LUT within each day,
+                defaults to Config.ENHANCE_SHARED_LUT
+            on_day_failed (function, optional): Called with the date string and
+                the exception of every day that failed
+            progress_callback (function, optional): Called with percent of days done
+        
+        Yields:
+            list: uint8 images of one day, in timestamp order
+        
+        Raises:
+            RuntimeError: If every day failed
+        """
+        days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        if not days:
+            return
+        max_days = max(1, min(max_days or Config.WMS_DAY_WORKERS, len(days)))
+        fetch_workers = max(1, Config.WMS_FETCH_WORKERS // max_days)
+        if shared_lut is None:
+            shared_lut = Config.ENHANCE_SHARED_LUT
+
+        # Day threads account their fetch and enhancement time to the caller's job
+        fetch_day = bind_context(
+            lambda day: self._fetch_day(day, bbox, size, fetch_workers, shared_lut)
+        )
+        executor = ThreadPoolExecutor(max_workers=max_days, thread_name_prefix='day')
+        pending = deque()
+        failures = 0
+        first_error = None
+        try:
+            remaining = iter(days)
+            for day in islice(remaining, max_days):
+                pending.append((day, executor.submit(fetch_day, day)))
+            for done, _ in enumerate(days, 1):
+                day, future = pending.popleft()
+                for next_day in islice(remaining, 1):
+                    pending.append((next_day, executor.submit(fetch_day, next_day)))
+                try:
+                    images = future.result()
+                except Exception as e:
+                    label = day.strftime('%Y-%m-%d')
+                    logging.warning(f"Skipping {label} of {self.layer_name}: {str(e)}")
+                    failures += 1
+                    first_error = first_error or e
+                    images = []
+                    if on_day_failed:
+                        on_day_failed(label, e)
+                if progress_callback:
+                    progress_callback(done / len(days) * 100)
+                if images:
+                    yield images
+        finally:
+            # Abandoned generators must not leave queued days behind
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+        if failures == len(days):
+            raise RuntimeError(f"All {len(days)} days failed, first error: {first_error}")
+
+    def _fetch_day(self, day, bbox, size, max_workers, shared_lut):
+        """Fetch, decode and enhance the images of one day"""
+        time_start = datetime.combine(day.date(), datetime.min.time())
+        time_end = datetime.combine(day.date(), datetime.max.time())
+        adjusted_bbox, times, index_map = self._plan_sequence(
+            bbox, time_start, time_end, self.default_interval
+        )
+        raw = list(self._iter_fetched(
+            lambda time_str: self.get_cached_image(time_str, adjusted_bbox, size), times, max_workers
+        ))
+
+        images = None
+        pool = get_enhance_pool()
+        if pool is not None:
+            try:
+                # Metrics recorded in the worker process are lost, so time the round trip here
+                with span('enhance', frames=len(raw)):
+                    images = pool.submit(decode_and_enhance, raw, shared_lut).result()
+            except BrokenProcessPool:
+                logging.warning("Enhancement process pool broke, enhancing in this thread")
+                _reset_enhance_pool(pool)
+        if images is None:
+            images = decode_and_enhance(raw, shared_lut)
+        # Repeated timestamps share one array, as in iter_image_sequence
+        return [images[i] for i in index_map]
+
+    @staticmethod
+    def _iter_fetched(fetch, times, max_workers):
+        """Yield ``fetch(t)`` for each time in order, keeping at most ``max_workers`` in flight"""
+        if max_workers == 1 or len(times) <= 1:
+            for time_str in times:
+                yield fetch(time_str)
+            return
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(times)))
+        pending = deque()
+        # Worker threads account their fetch and decode time to the caller's job
+        fetch = bind_context(fetch)
+        try:
+            remaining = iter(times)
+            for time_str in islice(remaining, max_workers):
+                pending.append(executor.submit(fetch, time_str))
+            while pending:
+                image = pending.popleft().result()
+                for time_str in islice(remaining, 1):
+                    pending.append(executor.submit(fetch, time_str))
+                yield image
+        finally:
+            # Abandoned generators must not leave queued requests behind
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def get_time_dimension(self):
+        """
+        Return the layer's TIME dimension from the cached capabilities
+        
+        Returns:
+            TimeDimension or None: None when the layer advertises no TIME dimension
+        """
+        wms = self.wms
+        cached = self._time_dimension
+        if cached is not None and cached[0] is wms:
+            return cached[1]
+        try:
+            layer = wms.contents.get(self.layer_name)
+            dimension = TimeDimension.from_layer(layer) if layer is not None else None
+        except (AttributeError, ValueError) as e:
+            logging.warning(f"Could not parse TIME dimension of {self.layer_name}: {str(e)}")
+            dimension = None
+        # Keyed on the client so refreshed capabilities are picked up
+        self._time_dimension = (wms, dimension)
+        return dimension
+
+    def _adjust_bbox(self, bbox):
+        """Clamp a bbox to valid Earth bounds without wrapping the globe"""
+        minx, miny, maxx, maxy = bbox
+        min_x, min_y, max_x, max_y = self.max_bounds
+        
+        # Prevent wrapping around the globe
+        if maxx - minx > 360:
+            maxx = minx + 360
+            logging.warning("Longitude span too large, limiting to 360 degrees")
+        
+        # Clamp to valid Earth bounds
+        minx = max(min_x, minx)
+        miny = max(min_y, miny)
+        maxx = min(max_x, maxx)
+        maxy = min(max_y, maxy)
+        
+        # Ensure the bbox doesn't cross the antimeridian (180/-180 line)
+        if minx < -180 and maxx > 180:
+            logging.warning("Bbox crosses antimeridian, adjusting to prevent image repetition")
+            if abs(minx + 180) < abs(maxx - 180):
+                minx = -180
+            else:
+                maxx = 180
+        
+        return (minx, miny, maxx, maxy)
+
+    def _getmap_request(self, time_str, bbox, size, format='image/png'):
+        """Build the GetMap URL and query parameters for a single frame"""
+        wms = self.wms
+        try:
+            base_url = next(m.get('url') for m in wms.getOperationByName('GetMap').methods
+                            if m.get('type', '').lower() == 'get')
+        except (KeyError, StopIteration):
+            base_url = self.wms_url
+        version = getattr(wms, 'version', '1.1.1')
+
+        params = {
+            'SERVICE': 'WMS',
+            'VERSION': version,
+            'REQUEST': 'GetMap',
+            'LAYERS': self.layer_name,
+            'STYLES': '',
+            'WIDTH': int(size[0]),
+            'HEIGHT': int(size[1]),
+            'FORMAT': format,
+            'TIME': time_str,
+        }
+        if version == '1.3.0':
+            # WMS 1.3.0 uses latitude/longitude axis order for EPSG:4326
+            minx, miny, maxx, maxy = bbox
+            params['CRS'] = 'EPSG:4326'
+            params['BBOX'] = ','.join(str(v) for v in (miny, minx, maxy, maxx))
+        else:
+            params['SRS'] = 'EPSG:4326'
+            params['BBOX'] = ','.join(str(v) for v in bbox)
+        return base_url.split('?')[0], params
+
+    def _fetch_raw(self, time_str, bbox, size, format='image/png'):
+        """Fetch the encoded GetMap response for a single frame"""
+        url, params = self._getmap_request(time_str, bbox, size, format)
+        with span('fetch', frames=1):
+            response = get_with_retry(url, params=params)
+        inc('bytes_fetched_total', len(response.content), help="Bytes downloaded from the WMS",
+            layer=self.layer_name)
+        content_type = response.headers.get('Content-Type', '').split(';')[0]
+        if not content_type.startswith('image/'):
+            raise ValueError(f"WMS returned {content_type or 'no content type'} "
+                             f"for {self.layer_name} at {time_str}: {response.text[:200]}")
+        return response.content
+
+    def _decode_image(self, data):
+        """Decode an encoded GetMap response into a uint8 RGB(A) or grayscale array"""
+        return decode_image(data)
+
+    def get_cached_image(self, time_str, bbox, size, format='image/png'):
+        """
+        Return the encoded GetMap response for a frame, fetching it on a cache miss
+        
+        Args:
+            time_str (str): WMS TIME value
+            bbox (tuple): (minx, miny, maxx, maxy), already adjusted
+            size (tuple): (width, height)
+            format (str): Image MIME type
+        
+        Returns:
+            bytes: Encoded image
+        """
+        key = RasterCache.make_key(self.layer_name, time_str, bbox, size, format)
+        return self.cache.get_or_fetch(
+            key, lambda: self._fetch_raw(time_str, bbox, size, format)
+        )
+
+    def get_daily_video(self, bbox, size, date, output_path=None, fps=10, progress_callback=None):
         """
         Fetch all available satellite images for a given day and create an interpolated video
         
@@ -112,6 +553,7 @@ class WMSImageFetcher:
             date (datetime.date or str): The date to fetch images for (YYYY-MM-DD)
             output_path (str, optional): Path to save the video file. If None, returns the video frames.
             fps (int): Frames per second for the output video
+            progress_callback (function, optional): Called with percent complete
             
         Returns:
             str or list: Path to the saved video file or list of interpolated frames
@@ -125,26 +567,28 @@ class WMSImageFetcher:
             time_start = datetime.combine(date, datetime.min.time())
             time_end = datetime.combine(date, datetime.max.time())
             
-            # Get the raw satellite images for the day
-            raw_images = self.get_image_sequence(
+            # Lazily fetch the raw satellite images for the day
+            raw_images = self.iter_image_sequence(
                 bbox=bbox,
                 size=size,
                 time_start=time_start,
                 time_end=time_end,
-                interval_minutes=self.default_interval
+                interval_minutes=self.default_interval,
+                progress_callback=progress_callback
             )
             
-            if len(raw_images) < 2:
+            head, raw_images = peek(raw_images, 2)
+            if len(head) < 2:
                 logging.warning(f"Not enough images found for date {date} to create a video")
-                return raw_images
+                return head
                 
             # Interpolate frames between the raw images
-            interpolated_frames = self._interpolate_frames(raw_images, fps)
+            interpolated_frames = self._iter_interpolated_frames(raw_images, fps)
             
             if output_path:
                 return self._save_video(interpolated_frames, output_path, fps, size)
             else:
-                return interpolated_frames
+                return list(interpolated_frames)
                 
         except Exception as e:
             logging.error(f"Error creating daily video: {str(e)}")
@@ -161,44 +605,50 @@ class WMSImageFetcher:
         Returns:
             list: List of interpolated frames
         """
+        return list(self._iter_interpolated_frames(images, fps))
+
+    def _iter_interpolated_frames(self, images, fps):
+        """
+        Lazily interpolate frames between satellite images
+
+        Args:
+            images (iterable): Raw satellite images, consumed one at a time
+            fps (int): Desired frames per second
+
+        Yields:
+            numpy.ndarray: Interpolated frames
+        """
         # Calculate how many frames to generate between each pair of images
         # Assuming images are taken at self.default_interval minutes apart
         frames_between = int((self.default_interval * 60) / fps)
         
-        interpolated_frames = []
-        
-        for i in range(len(images) - 1):
-            start_frame = images[i]
-            end_frame = images[i + 1]
-            
-            # Add the start frame
-            interpolated_frames.append(start_frame)
-            
-            # Generate intermediate frames
-            for j in range(1, frames_between):
-                # Calculate the weight for linear interpolation
-                alpha = j / frames_between
-                
-                # Linear interpolation between frames
-                interpolated = cv2.addWeighted(
-                    start_frame, 1 - alpha,
-                    end_frame, alpha,
-                    0
-                )
+        start_frame = None
+        for end_frame in images:
+            if start_frame is not None:
+                # Add the start frame
+                yield start_frame
                 
-                interpolated_frames.append(interpolated)
+                alphas = linear_alphas(frames_between - 1, frames_between)
+                if classify_pair(start_frame, end_frame, check_static=False) == DUPLICATE:
+                    # Nothing changes, so hold the frame instead of blending it with itself
+                    for _ in range(len(alphas)):
+                        yield start_frame
+                else:
+                    # Generate intermediate frames in vectorized batches,
+                    # weighting end_frame by j / frames_between
+                    yield from iter_blend(start_frame, end_frame, alphas)
+            start_frame = end_frame
                 
         # Add the last frame
-        interpolated_frames.append(images[-1])
-        
-        return interpolated_frames
+        if start_frame is not None:
+            yield start_frame
         
     def _save_video(self, frames, output_path, fps, size):
         """
         Save frames as a video file
         
         Args:
-            frames (list): List of frames to save
+            frames (iterable): Frames to save, consumed one at a time
             output_path (str): Path to save the video
             fps (int): Frames per second
             size (tuple): (width, height) of the video
@@ -206,20 +656,12 @@ class WMSImageFetcher:
         Returns:
             str: Path to the saved video file
         """
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, size)
-        
-        for frame in frames:
-            # Convert to BGR if the frame is in RGB format
-            if frame.shape[2] == 3:
-                frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-            out.write(frame)
-            
-        out.release()
+        encode_video(frames, output_path, fps=fps)
         logging.info(f"Video saved to {output_path}")
         return output_path 
 
-    def get_multi_day_video(self, bbox, size, start_date, end_date, output_path=None, fps=10):
+    def get_multi_day_video(self, bbox, size, start_date, end_date, output_path=None, fps=10,
+                            progress_callback=None, on_day_failed=None):
         """
         Fetch satellite images for a date range and create an interpolated video
         
@@ -230,43 +672,34 @@ class WMSImageFetcher:
             end_date (str): End date in YYYY-MM-DD format
             output_path (str): Path to save the video file
             fps (int): Frames per second for the output video
+            progress_callback (function, optional): Called with percent complete
+            on_day_failed (function, optional): Called with the date string and
+                exception of each day that could not be fetched; those days are
+                left out of the video
         """
         try:
             # Convert dates to datetime objects
             start_dt = datetime.strptime(start_date, '%Y-%m-%d')
             end_dt = datetime.strptime(end_date, '%Y-%m-%d')
             
-            # Get all images for the date range
-            current_dt = start_dt
-            all_images = []
-            
-            while current_dt <= end_dt:
-                # Get images for current day
-                time_start = datetime.combine(current_dt.date(), datetime.min.time())
-                time_end = datetime.combine(current_dt.date(), datetime.max.time())
-                
-                daily_images = self.get_image_sequence(
-                    bbox=bbox,
-                    size=size,
-                    time_start=time_start,
-                    time_end=time_end,
-                    interval_minutes=self.default_interval
-                )
-                
-                all_images.extend(daily_images)
-                current_dt += timedelta(days=1)
-                
-            if len(all_images) < 2:
+            # Days are fetched in parallel and chained back together in date order
+            days = self.iter_days(
+                bbox, size, start_dt, end_dt,
+                on_day_failed=on_day_failed,
+                progress_callback=progress_callback
+            )
+            head, all_images = peek(chain.from_iterable(days), 2)
+            if len(head) < 2:
                 logging.warning(f"Not enough images found between {start_date} and {end_date}")
                 return None
                 
             # Interpolate frames between all images
-            interpolated_frames = self._interpolate_frames(all_images, fps)
+            interpolated_frames = self._iter_interpolated_frames(all_images, fps)
             
             if output_path:
                 return self._save_video(interpolated_frames, output_path, fps, size)
             else:
-                return interpolated_frames
+                return list(interpolated_frames)
                 
         except Exception as e:
             logging.error(f"Error creating multi-day video: {str(e)}")
@@ -0,0 +1,105 @@
+"""
+Speed versus quality of the RIFE flow profiles.
+
+Interpolates the middle of a known triplet with every profile and reports
+the time per pair and the PSNR against the true middle frame:
+
+    python -m benchmarks.flow_benchmark --size 1280x720 --repeats 3
+    python -m benchmarks.flow_benchmark --frames day1.png day2.png day3.png
+
+Without --frames a synthetic triplet is used: a smooth random texture
+translated by a fixed shift, so the middle frame is known exactly.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.interpolator import RIFEInterpolator
+from model.RIFE.model.RIFE import FLOW_PROFILES
+
+
+def psnr(a, b):
+    """Peak signal-to-noise ratio in dB of two uint8 images"""
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def synthetic_triplet(width, height, shift=8, seed=0):
+    """Return (first, middle, last) frames of a texture moving ``shift`` pixels per frame"""
+    rng = np.random.default_rng(seed)
+    pad = 2 * shift
+    noise = rng.random((height + 2 * pad, width + 2 * pad, 3)).astype(np.float32)
+    texture = (cv2.GaussianBlur(noise, (0, 0), 3) * 255).clip(0, 255).astype(np.uint8)
+    texture = cv2.normalize(texture, None, 0, 255, cv2.NORM_MINMAX)
+
+    def frame(offset):
+        return np.ascontiguousarray(texture[pad:pad + height, pad + offset:pad + offset + width])
+
+    return frame(-shift), frame(0), frame(shift)
+
+
+def benchmark_profiles(first, middle, last, interpolator=None, profiles=None, repeats=3):
+    """
+    Time each flow profile on one pair and score it against the true middle frame
+
+    Returns:
+        list: One dict per profile with seconds per pair and PSNR in dB
+    """
+    interpolator = interpolator or RIFEInterpolator()
+    pair = interpolator.prepare_pair(first, last)
+    results = []
+    for profile in profiles or FLOW_PROFILES:
+        # One untimed run so lazily built grids and buffers are not counted
+        interpolator.interpolate_prepared(pair, 1, flow_profile=profile)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            frames = interpolator.interpolate_prepared(pair, 1, flow_profile=profile)
+        elapsed = (time.perf_counter() - start) / repeats
+        results.append({
+            'profile': profile,
+            'seconds_per_pair': round(elapsed, 4),
+            'psnr_db': round(psnr(frames[1], middle), 2),
+        })
+    return results
+
+
+def _load(path):
+    return cv2.cvtColor(cv2.imread(path, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', default='1280x720', help="WIDTHxHEIGHT of the synthetic triplet")
+    parser.add_argument('--frames', nargs=3, metavar='PATH', help="Real first, middle and last frames")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--threads', type=int, help="torch threads")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if args.frames:
+        first, middle, last = (_load(path) for path in args.frames)
+    else:
+        width, height = (int(v) for v in args.size.lower().split('x'))
+        first, middle, last = synthetic_triplet(width, height)
+
+    results = benchmark_profiles(first, middle, last, repeats=args.repeats)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'profile':<10} {'s/pair':>8} {'PSNR dB':>8}")
+        for row in results:
+            print(f"{row['profile']:<10} {row['seconds_per_pair']:>8.3f} {row['psnr_db']:>8.2f}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+End-to-end load test of the Flask app against the mock WMS.
+
+Starts benchmarks.mock_wms and the app from create_app on local ports, sends
+concurrent /generate-* requests, follows each job to completion and reports
+throughput, latency percentiles and memory as JSON:
+
+    python -m benchmarks.loadtest --route daily-video --requests 40 --concurrency 8
+    python -m benchmarks.loadtest --route rife-animation --latency 0.05 0.2 --error-rate 0.05
+
+Requests use distinct dates unless --identical is given, which instead
+exercises the result cache and single-flight rendering.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import requests
+from werkzeug.serving import make_server
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app, raster_cache
+from app.config import Config
+from app.raster_cache import RasterCache
+from benchmarks.mock_wms import MockWMSServer
+
+ROUTES = ('video', 'daily-video', 'multi-day-video', 'rife-animation')
+FIRST_DAY = date(2024, 3, 1)
+
+
+def make_payload(route, i, size, identical=False):
+    """Request body for the ``i``-th request to ``/generate-<route>``"""
+    day = FIRST_DAY + timedelta(days=0 if identical else i)
+    bbox = [-10.0, 30.0, 10.0, 45.0]
+    if route == 'video':
+        start = f"{day.isoformat()}T00:00:00Z"
+        return {'bbox': bbox, 'time_start': start, 'time_end': f"{day.isoformat()}T06:00:00Z"}
+    if route == 'daily-video':
+        # 240 fps over hourly images keeps it to 15 frames per pair
+        return {'bbox': bbox, 'date': day.isoformat(), 'fps': 240}
+    if route == 'multi-day-video':
+        return {'bbox': bbox, 'start_date': day.isoformat(),
+                'end_date': (day + timedelta(days=1)).isoformat(), 'fps': 240}
+    return {'bbox': bbox, 'start_date': day.isoformat(),
+            'end_date': (day + timedelta(days=2)).isoformat(),
+            'size': list(size), 'fps': 30, 'flow_profile': 'fast'}
+
+
+def percentiles(values):
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50': round(float(p50), 4), 'p95': round(float(p95), 4),
+            'p99': round(float(p99), 4), 'max': round(max(values), 4)}
+
+
+class MemorySampler:
+    """Samples this process's resident set in the background; the app runs in-process"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.start_mb = self.peak_mb = self._rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='memory-sampler')
+
+    @staticmethod
+    def _rss_mb():
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return 0.0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, self._rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _drive(base_url, route, payload, poll_interval, timeout):
+    """Submit one request and follow its job; returns the timing record"""
+    session = requests.Session()
+    started = time.perf_counter()
+    response = session.post(f"{base_url}/generate-{route}", json=payload, timeout=timeout)
+    submitted = time.perf_counter()
+    record = {'status': response.status_code, 'submit_s': submitted - started}
+    if response.status_code == 200:
+        record['state'] = 'done'  # Served from the result cache
+    elif response.status_code != 202:
+        record['state'] = 'rejected'
+    else:
+        status_url = base_url + response.json()['status_url']
+        deadline = started + timeout
+        while True:
+            job = session.get(status_url, timeout=timeout).json()
+            if job['state'] not in ('queued', 'running'):
+                record['state'] = job['state']
+                record['error'] = job.get('error')
+                break
+            if time.perf_counter() > deadline:
+                record['state'] = 'timeout'
+                break
+            time.sleep(poll_interval)
+    record['total_s'] = time.perf_counter() - started
+    return record
+
+
+def run_load(route='daily-video', total=20, concurrency=4, size=(320, 240), latency=0.0,
+             error_rate=0.0, job_workers=None, identical=False, layers=None, poll_interval=0.05,
+             timeout=600):
+    """
+    Run one load test and return its report
+
+    Args:
+        route (str): One of ROUTES, posted to /generate-<route>
+        total (int): Number of requests
+        concurrency (int): Clients sending requests at once
+        size (tuple): Frame size for rife-animation requests
+        latency (float or tuple): Mock GetMap latency, see MockWMSServer
+        error_rate (float): Fraction of mock GetMap requests that fail
+        job_workers (int, optional): Config.JOB_WORKERS for the app
+        identical (bool): Send the same request every time
+        layers (dict, optional): Mock WMS layers, see MockWMSServer
+    """
+    if route not in ROUTES:
+        raise ValueError(f"Unknown route {route!r}, expected one of {ROUTES}")
+
+    with tempfile.TemporaryDirectory() as tmp, MockWMSServer(
+            layers=layers, latency=latency, error_rate=error_rate) as wms:
+        class LoadTestConfig(Config):
+            WMS_URL = wms.url
+            VIDEO_DIR = os.path.join(tmp, 'videos')
+            RIFE_COMPILED_CACHE_DIR = os.path.join(tmp, 'rife')
+            RIFE_PRELOAD = route == 'rife-animation'
+            JOB_WORKERS = job_workers or Config.JOB_WORKERS
+            JOB_MAX_PENDING = max(Config.JOB_MAX_PENDING, total)
+            LOG_FILE = None
+
+        # Fetchers share the process-wide raster cache; keep it cold and out of the repo
+        raster_cache._raster_cache = RasterCache(cache_dir=os.path.join(tmp, 'rasters'))
+
+        app = create_app(LoadTestConfig)
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)  # One line per poll otherwise
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True, name='app')
+        server_thread.start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        try:
+            with MemorySampler() as memory, ThreadPoolExecutor(concurrency) as clients:
+                started = time.perf_counter()
+                futures = [
+                    clients.submit(_drive, base_url, route, make_payload(route, i, size, identical),
+                                   poll_interval, timeout)
+                    for i in range(total)
+                ]
+                records = [future.result() for future in futures]
+                elapsed = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            app.extensions['jobs'].shutdown(wait=False)
+            raster_stats = raster_cache._raster_cache.stats()
+            raster_cache._raster_cache = None
+
+        done = [r for r in records if r['state'] == 'done']
+        states = {}
+        for record in records:
+            states[record['state']] = states.get(record['state'], 0) + 1
+        return {
+            'route': route,
+            'requests': total,
+            'concurrency': concurrency,
+            'job_workers': LoadTestConfig.JOB_WORKERS,
+            'states': states,
+            'errors': sorted({r['error'] for r in records if r.get('error')}),
+            'elapsed_s': round(elapsed, 3),
+            'throughput_rps': round(len(done) / elapsed, 3) if elapsed else None,
+            'latency_s': percentiles([r['total_s'] for r in done]),
+            'submit_latency_s': percentiles([r['submit_s'] for r in records]),
+            'memory_mb': {'start': round(memory.start_mb, 1), 'peak': round(memory.peak_mb, 1)},
+            'wms': dict(wms.counts),
+            'raster_cache': raster_stats,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--route', choices=ROUTES, default='daily-video')
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--size', default='320x240', help="WIDTHxHEIGHT for rife-animation")
+    parser.add_argument('--latency', type=float, nargs='+', default=[0.0],
+                        help="Mock GetMap seconds, or MIN MAX for a uniform range")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--job-workers', type=int)
+    parser.add_argument('--identical', action='store_true', help="Send the same request every time")
+    parser.add_argument('--output', help="Write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    report = run_load(
+        route=args.route,
+        total=args.requests,
+        concurrency=args.concurrency,
+        size=tuple(int(v) for v in args.size.lower().split('x')),
+        latency=args.latency[0] if len(args.latency) == 1 else tuple(args.latency[:2]),
+        error_rate=args.error_rate,
+        job_workers=args.job_workers,
+        identical=args.identical,
+    )
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+"""
+Offline microbenchmarks for the interpolation, enhancement and encoding hot paths.
+
+Every case runs on synthetic images, so no network or model weights are
+needed. Results are written as JSON and can be compared against a stored
+baseline; any case slower than the baseline by more than the tolerance makes
+the run exit non-zero:
+
+    python -m benchmarks.microbench --output results.json
+    python -m benchmarks.microbench --compare benchmarks/baseline.json
+    python -m benchmarks.microbench --save-baseline benchmarks/baseline.json
+
+Baselines are machine-specific; record one on the machine that compares.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import torch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.encoder import encode_video, find_ffmpeg
+from app.enhance import SequenceEnhancer
+from app.interpolator import FrameInterpolator
+from app.wms_handler import WMSImageFetcher
+from model.RIFE.model.RIFE import Model
+
+DEFAULT_TOLERANCE = 0.25
+
+
+def synthetic_images(count, width, height, seed=0):
+    """Smooth, low-contrast RGB images that drift a little from one to the next"""
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    images = []
+    for i in range(count):
+        phase = i * 0.3
+        base = 100 + 40 * np.sin(xs / 37.0 + phase) * np.cos(ys / 53.0 - phase)
+        noise = rng.normal(0, 4, (height, width, 3))
+        images.append(np.clip(base[..., None] + noise, 0, 255).astype(np.uint8))
+    return images
+
+
+def _consume(iterable):
+    count = 0
+    for _ in iterable:
+        count += 1
+    return count
+
+
+def build_cases(quick=False):
+    """
+    Return ``{name: (setup, run)}``; ``setup()`` builds inputs outside the timed
+    region and ``run(inputs)`` is what gets measured
+    """
+    width, height = (160, 120) if quick else (800, 600)
+    count = 3 if quick else 6
+    cases = {}
+
+    def images():
+        return synthetic_images(count, width, height)
+
+    cases['frame_interpolator.interpolate_sequence'] = (
+        images, lambda imgs: FrameInterpolator().interpolate_sequence(imgs, n_frames=7)
+    )
+
+    fetcher = WMSImageFetcher('http://localhost/wms', 'benchmark')
+    # 240 fps over the default 60 minute interval gives 15 frames per pair
+    cases['wms_fetcher._interpolate_frames'] = (
+        images, lambda imgs: fetcher._interpolate_frames(imgs, fps=240)
+    )
+
+    cases['enhance.per_frame_lut'] = (
+        images, lambda imgs: [SequenceEnhancer(shared=False)(img) for img in imgs]
+    )
+    cases['enhance.shared_lut'] = (
+        images, lambda imgs: _consume(map(SequenceEnhancer(shared=True), imgs))
+    )
+
+    resolutions = [(128, 96)] if quick else [(256, 256), (640, 480), (1280, 720)]
+    for w, h in resolutions:
+        def model_inputs(w=w, h=h):
+            model = Model()
+            model.eval()
+            torch.manual_seed(0)
+            return model, torch.rand(1, 3, h, w), torch.rand(1, 3, h, w)
+
+        def inference(inputs):
+            model, img0, img1 = inputs
+            with torch.no_grad():
+                return model.inference(img0, img1)
+
+        cases[f'model.inference.{w}x{h}'] = (model_inputs, inference)
+
+    backends = ['opencv'] + (['ffmpeg'] if find_ffmpeg() else [])
+    for backend in backends:
+        def frames():
+            return synthetic_images(8 if quick else 60, width, height)
+
+        def encode(frames, backend=backend):
+            with tempfile.TemporaryDirectory() as tmp:
+                return encode_video(frames, os.path.join(tmp, 'bench.mp4'), fps=30, backend=backend)
+
+        cases[f'create_video.{backend}'] = (frames, encode)
+    return cases
+
+
+def _rss_kb(field):
+    """Read VmRSS or VmHWM from /proc, or None where it is unavailable"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """Reset the kernel's resident-set high-water mark (Linux only)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def measure(setup, run, repeats):
+    """
+    Time ``run(setup())`` and record the peak memory of one run
+
+    ``peak_mb`` is the peak traced Python/numpy allocation. ``peak_rss_mb`` is
+    the growth of the resident set, which also covers torch's allocator, and
+    is None off Linux.
+    """
+    inputs = setup()
+    run(inputs)  # Warm caches, grids and lazily loaded kernels
+
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        run(inputs)
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    peak_rss = None
+    if _reset_peak_rss():
+        before = _rss_kb('VmRSS')
+        run(inputs)
+        peak_rss = (_rss_kb('VmHWM') - before) / 1024
+
+    # Traced separately since tracemalloc slows allocation-heavy code down
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(inputs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'median_s': round(statistics.median(timings), 6),
+        'min_s': round(min(timings), 6),
+        'repeats': repeats,
+        'peak_mb': round(peak / 2 ** 20, 2),
+        'peak_rss_mb': None if peak_rss is None else round(max(peak_rss, 0.0), 2),
+    }
+
+
+def run_suite(quick=False, repeats=None, only=None):
+    """Run every case, or those whose name contains ``only``, and return the JSON report"""
+    repeats = repeats or (2 if quick else 5)
+    results = {}
+    for name, (setup, run) in build_cases(quick).items():
+        if only and only not in name:
+            continue
+        results[name] = measure(setup, run, repeats)
+        print(f"{name:<45} {results[name]['median_s'] * 1000:>10.2f} ms "
+              f"{results[name]['peak_mb']:>9.2f} MB traced "
+              f"{results[name]['peak_rss_mb'] or 0:>9.2f} MB rss", file=sys.stderr)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'torch': torch.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'torch_threads': torch.get_num_threads(),
+            'quick': quick,
+            # Process high-water mark, including torch allocations tracemalloc cannot see
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Return the cases that regressed against ``baseline``
+
+    A case regresses when its median time exceeds the baseline median by more
+    than ``tolerance``, or its peak memory exceeds the baseline by more than
+    ``tolerance`` plus some slack: 1 MB traced, 16 MB resident since the
+    resident set also moves with allocator caching.
+    """
+    if baseline.get('meta', {}).get('quick') != report['meta']['quick']:
+        raise ValueError("Baseline and report were run with different --quick settings")
+    regressions = []
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        if current['median_s'] > previous['median_s'] * (1 + tolerance):
+            regressions.append(f"{name}: {previous['median_s'] * 1000:.2f} ms -> "
+                               f"{current['median_s'] * 1000:.2f} ms")
+        if current['peak_mb'] > previous['peak_mb'] * (1 + tolerance) + 1:
+            regressions.append(f"{name}: {previous['peak_mb']:.2f} MB -> {current['peak_mb']:.2f} MB traced")
+        if (current.get('peak_rss_mb') is not None and previous.get('peak_rss_mb') is not None
+                and current['peak_rss_mb'] > previous['peak_rss_mb'] * (1 + tolerance) + 16):
+            regressions.append(f"{name}: {previous['peak_rss_mb']:.2f} MB -> "
+                               f"{current['peak_rss_mb']:.2f} MB resident")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    parser.add_argument('--compare', metavar='BASELINE', help="Fail on regressions against this report")
+    parser.add_argument('--save-baseline', metavar='PATH', help="Store this run as the baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown as a fraction, default %(default)s")
+    parser.add_argument('--repeats', type=int)
+    parser.add_argument('--only', help="Run only cases whose name contains this")
+    parser.add_argument('--quick', action='store_true', help="Small inputs, for smoke runs")
+    parser.add_argument('--threads', type=int, help="torch threads")
+    args = parser.parse_args(argv)
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    report = run_suite(quick=args.quick, repeats=args.repeats, only=args.only)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+    if not args.output and not args.save_baseline:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("Performance regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            return 1
+        print(f"No regressions against {args.compare}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+Local stand-in for the GIBS WMS, for offline load tests.
+
+Answers WMS 1.1.1 GetCapabilities and GetMap with deterministic synthetic
+PNGs: the same layer, time, bbox and size always produce the same image, and
+consecutive times drift smoothly so interpolation has something to do.
+Latency and errors can be injected:
+
+    python -m benchmarks.mock_wms --port 8081 --latency 0.05 --error-rate 0.02
+
+then point Config.WMS_URL at http://127.0.0.1:8081/wms.
+"""
+import argparse
+import hashlib
+import io
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.config import Config
+
+# Layers advertised by default, with their TIME extents
+DEFAULT_LAYERS = {
+    Config.WMS_LAYER: '2024-01-01T00:00:00Z/2024-12-31T23:00:00Z/PT1H',
+    Config.RIFE_WMS_LAYER: '2024-01-01/2024-12-31/P1D',
+}
+
+CAPABILITIES = """<?xml version="1.0" encoding="UTF-8"?>
+<WMT_MS_Capabilities version="1.1.1">
+  <Service>
+    <Name>OGC:WMS</Name>
+    <Title>Mock WMS</Title>
+    <OnlineResource xmlns:xlink="http://www.w3.org/1999/xlink" xlink:href="{url}"/>
+  </Service>
+  <Capability>
+    <Request>
+      <GetCapabilities>
+        <Format>application/vnd.ogc.wms_xml</Format>
+        <DCPType><HTTP><Get><OnlineResource xmlns:xlink="http://www.w3.org/1999/xlink" xlink:href="{url}?"/></Get></HTTP></DCPType>
+      </GetCapabilities>
+      <GetMap>
+        <Format>image/png</Format>
+        <Format>image/jpeg</Format>
+        <DCPType><HTTP><Get><OnlineResource xmlns:xlink="http://www.w3.org/1999/xlink" xlink:href="{url}?"/></Get></HTTP></DCPType>
+      </GetMap>
+    </Request>
+    <Exception><Format>application/vnd.ogc.se_xml</Format></Exception>
+    <Layer>
+      <Title>Mock layers</Title>
+      <SRS>EPSG:4326</SRS>
+      <LatLonBoundingBox minx="-180" miny="-90" maxx="180" maxy="90"/>
+{layers}
+    </Layer>
+  </Capability>
+</WMT_MS_Capabilities>
+"""
+
+LAYER = """      <Layer queryable="0">
+        <Name>{name}</Name>
+        <Title>{name}</Title>
+        <SRS>EPSG:4326</SRS>
+        <LatLonBoundingBox minx="-180" miny="-90" maxx="180" maxy="90"/>
+        <Dimension name="time" units="ISO8601"/>
+        <Extent name="time" default="{default}">{extent}</Extent>
+      </Layer>"""
+
+SERVICE_EXCEPTION = """<?xml version="1.0" encoding="UTF-8"?>
+<ServiceExceptionReport version="1.1.1"><ServiceException>{message}</ServiceException></ServiceExceptionReport>
+"""
+
+
+def synthetic_png(layer, time_str, bbox, width, height):
+    """Deterministic PNG whose pattern depends on the request and drifts with time"""
+    seed = int.from_bytes(hashlib.sha256(f"{layer}|{bbox}".encode()).digest()[:4], 'little')
+    try:
+        moment = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
+        phase = moment.timestamp() / 3600.0 / 6.0
+    except ValueError:
+        phase = 0.0
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    rng = np.random.default_rng(seed)
+    fx, fy = rng.uniform(20, 60, 2)
+    base = 0.5 + 0.35 * np.sin(xs / fx + phase) * np.cos(ys / fy - phase / 2)
+    tint = rng.uniform(0.6, 1.0, 3)
+    img = (base[..., None] * tint * 255).clip(0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(img).save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+class MockWMSServer:
+    """
+    Threaded mock WMS running in the background.
+
+    Args:
+        host, port: Where to listen; port 0 picks a free one
+        layers (dict, optional): Layer name to TIME extent, defaults to DEFAULT_LAYERS
+        latency (float or tuple): Seconds added to every GetMap, or a (min, max) range
+        error_rate (float): Fraction of GetMap requests answered with an error
+        error_status (int): HTTP status used for injected errors
+        seed (int): Seed for latency jitter and error injection
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, layers=None, latency=0.0, error_rate=0.0,
+                 error_status=503, seed=0):
+        self.layers = dict(layers or DEFAULT_LAYERS)
+        self.latency = latency if isinstance(latency, (tuple, list)) else (latency, latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._counts_lock = threading.Lock()
+        self.counts = {'capabilities': 0, 'getmap': 0, 'errors': 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/wms"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name='mock-wms')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _count(self, key):
+        with self._counts_lock:
+            self.counts[key] += 1
+
+    def _roll(self):
+        """Return (delay, inject_error) for one GetMap"""
+        with self._random_lock:
+            return self._random.uniform(*self.latency), self._random.random() < self.error_rate
+
+    def capabilities(self):
+        layers = '\n'.join(
+            LAYER.format(name=escape(name), extent=escape(extent), default=escape(extent.split('/')[0]))
+            for name, extent in self.layers.items()
+        )
+        return CAPABILITIES.format(url=escape(self.url), layers=layers)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass  # Keep load-test output readable
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _exception(self, message, status=200):
+                # Real WMS servers report most errors as XML with status 200
+                self._send(status, 'application/vnd.ogc.se_xml',
+                           SERVICE_EXCEPTION.format(message=escape(message)).encode())
+
+            def do_GET(self):
+                params = {k.upper(): v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                request = params.get('REQUEST', '').lower()
+                if request == 'getcapabilities':
+                    server._count('capabilities')
+                    self._send(200, 'application/vnd.ogc.wms_xml', server.capabilities().encode())
+                elif request == 'getmap':
+                    self._getmap(params)
+                else:
+                    self._exception(f"Unsupported request {params.get('REQUEST')!r}")
+
+            def _getmap(self, params):
+                server._count('getmap')
+                delay, fail = server._roll()
+                if delay:
+                    time.sleep(delay)
+                if fail:
+                    server._count('errors')
+                    self._exception("Injected error", status=server.error_status)
+                    return
+                layer = params.get('LAYERS', '')
+                if layer not in server.layers:
+                    self._exception(f"Unknown layer {layer!r}")
+                    return
+                try:
+                    width, height = int(params['WIDTH']), int(params['HEIGHT'])
+                except (KeyError, ValueError):
+                    self._exception("WIDTH and HEIGHT are required")
+                    return
+                body = synthetic_png(layer, params.get('TIME', ''), params.get('BBOX', ''), width, height)
+                self._send(200, 'image/png', body)
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, nargs='+', default=[0.0],
+                        help="Seconds per GetMap, or MIN MAX for a uniform range")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    args = parser.parse_args(argv)
+
+    latency = args.latency[0] if len(args.latency) == 1 else tuple(args.latency[:2])
+    server = MockWMSServer(args.host, args.port, latency=latency,
+                           error_rate=args.error_rate, error_status=args.error_status)
+    print(f"Mock WMS listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,13 +3,81 @@ import torch.nn as nn
 import numpy as np
 from torch.optim import AdamW
 import torch.nn.functional as F
+import os
+import logging
+import threading
+from collections import OrderedDict
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+class FlowState:
+    """Padded input pair and its bidirectional flow, as returned by Model.estimate_flow"""
+    def __init__(self, img0, img1, flow, h, w):
+        self.img0 = img0
+        self.img1 = img1
+        self.flow = flow
+        self.h = h
+        self.w = w
+
+    def crop(self, output):
+        """Remove the padding added for the multi-scale architecture"""
+        if output.shape[2] != self.h or output.shape[3] != self.w:
+            output = output[:, :, :self.h, :self.w]
+        return output
+
+# Flow estimation profiles: the pyramid scales IFNet runs at and the longest
+# side flow is estimated at. Larger inputs are downscaled, and the flow is
+# upsampled back so warping always happens at full resolution.
+FLOW_PROFILES = {
+    'quality': {'scales': (8, 4, 2, 1), 'max_side': None},
+    'balanced': {'scales': (8, 4, 2, 1), 'max_side': 1024},
+    'fast': {'scales': (8, 4, 2), 'max_side': 512},
+}
+
+def get_flow_profile(name=None):
+    """Return the FLOW_PROFILES entry for ``name``, defaulting to 'quality'"""
+    if isinstance(name, dict):
+        return name
+    try:
+        return FLOW_PROFILES[name or 'quality']
+    except KeyError:
+        raise ValueError(f"Unknown flow profile {name!r}, expected one of {sorted(FLOW_PROFILES)}")
+
+def _tile_spans(length, tile, overlap):
+    """Overlapping slices of ``tile`` pixels covering ``length``; the last one is flush with the edge"""
+    if length <= tile:
+        return [slice(0, length)]
+    stride = tile - overlap
+    starts = list(range(0, length - tile, stride)) + [length - tile]
+    return [slice(start, start + tile) for start in starts]
+
+def _feather(span, length, overlap, like):
+    """1-D blend weights for a tile: linear ramps over the overlap on edges shared with another tile"""
+    n = span.stop - span.start
+    weights = torch.ones(n, device=like.device, dtype=like.dtype)
+    if overlap <= 0:
+        return weights
+    ramp = torch.arange(1, n + 1, device=like.device, dtype=like.dtype) / (overlap + 1)
+    if span.start > 0:
+        weights = torch.minimum(weights, ramp)
+    if span.stop < length:
+        weights = torch.minimum(weights, ramp.flip(0))
+    return weights
+
 class Model:
+    # Measured peak IFNet working set per input pixel, in elements, across all four scales
+    FLOW_ELEMENTS_PER_PIXEL = 128
+    # Identity grids kept, least recently used first out; request sizes come from browser windows
+    GRID_CACHE_SIZE = 4
+
     def __init__(self, local_rank=-1):
         self.flownet = IFNet()
+        self.weights_loaded = False  # Untrained weights are random and differ per instance
         self.to_device()
+        # Sampling grids keyed by (H, W, device, dtype) and per-thread scratch buffers
+        self._grids = OrderedDict()
+        self._grids_lock = threading.Lock()
+        self._buffers = threading.local()
         
     def eval(self):
         self.flownet.eval()
@@ -17,12 +85,47 @@ class Model:
     def to_device(self):
         self.flownet.to(device)
 
+    def load_model(self, path):
+        """Load ``flownet.pkl`` weights from ``path``, stripping DataParallel prefixes"""
+        state_dict = torch.load(os.path.join(path, 'flownet.pkl'), map_location=device)
+        state_dict = {k.replace('module.', '', 1): v for k, v in state_dict.items()}
+        self.flownet.load_state_dict(state_dict)
+        self.weights_loaded = True
+
+    def compile(self, precision='fp32', cache_dir=None, tolerance=None):
+        """Swap IFNet for a compiled CPU version, see cpu_backend.compile_ifnet"""
+        if device.type != 'cpu':
+            logging.info("Compiled IFNet targets CPU serving, keeping the eager model on GPU")
+            return self.flownet
+        if cache_dir and not self.weights_loaded:
+            # Random weights hash differently on every start, so artifacts would only pile up
+            logging.info("No RIFE weights loaded, not caching the compiled IFNet")
+            cache_dir = None
+        from .cpu_backend import compile_ifnet
+        self.flownet = compile_ifnet(self.flownet, precision, cache_dir, tolerance)
+        return self.flownet
+
     def inference(self, img0, img1, timestep=0.5):
+        return self.warp_blend(self.estimate_flow(img0, img1), timestep)
+
+    def estimate_flow(self, img0, img1, profile=None):
+        """
+        Run IFNet once for a pair; the result can be warped to any timestep
+        
+        Args:
+            img0, img1 (torch.Tensor): Images of shape (B, 3, H, W)
+            profile (str, optional): Key of FLOW_PROFILES, defaults to 'quality'
+        """
         # Ensure inputs have correct number of channels (3 each)
         assert img0.shape[1] == 3 and img1.shape[1] == 3, "Input images must have 3 channels each"
+        profile = get_flow_profile(profile)
         
-        # Ensure input dimensions are divisible by 32 (required for the multi-scale architecture)
         h, w = img0.shape[2], img0.shape[3]
+        max_side = profile['max_side']
+        if max_side and max(h, w) > max_side:
+            return self._estimate_flow_downscaled(img0, img1, profile)
+        
+        # Ensure input dimensions are divisible by 32 (required for the multi-scale architecture)
         ph = ((h - 1) // 32 + 1) * 32
         pw = ((w - 1) // 32 + 1) * 32
         padding = (0, pw - w, 0, ph - h)
@@ -32,7 +135,7 @@ class Model:
         img1 = F.pad(img1, padding)
         
         imgs = torch.cat((img0, img1), 1)
-        scale_list = [8, 4, 2, 1]
+        scale_list = profile['scales']
         flow = 0
         
         for scale in scale_list:
@@ -43,44 +146,177 @@ class Model:
             
             flow_comp = self.flownet(img_)
             if scale != 1:
-                flow_comp = F.interpolate(flow_comp, scale_factor=scale, mode="bilinear", align_corners=False) * scale
+                # Resize to the scale-1 output size; scale_factor alone leaves
+                # off-by-rounding sizes when ph / scale is not a multiple of 8
+                flow_comp = F.interpolate(flow_comp, size=(ph // 8, pw // 8), mode="bilinear", align_corners=False) * scale
             flow = flow + flow_comp
         
         # Ensure flow has correct dimensions
-        flow = F.interpolate(flow, size=(ph, pw), mode="bilinear", align_corners=False)
+        if flow.shape[2:] != (ph, pw):
+            flow = F.interpolate(flow, size=(ph, pw), mode="bilinear", align_corners=False)
+        return FlowState(img0, img1, flow, h, w)
+
+    def _estimate_flow_downscaled(self, img0, img1, profile):
+        """Estimate flow with the longest side capped at the profile's max_side and upsample it"""
+        h, w = img0.shape[2], img0.shape[3]
+        factor = profile['max_side'] / max(h, w)
+        sh, sw = max(1, round(h * factor)), max(1, round(w * factor))
+        small0 = F.interpolate(img0, size=(sh, sw), mode="bilinear", align_corners=False)
+        small1 = F.interpolate(img1, size=(sh, sw), mode="bilinear", align_corners=False)
+        small = self.estimate_flow(small0, small1, profile=dict(profile, max_side=None))
         
-        middle = timestep
-        flow_0_1 = flow[:, :2]
-        flow_1_0 = flow[:, 2:]
+        flow = F.interpolate(small.crop(small.flow), size=(h, w), mode="bilinear", align_corners=False)
+        # Flow is in pixels, so rescale x and y displacements to the full size
+        flow[:, 0::2] *= w / sw
+        flow[:, 1::2] *= h / sh
+        return FlowState(img0, img1, flow, h, w)
+
+    @classmethod
+    def tile_size_for_budget(cls, max_bytes, element_size=4):
+        """Largest square tile, a multiple of 32, whose flow estimation fits ``max_bytes``"""
+        side = int((max_bytes / (cls.FLOW_ELEMENTS_PER_PIXEL * element_size)) ** 0.5)
+        return max(64, side // 32 * 32)
+
+    def estimate_flow_tiled(self, img0, img1, max_bytes=None, overlap=64, profile=None):
+        """
+        Estimate flow tile by tile so peak memory is bounded by ``max_bytes``
         
-        flow_t_0 = -(1-middle) * middle * flow_0_1 + (middle**2) * flow_1_0
-        flow_t_1 = ((1-middle)**2) * flow_0_1 - middle * (1-middle) * flow_1_0
+        Frames are split into overlapping square tiles whose side is a multiple
+        of 32, IFNet runs on each tile, and the tile flows are feathered across
+        the overlaps into one full-frame flow. Warping then happens on the whole
+        frame, so samples near a seam can still come from the neighbouring tile.
+        Frames that fit the budget are estimated in one pass.
         
-        warped_img0 = self.warp(img0, flow_t_0)
-        warped_img1 = self.warp(img1, flow_t_1)
+        Args:
+            img0, img1 (torch.Tensor): Images of shape (B, 3, H, W)
+            max_bytes (int, optional): Memory budget for one IFNet pass
+            overlap (int): Pixels shared by neighbouring tiles
+            profile (str, optional): Flow profile, see estimate_flow
         
-        output = (1-middle) * warped_img0 + middle * warped_img1
+        Returns:
+            FlowState: Same as estimate_flow
+        """
+        _, _, h, w = img0.shape
+        tile = self.tile_size_for_budget(max_bytes, img0.element_size()) if max_bytes else max(h, w)
+        # Profiles that cap the working resolution may not need tiling at all
+        max_side = get_flow_profile(profile)['max_side']
+        if max(h, w) <= tile or (max_side and max_side <= tile):
+            return self.estimate_flow(img0, img1, profile=profile)
+        overlap = min(overlap, tile // 2)
         
-        # Remove padding
-        if pw != w or ph != h:
-            output = output[:, :, :h, :w]
+        flow = img0.new_zeros((img0.shape[0], 4, h, w))
+        weight = img0.new_zeros((1, 1, h, w))
+        for ys in _tile_spans(h, tile, overlap):
+            wy = _feather(ys, h, overlap, img0)
+            for xs in _tile_spans(w, tile, overlap):
+                mask = wy[:, None] * _feather(xs, w, overlap, img0)[None, :]
+                state = self.estimate_flow(img0[:, :, ys, xs], img1[:, :, ys, xs], profile=profile)
+                # Flow is in pixels, so tile flows can be blended directly
+                flow[:, :, ys, xs].addcmul_(state.crop(state.flow), mask)
+                weight[:, :, ys, xs] += mask
+                del state
+        flow /= weight
+        return FlowState(img0, img1, flow, h, w)
+
+    def warp_blend(self, state, timestep=0.5):
+        """Warp both images of an estimated pair to ``timestep`` and blend them"""
+        return next(self.iter_warp_blend(state, [timestep]))
+
+    def warp_blend_batch(self, state, timesteps, max_batch_bytes=None):
+        """
+        Warp and blend an estimated pair at several timesteps at once
         
-        return output
+        Args:
+            state (FlowState): Result of estimate_flow for a single pair
+            timesteps (sequence): Timesteps in [0, 1]
+            max_batch_bytes (int, optional): Memory budget per batch; timesteps
+                are processed in chunks that fit it. None processes all at once.
+        
+        Returns:
+            torch.Tensor: Frames of shape (len(timesteps), C, h, w)
+        """
+        return torch.cat(list(self.iter_warp_blend(state, timesteps, max_batch_bytes)), 0)
 
-    def warp(self, img, flow):
-        B, C, H, W = img.size()
-        # Create meshgrid
-        xx = torch.linspace(-1, 1, W).view(1, 1, 1, W).expand(B, -1, H, -1)
-        yy = torch.linspace(-1, 1, H).view(1, 1, H, 1).expand(B, -1, -1, W)
-        grid = torch.cat([xx, yy], 1).to(device)
+    def iter_warp_blend(self, state, timesteps, max_batch_bytes=None):
+        """Yield batches of frames from warp_blend_batch, one memory-bounded chunk at a time"""
+        timesteps = torch.as_tensor(timesteps, dtype=state.flow.dtype, device=state.flow.device)
+        _, C, H, W = state.img0.shape
+        if max_batch_bytes:
+            # Per timestep: two flows and two sampling grids (2 channels each),
+            # two warped images and the blended output
+            per_step = (4 * 2 + 3 * C) * H * W * state.flow.element_size()
+            chunk = max(1, int(max_batch_bytes // per_step))
+        else:
+            chunk = max(1, len(timesteps))
         
+        flow_0_1 = state.flow[:, :2]
+        flow_1_0 = state.flow[:, 2:]
+        in_place = not (torch.is_grad_enabled() and state.flow.requires_grad)
+        for start in range(0, len(timesteps), chunk):
+            middle = timesteps[start:start + chunk].view(-1, 1, 1, 1)
+            n = middle.shape[0]
+            
+            if in_place:
+                # Build both intermediate flows in reused scratch buffers
+                shape = (n, 2, H, W)
+                flow_t_0 = self._scratch('flow_t_0', shape, state.flow)
+                flow_t_1 = self._scratch('flow_t_1', shape, state.flow)
+                torch.mul(flow_0_1, -(1-middle) * middle, out=flow_t_0).addcmul_(flow_1_0, middle**2)
+                torch.mul(flow_0_1, (1-middle)**2, out=flow_t_1).addcmul_(flow_1_0, -middle * (1-middle))
+            else:
+                flow_t_0 = -(1-middle) * middle * flow_0_1 + (middle**2) * flow_1_0
+                flow_t_1 = ((1-middle)**2) * flow_0_1 - middle * (1-middle) * flow_1_0
+            
+            # One grid_sample over the whole batch per input image
+            warped_img0 = self.warp(state.img0.expand(n, -1, -1, -1), flow_t_0)
+            warped_img1 = self.warp(state.img1.expand(n, -1, -1, -1), flow_t_1)
+            
+            if in_place:
+                # grid_sample returns fresh tensors, so blend into the first one
+                output = warped_img0.mul_(1-middle).addcmul_(warped_img1, middle)
+            else:
+                output = (1-middle) * warped_img0 + middle * warped_img1
+            yield state.crop(output)
+
+    def _base_grid(self, H, W, like):
+        """Cached identity sampling grid (1, H, W, 2) and pixel-to-grid flow scale, see GRID_CACHE_SIZE"""
+        key = (H, W, like.device, like.dtype)
+        with self._grids_lock:
+            cached = self._grids.get(key)
+            if cached is not None:
+                self._grids.move_to_end(key)
+                return cached
+        xx = torch.linspace(-1, 1, W, device=like.device, dtype=like.dtype).view(1, 1, W).expand(1, H, W)
+        yy = torch.linspace(-1, 1, H, device=like.device, dtype=like.dtype).view(1, H, 1).expand(1, H, W)
+        grid = torch.stack([xx, yy], -1).contiguous()
         # Normalize flow values to [-1, 1]
-        flow = flow.clone()
-        flow[:, 0] = flow[:, 0] / ((W-1.0) / 2.0)
-        flow[:, 1] = flow[:, 1] / ((H-1.0) / 2.0)
+        scale = torch.tensor([2.0 / (W-1.0), 2.0 / (H-1.0)], device=like.device, dtype=like.dtype)
+        cached = (grid, scale)
+        with self._grids_lock:
+            self._grids[key] = cached
+            while len(self._grids) > self.GRID_CACHE_SIZE:
+                self._grids.popitem(last=False)
+        return cached
+
+    def _scratch(self, name, shape, like):
+        """Per-thread reusable buffer, reallocated only when the shape changes"""
+        buffers = self._buffers.__dict__
+        key = (name, like.device, like.dtype)
+        buffer = buffers.get(key)
+        if buffer is None or buffer.shape != shape:
+            buffer = buffers[key] = torch.empty(shape, device=like.device, dtype=like.dtype)
+        return buffer
+
+    def warp(self, img, flow):
+        B, C, H, W = img.size()
+        grid, scale = self._base_grid(H, W, flow)
         
-        # Add flow to grid
-        grid_ = (grid + flow).permute(0, 2, 3, 1)
+        # Add normalized flow to the cached grid
+        if torch.is_grad_enabled() and flow.requires_grad:
+            grid_ = grid + flow.permute(0, 2, 3, 1) * scale
+        else:
+            grid_ = self._scratch('grid', (B, H, W, 2), flow)
+            torch.mul(flow.permute(0, 2, 3, 1), scale, out=grid_).add_(grid)
         output = F.grid_sample(img, grid_, mode='bilinear', padding_mode='border', align_corners=True)
         return output
 
@@ -0,0 +1,196 @@
+"""
+Compiled CPU backend for IFNet.
+
+The eager module is traced with channels_last inputs, frozen so conv+ReLU
+pairs are fused and weights are prepacked, and saved to disk keyed by a hash
+of its weights so later processes load it instead of recompiling. Three
+precisions are supported:
+
+    fp32  TorchScript only, numerically equivalent to eager
+    bf16  bfloat16 weights and activations, fast on CPUs with AVX512-BF16/AMX
+    int8  static post-training quantization with FX; Conv2d+ReLU become fused
+          quantized kernels. Dynamic quantization does not cover Conv2d, so
+          activations are calibrated on synthetic image pairs instead.
+"""
+import copy
+import hashlib
+import logging
+import os
+import tempfile
+import warnings
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+PRECISIONS = ('fp32', 'bf16', 'int8')
+
+# Largest relative flow error accepted from the accuracy check, per precision
+DEFAULT_TOLERANCE = {'fp32': 1e-4, 'bf16': 0.05, 'int8': 0.1}
+
+# Bump when the compilation recipe changes so stale artifacts are not loaded
+_CACHE_VERSION = 1
+
+
+class CompiledIFNet(nn.Module):
+    """Wraps a compiled IFNet so it takes and returns float32 tensors like the eager one"""
+
+    def __init__(self, module, precision):
+        super().__init__()
+        self.module = module
+        self.precision = precision
+        self.input_dtype = torch.bfloat16 if precision == 'bf16' else torch.float32
+
+    def forward(self, x):
+        x = x.to(self.input_dtype).contiguous(memory_format=torch.channels_last)
+        return self.module(x).float()
+
+
+def weights_key(flownet, precision):
+    """Content hash of a module's weights and the compilation settings"""
+    digest = hashlib.sha256(f"{_CACHE_VERSION}:{precision}:{torch.__version__}".encode())
+    for name, tensor in sorted(flownet.state_dict().items()):
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+
+def example_inputs(shape=(1, 6, 256, 256), count=4, seed=0):
+    """
+    Synthetic IFNet inputs: smooth random textures paired with a shifted copy
+
+    Used to trace the network, calibrate int8 activations and check accuracy.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    batch, channels, height, width = shape
+    inputs = []
+    for i in range(count):
+        coarse = torch.rand(batch, channels // 2, height // 16, width // 16, generator=generator)
+        img = F.interpolate(coarse, size=(height, width), mode='bilinear', align_corners=False)
+        shifted = torch.roll(img, shifts=(i + 1, 2 * (i + 1)), dims=(2, 3))
+        inputs.append(torch.cat((img, shifted), 1))
+    return inputs
+
+
+def check_accuracy(eager, compiled, inputs):
+    """
+    Compare compiled flow against the eager model
+
+    Returns:
+        dict: max_abs and mean_abs error, and max_abs relative to the eager flow range
+    """
+    max_abs = mean_abs = scale = 0.0
+    with torch.no_grad():
+        for x in inputs:
+            expected = eager(x)
+            error = (compiled(x) - expected).abs()
+            max_abs = max(max_abs, error.max().item())
+            mean_abs = max(mean_abs, error.mean().item())
+            scale = max(scale, expected.abs().max().item())
+    return {
+        'max_abs': max_abs,
+        'mean_abs': mean_abs,
+        'relative': max_abs / scale if scale else max_abs,
+    }
+
+
+def int8_supported():
+    """FX static quantization with QConfigMapping, as used for int8, needs torch 1.13 or newer"""
+    try:
+        import torch.ao.quantization.quantize_fx
+    except ImportError:
+        return False
+    return hasattr(torch.ao.quantization, 'get_default_qconfig_mapping')
+
+
+def _build(flownet, precision, inputs):
+    eager = copy.deepcopy(flownet).cpu().eval()
+    example = inputs[0]
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # Tracer and quantization deprecation chatter
+        if precision == 'int8':
+            from torch.ao.quantization import get_default_qconfig_mapping
+            from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+            prepared = prepare_fx(eager, get_default_qconfig_mapping('x86'), (example,))
+            for x in inputs:
+                prepared(x)  # Calibrate activation ranges
+            module = convert_fx(prepared)
+        elif precision == 'bf16':
+            module = eager.to(torch.bfloat16)
+            example = example.to(torch.bfloat16)
+        else:
+            module = eager
+        module = module.to(memory_format=torch.channels_last)
+        traced = torch.jit.trace(module, example.contiguous(memory_format=torch.channels_last))
+        # Freezing inlines weights and fuses conv+ReLU for the CPU kernels
+        return torch.jit.freeze(traced)
+
+
+def compile_ifnet(flownet, precision='fp32', cache_dir=None, tolerance=None):
+    """
+    Return a compiled CPU version of ``flownet``, loading it from ``cache_dir`` when possible
+
+    A freshly built module is checked against the eager model on synthetic
+    inputs; if its relative error exceeds ``tolerance`` the eager module is
+    returned instead, so a bad compile never reaches serving; so is it when
+    compiling fails altogether. On torch versions without FX quantization,
+    int8 falls back to fp32.
+
+    Args:
+        flownet (IFNet): Eager module with weights loaded
+        precision (str): 'fp32', 'bf16' or 'int8'
+        cache_dir (str, optional): Directory for compiled artifacts; None disables caching
+        tolerance (float, optional): Defaults to DEFAULT_TOLERANCE[precision]
+
+    Returns:
+        nn.Module: CompiledIFNet, or ``flownet`` if the accuracy check failed
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+    if precision == 'int8' and not int8_supported():
+        logging.warning(f"int8 IFNet needs torch 1.13 or newer, found {torch.__version__}; compiling fp32")
+        precision = 'fp32'
+    tolerance = DEFAULT_TOLERANCE[precision] if tolerance is None else tolerance
+
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, f"ifnet-{precision}-{weights_key(flownet, precision)[:16]}.pt")
+        if os.path.exists(path):
+            logging.info(f"Loading compiled IFNet from {path}")
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', FutureWarning)
+                    module = torch.jit.load(path, map_location='cpu')
+                return CompiledIFNet(module, precision).eval()
+            except Exception as e:
+                logging.warning(f"Could not load {path}, recompiling: {str(e)}")
+
+    try:
+        compiled = CompiledIFNet(_build(flownet, precision, example_inputs()), precision).eval()
+        accuracy = check_accuracy(flownet.cpu().eval(), compiled, example_inputs(seed=1))
+    except Exception as e:
+        # e.g. no CPU bf16 kernels, or tracing unsupported by this torch
+        logging.warning(f"Compiling {precision} IFNet failed, using the eager model: {str(e)}")
+        return flownet
+    if accuracy['relative'] > tolerance:
+        logging.warning(f"Compiled {precision} IFNet is off by {accuracy['relative']:.2%} "
+                        f"(tolerance {tolerance:.2%}), using the eager model")
+        return flownet
+    logging.info(f"Compiled {precision} IFNet, relative error {accuracy['relative']:.2e}")
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', FutureWarning)
+                torch.jit.save(compiled.module, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    return compiled
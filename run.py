@@ -1,6 +1,8 @@
 from app import create_app
 
-app = create_app()
-
+# Build the app only when run as a script: enhancement worker processes are
+# spawned and re-import this module, and must not each build an app of their own.
+# WSGI servers should use the factory instead, e.g. gunicorn 'app:create_app()'
 if __name__ == '__main__':
+    app = create_app()
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,39 @@
+import cv2
+import numpy as np
+from app.blend import blend_batch, iter_blend, linear_alphas
+
+def _pair(shape=(30, 40, 4)):
+    rng = np.random.default_rng(0)
+    return (rng.integers(0, 256, shape, dtype=np.uint8),
+            rng.integers(0, 256, shape, dtype=np.uint8))
+
+def test_batched_blend_matches_add_weighted():
+    img1, img2 = _pair()
+    alphas = linear_alphas(13)
+    frames = list(iter_blend(img1, img2, alphas, chunk_size=5))
+
+    assert len(frames) == 13
+    for alpha, frame in zip(alphas, frames):
+        expected = cv2.addWeighted(img1, 1 - alpha, img2, alpha, 0)
+        assert frame.dtype == np.uint8
+        assert np.array_equal(frame, expected)
+
+def test_endpoint_weights_reproduce_inputs():
+    img1, img2 = _pair()
+    start, end = blend_batch(img1, img2, [0.0, 1.0])
+    assert np.array_equal(start, img1)
+    assert np.array_equal(end, img2)
+
+def test_caller_buffer_is_reused():
+    img1, img2 = _pair((10, 10))
+    out = np.empty((4, 10, 10), dtype=np.uint8)
+    frames = 0
+    for frame in iter_blend(img1, img2, linear_alphas(10), out=out):
+        assert np.shares_memory(frame, out)
+        frames += 1
+    assert frames == 10
+
+def test_float_frames_are_blended():
+    img1, img2 = np.zeros((4, 4), dtype=np.float32), np.ones((4, 4), dtype=np.float32)
+    frames = blend_batch(img1, img2, linear_alphas(3))
+    assert np.allclose(frames[:, 0, 0], [0.25, 0.5, 0.75])
@@ -0,0 +1,88 @@
+import stat
+import cv2
+import numpy as np
+import pytest
+from app import encoder
+from app.config import Config
+
+def _frames(count, shape=(16, 24, 3)):
+    return [np.full(shape, i * 40, dtype=np.uint8) for i in range(count)]
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """An 'ffmpeg' that copies the raw stdin stream to the output path"""
+    script = tmp_path / 'ffmpeg'
+    script.write_text('#!/bin/sh\nfor last; do :; done\ncat > "$last"\n')
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(Config, 'FFMPEG_BINARY', str(script))
+    return script
+
+def test_ffmpeg_command_negotiates_pixel_format():
+    frame = np.zeros((10, 20, 4), dtype=np.uint8)
+    command = encoder.ffmpeg_command('out.mp4', 20, 10, 30, encoder.pixel_format(frame),
+                                     codec='libx264', preset='fast', crf=20, threads=4)
+    assert command[command.index('-pix_fmt') + 1] == 'rgba'
+    assert command[command.index('-s') + 1] == '20x10'
+    assert ['-preset', 'fast', '-crf', '20'] == command[command.index('-preset'):command.index('-preset') + 4]
+    assert command[command.index('-threads') + 1] == '4'
+    assert '+faststart' in command
+
+    vpx = encoder.ffmpeg_command('out.webm', 20, 10, 30, 'rgb24', codec='libvpx-vp9', preset='veryfast')
+    assert vpx[vpx.index('-cpu-used') + 1] == '6'
+    assert '+faststart' not in vpx
+
+def test_ffmpeg_backend_streams_raw_frames(fake_ffmpeg, tmp_path):
+    frames = _frames(3)
+    output = str(tmp_path / 'video.mp4')
+    assert encoder.encode_video(iter(frames), output, fps=10, backend='ffmpeg') == 3
+    with open(output, 'rb') as f:
+        assert f.read() == b''.join(frame.tobytes() for frame in frames)
+
+def test_ffmpeg_failure_is_reported(tmp_path, monkeypatch):
+    script = tmp_path / 'ffmpeg'
+    script.write_text('#!/bin/sh\ncat > /dev/null\necho "unknown encoder" >&2\nexit 1\n')
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(Config, 'FFMPEG_BINARY', str(script))
+    with pytest.raises(RuntimeError, match="unknown encoder"):
+        encoder.encode_video(_frames(2), str(tmp_path / 'video.mp4'), backend='ffmpeg')
+
+def test_auto_falls_back_to_opencv(tmp_path, monkeypatch):
+    monkeypatch.setattr(encoder, 'find_ffmpeg', lambda: None)
+    output = str(tmp_path / 'nested' / 'video.mp4')
+    float_frames = [frame / 255.0 for frame in _frames(4)]
+    assert encoder.encode_video(float_frames, output, fps=10, backend='auto') == 4
+    capture = cv2.VideoCapture(output)
+    assert int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) == 4
+    capture.release()
+
+def test_empty_input_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        encoder.encode_video([], str(tmp_path / 'video.mp4'))
+
+def test_ffmpeg_command_writes_hls_stream():
+    command = encoder.ffmpeg_command('out.mp4', 20, 10, 30, 'rgb24', stream_dir='/tmp/stream',
+                                     segment_seconds=2)
+    assert command[command.index('-f', command.index('pipe:0')) + 1] == 'hls'
+    assert command[command.index('-hls_segment_type') + 1] == 'fmp4'
+    assert command[-1] == '/tmp/stream/index.m3u8'
+    assert 'out.mp4' not in command
+
+def test_streamed_encode_joins_segments_into_video(tmp_path, monkeypatch):
+    # Writes an init segment and one media segment per 10 bytes of input
+    script = tmp_path / 'ffmpeg'
+    script.write_text(
+        '#!/bin/sh\nfor last; do :; done\ndir=$(dirname "$last")\n'
+        'printf init > "$dir/init.mp4"\nprintf "#EXTM3U\\n" > "$last"\ni=0\n'
+        'while chunk=$(head -c 10 | od -An -c | tr -d " \\n") && [ -n "$chunk" ]; do\n'
+        '  printf "seg$i" > "$dir/segment_$i.m4s"\n  printf "#EXTINF:2.0,\\nsegment_$i.m4s\\n" >> "$last"\n'
+        '  i=$((i+1))\ndone\nprintf "#EXT-X-ENDLIST\\n" >> "$last"\n'
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(Config, 'FFMPEG_BINARY', str(script))
+
+    stream_dir = str(tmp_path / 'stream')
+    output = str(tmp_path / 'video.mp4')
+    with encoder.stream_to(stream_dir):
+        assert encoder.encode_video(_frames(2, shape=(2, 5, 1)), output, backend='ffmpeg') == 2
+    with open(output, 'rb') as f:
+        assert f.read() == b'initseg0seg1'
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from app.enhance import SequenceEnhancer, build_enhancement_lut, enhance_image
+
+def _synthetic_image(seed, shape=(60, 80, 3)):
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(20, 180, shape[1], dtype=np.float32)
+    noise = rng.normal(0, 15, shape)
+    return np.clip(gradient[None, :, None] + noise, 0, 255).astype(np.uint8)
+
+def test_lut_matches_float_pipeline():
+    exposure = pytest.importorskip('skimage.exposure')
+    img = _synthetic_image(0)
+
+    expected = exposure.equalize_hist(img)
+    p2, p98 = np.percentile(expected, (2, 98))
+    expected = exposure.rescale_intensity(expected, in_range=(p2, p98))
+
+    enhanced = enhance_image(img)
+    assert enhanced.dtype == np.uint8
+    assert np.abs(enhanced.astype(np.float64) - expected * 255).max() <= 1.0
+
+def test_alpha_channel_is_untouched():
+    img = np.dstack([_synthetic_image(1), np.full((60, 80), 200, dtype=np.uint8)])
+    enhanced = enhance_image(img)
+    assert enhanced.shape == img.shape
+    assert (enhanced[..., 3] == 200).all()
+
+def test_shared_lut_is_built_from_first_frame():
+    first, second = _synthetic_image(2), _synthetic_image(3) // 2
+    enhancer = SequenceEnhancer(shared=True)
+    enhancer(first)
+    shared = enhancer(second)
+    assert np.array_equal(enhancer.lut, build_enhancement_lut(first))
+    assert np.array_equal(shared, enhance_image(second, build_enhancement_lut(first)))
@@ -0,0 +1,35 @@
+import numpy as np
+from app.interpolator import FrameInterpolator
+
+def _frames(count, shape=(6, 8, 3)):
+    return [np.full(shape, i * 50, dtype=np.uint8) for i in range(count)]
+
+def test_interpolate_sequence_lengths_and_endpoints():
+    images = _frames(3)
+    frames = FrameInterpolator().interpolate_sequence(images, n_frames=3)
+    assert len(frames) == 2 * (3 + 1) + 1
+    assert frames[0] is images[0]
+    assert frames[4] is images[1]
+    assert frames[-1] is images[-1]
+
+def test_iter_interpolate_sequence_consumes_lazily():
+    consumed = []
+
+    def source():
+        for img in _frames(4):
+            consumed.append(img)
+            yield img
+
+    frames = FrameInterpolator().iter_interpolate_sequence(source(), n_frames=2, total_images=4)
+    next(frames)
+    # Only the first pair has been pulled to produce the first frame
+    assert len(consumed) == 2
+    assert len(list(frames)) == 3 * 3
+
+def test_progress_counts_pairs():
+    progress = []
+    frames = FrameInterpolator().iter_interpolate_sequence(
+        iter(_frames(5)), n_frames=7, progress_callback=progress.append, total_images=5
+    )
+    list(frames)
+    assert progress == [25.0, 50.0, 75.0, 100.0]
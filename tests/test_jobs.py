@@ -0,0 +1,88 @@
+import threading
+import time
+import pytest
+from app.jobs import Job, JobManager, JobQueueFull
+
+def _wait(job, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+def test_job_reports_progress_and_result():
+    manager = JobManager(max_workers=1, max_pending=4)
+    seen = threading.Event()
+    release = threading.Event()
+
+    def work(job):
+        job.report_progress(40)
+        seen.set()
+        release.wait(1)
+        return {'video_url': '/static/videos/x.mp4'}
+
+    job = manager.submit('video', work)
+    assert seen.wait(1)
+    assert job.to_dict()['state'] == Job.RUNNING
+    assert job.to_dict()['progress'] == 40
+    release.set()
+
+    data = _wait(job).to_dict()
+    assert data['state'] == Job.DONE
+    assert data['progress'] == 100
+    assert data['video_url'] == '/static/videos/x.mp4'
+
+def test_running_and_queued_jobs_can_be_cancelled():
+    manager = JobManager(max_workers=1, max_pending=4)
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        while True:
+            job.report_progress(10)
+            time.sleep(0.01)
+
+    running = manager.submit('video', work)
+    queued = manager.submit('video', work)
+    assert started.wait(1)
+
+    manager.cancel(queued.id)
+    manager.cancel(running.id)
+    assert _wait(running).state == Job.CANCELLED
+    assert _wait(queued).state == Job.CANCELLED
+
+def test_failures_and_queue_limit():
+    manager = JobManager(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    def fail(job):
+        release.wait(1)
+        raise RuntimeError("no imagery")
+
+    job = manager.submit('video', fail)
+    with pytest.raises(JobQueueFull):
+        manager.submit('video', fail)
+    release.set()
+
+    assert _wait(job).state == Job.FAILED
+    assert job.to_dict()['error'] == "no imagery"
+
+def test_shared_job_runs_until_every_request_cancels():
+    manager = JobManager(max_workers=1, max_pending=4)
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        while True:
+            job.report_progress(10)
+            time.sleep(0.01)
+
+    job = manager.submit('video', work, key='same')
+    assert manager.submit('video', work, key='same') is job
+    assert started.wait(1)
+
+    # One of the two requests gives up; the other still wants the video
+    manager.cancel(job.id)
+    time.sleep(0.05)
+    assert job.state == Job.RUNNING
+    manager.cancel(job.id)
+    assert _wait(job).state == Job.CANCELLED
@@ -0,0 +1,32 @@
+import requests
+from app.config import Config
+from benchmarks.loadtest import run_load
+from benchmarks.mock_wms import MockWMSServer
+
+# Six-hourly imagery keeps a mock day to four frames
+LAYERS = {Config.WMS_LAYER: '2024-01-01T00:00:00Z/2024-12-31T18:00:00Z/PT6H'}
+
+def test_mock_wms_serves_capabilities_images_and_errors():
+    with MockWMSServer(layers=LAYERS) as wms:
+        capabilities = requests.get(wms.url, params={'SERVICE': 'WMS', 'REQUEST': 'GetCapabilities'})
+        assert Config.WMS_LAYER in capabilities.text
+        assert 'PT6H' in capabilities.text
+
+        params = {'SERVICE': 'WMS', 'REQUEST': 'GetMap', 'LAYERS': Config.WMS_LAYER,
+                  'TIME': '2024-01-01T06:00:00Z', 'BBOX': '0,0,10,10', 'WIDTH': 32, 'HEIGHT': 16}
+        first = requests.get(wms.url, params=params)
+        assert first.headers['Content-Type'] == 'image/png'
+        assert requests.get(wms.url, params=params).content == first.content
+
+    with MockWMSServer(layers=LAYERS, error_rate=1.0, error_status=503) as wms:
+        assert requests.get(wms.url, params=params).status_code == 503
+        assert wms.counts['errors'] == 1
+
+def test_load_driver_reports_latency_and_throughput():
+    report = run_load(route='daily-video', total=3, concurrency=3, identical=True, layers=LAYERS)
+    assert report['states'] == {'done': 3}
+    # Identical requests share one render
+    assert report['wms']['getmap'] == 4
+    assert report['throughput_rps'] > 0
+    assert report['latency_s']['p50'] <= report['latency_s']['p99']
+    assert report['memory_mb']['peak'] >= report['memory_mb']['start']
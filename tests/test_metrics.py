@@ -0,0 +1,120 @@
+import time
+
+import numpy as np
+
+from app.jobs import JobManager
+from app.metrics import MetricsRegistry, REGISTRY, span
+from app.pipeline import iter_pipeline, queue_depths
+
+def _wait(job, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+def test_registry_renders_counters_histograms_and_gauges():
+    registry = MetricsRegistry(buckets=(0.1, 1))
+    registry.inc('bytes_fetched_total', 100, help="Bytes", layer='a')
+    registry.inc('bytes_fetched_total', 50, layer='a')
+    registry.observe('stage_seconds', 0.5, stage='flow')
+    registry.register_gauge('queue_depth', lambda: {(('pipeline', 'rife'),): 3})
+    registry.register_gauge('broken', lambda: 1 / 0)
+
+    text = registry.render()
+    assert '# HELP satinterp_bytes_fetched_total Bytes' in text
+    assert 'satinterp_bytes_fetched_total{layer="a"} 150' in text
+    assert 'satinterp_stage_seconds_bucket{stage="flow",le="0.1"} 0' in text
+    assert 'satinterp_stage_seconds_bucket{stage="flow",le="1"} 1' in text
+    assert 'satinterp_stage_seconds_count{stage="flow"} 1' in text
+    assert 'satinterp_queue_depth{pipeline="rife"} 3' in text
+    assert 'broken' not in text
+
+def test_job_timings_include_pipeline_stage_threads():
+    manager = JobManager(max_workers=1, max_pending=4)
+
+    def stage(items):
+        for item in items:
+            with span('test_stage', frames=1):
+                time.sleep(0.01)
+            yield item
+
+    def work(job):
+        assert list(iter_pipeline(range(3), stage, name='test')) == [0, 1, 2]
+
+    before = REGISTRY.value('frames_total', stage='test_stage')
+    job = _wait(manager.submit('video', work))
+    manager.shutdown()
+
+    timings = job.to_dict(timings=True)['timings']
+    assert timings['test_stage'] >= 0.03
+    assert 'timings' not in job.to_dict()
+    assert REGISTRY.value('frames_total', stage='test_stage') == before + 3
+    assert 'test' not in queue_depths()
+
+def test_debug_frame_stats_only_computed_in_debug_mode(monkeypatch, caplog):
+    import logging
+    import torch
+    from app.interpolator import RIFEInterpolator
+
+    interpolator = RIFEInterpolator.__new__(RIFEInterpolator)
+    interpolator.device = torch.device('cpu')
+
+    class _Model:
+        def estimate_flow_tiled(self, img0, img1, **kwargs):
+            return None
+
+        def iter_warp_blend(self, state, timesteps, max_batch_bytes):
+            yield torch.zeros(len(timesteps), 3, 4, 4)
+
+    interpolator.model = _Model()
+    img1 = np.zeros((4, 4, 3), dtype=np.uint8)
+    img2 = np.full((4, 4, 3), 255, dtype=np.uint8)
+    pair = interpolator.prepare_pair(img1, img2)
+
+    with caplog.at_level(logging.INFO):
+        interpolator.interpolate_prepared(pair, 2)
+    assert 'range' not in caplog.text
+
+    with caplog.at_level(logging.DEBUG):
+        frames = interpolator.interpolate_prepared(pair, 2)
+    assert len(frames) == 4
+    assert 'Frame 3 shape' in caplog.text
+
+def test_metrics_route_and_job_timings(monkeypatch, tmp_path):
+    from app import create_app, routes
+    from app.config import Config
+
+    class _TestConfig(Config):
+        RIFE_PRELOAD = False
+        VIDEO_DIR = str(tmp_path)
+        LOG_FILE = None
+
+    class _Fetcher:
+        def get_daily_video(self, bbox, size, date, output_path, fps, progress_callback):
+            with span('fetch', frames=1):
+                pass
+            with open(output_path, 'wb') as f:
+                f.write(b'video')
+            return output_path
+
+    monkeypatch.setattr(routes, 'get_fetcher', lambda url, layer: _Fetcher())
+    client = create_app(_TestConfig).test_client()
+    body = client.post('/generate-daily-video', json={'bbox': [0, 0, 1, 1], 'date': '2024-01-01'}).get_json()
+
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline:
+        data = client.get(body['status_url'] + '?timings=1').get_json()
+        if data['state'] == 'done':
+            break
+        time.sleep(0.01)
+    assert 'fetch' in data['timings']
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    text = response.get_data(as_text=True)
+    assert 'satinterp_stage_seconds_count{stage="fetch"}' in text
+    assert 'satinterp_jobs{state="done"}' in text
+    assert 'satinterp_video_cache_hit_rate' in text
+    assert 'satinterp_raster_cache_hit_rate' in text
+    assert 'satinterp_job_seconds_count{kind="daily-video",state="done"}' in text
@@ -0,0 +1,22 @@
+import pytest
+from benchmarks.microbench import compare, run_suite
+
+def test_quick_suite_reports_timings_and_memory():
+    report = run_suite(quick=True, repeats=1, only='enhance')
+    assert set(report['results']) == {'enhance.per_frame_lut', 'enhance.shared_lut'}
+    for result in report['results'].values():
+        assert result['median_s'] > 0
+        assert result['peak_mb'] >= 0
+    assert report['meta']['quick'] is True
+
+def test_compare_flags_slowdowns_and_memory_growth():
+    def report(median_s, peak_mb, quick=True):
+        return {'meta': {'quick': quick},
+                'results': {'case': {'median_s': median_s, 'peak_mb': peak_mb, 'peak_rss_mb': None}}}
+
+    baseline = report(1.0, 10.0)
+    assert compare(report(1.2, 10.0), baseline) == []
+    assert len(compare(report(1.3, 10.0), baseline)) == 1
+    assert len(compare(report(1.0, 20.0), baseline)) == 1
+    with pytest.raises(ValueError):
+        compare(report(1.0, 10.0, quick=False), baseline)
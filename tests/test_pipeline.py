@@ -0,0 +1,51 @@
+import threading
+import time
+import pytest
+from app.pipeline import iter_pipeline
+
+def _slow(delay):
+    def stage(items):
+        for item in items:
+            time.sleep(delay)
+            yield item
+    return stage
+
+def test_pipeline_preserves_order_and_overlaps_stages():
+    def source():
+        for i in range(10):
+            time.sleep(0.02)
+            yield i
+
+    start = time.monotonic()
+    results = list(iter_pipeline(source(), _slow(0.02), _slow(0.02), queue_size=2))
+    elapsed = time.monotonic() - start
+
+    assert results == list(range(10))
+    # Serial execution would take 0.6s; overlapped stages take about a third of that
+    assert elapsed < 0.45
+
+def test_pipeline_propagates_stage_errors():
+    def failing(items):
+        for item in items:
+            if item == 3:
+                raise ValueError("bad frame")
+            yield item
+
+    with pytest.raises(ValueError, match="bad frame"):
+        list(iter_pipeline(range(10), failing))
+
+def test_closing_pipeline_stops_stages():
+    produced = []
+
+    def source():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    before = threading.active_count()
+    frames = iter_pipeline(source(), _slow(0), queue_size=2)
+    assert next(frames) == 0
+    frames.close()
+    time.sleep(0.3)
+    assert len(produced) < 20
+    assert threading.active_count() <= before
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from app.config import Config
+from app.raster_cache import RasterCache
+
+def test_key_is_canonical():
+    key = RasterCache.make_key('layer', '2024-01-01', (-10, -5, 10, 5), (800, 600), 'image/png')
+    same = RasterCache.make_key('layer', '2024-01-01', [-10.0, -5.0, 10.0, 5.0], [800, 600], 'image/png')
+    other = RasterCache.make_key('layer', '2024-01-02', (-10, -5, 10, 5), (800, 600), 'image/png')
+    assert key == same
+    assert key != other
+
+def test_todays_rasters_expire_by_key(monkeypatch):
+    from datetime import datetime, timezone
+    today = datetime.now(timezone.utc).strftime('%Y-%m-%dT00:00:00Z')
+    args = ('layer', today, (0, 0, 1, 1), (1, 1), 'image/png')
+    key = RasterCache.make_key(*args)
+    assert RasterCache.make_key(*args) == key
+    later = time.time() + Config.RECENT_IMAGERY_MAX_AGE
+    monkeypatch.setattr(time, 'time', lambda: later)
+    assert RasterCache.make_key(*args) != key
+
+def test_memory_and_disk_tiers(tmp_path):
+    cache = RasterCache(str(tmp_path), memory_bytes=1024, disk_bytes=1024 * 1024)
+    key = RasterCache.make_key('layer', '2024-01-01', (0, 0, 1, 1), (1, 1), 'image/png')
+
+    assert cache.get(key) is None
+    cache.put(key, b'raster')
+    assert cache.get(key) == b'raster'
+
+    # A second process sharing the directory only has the disk tier
+    other = RasterCache(str(tmp_path), memory_bytes=1024, disk_bytes=1024 * 1024)
+    assert other.get(key) == b'raster'
+    assert other.get(key) == b'raster'
+
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hits_memory'] == 1
+    assert other.stats()['hits_disk'] == 1
+    assert other.stats()['hits_memory'] == 1
+
+def test_memory_tier_is_bounded_in_bytes(tmp_path):
+    cache = RasterCache(str(tmp_path), memory_bytes=250, disk_bytes=1024 * 1024)
+    for i in range(5):
+        cache.put(f'{i:064x}', bytes(100))
+    stats = cache.stats()
+    assert stats['memory_bytes'] <= 250
+    assert stats['memory_entries'] == 2
+
+def test_disk_eviction_drops_least_recently_used(tmp_path):
+    cache = RasterCache(str(tmp_path), memory_bytes=0, disk_bytes=350)
+    keys = [f'{i:064x}' for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, bytes(100))
+        os.utime(cache._path(key), (i, i))
+    cache.put(f'{3:064x}', bytes(100))
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == bytes(100)
+    assert not any(name.endswith('.tmp') for _, _, files in os.walk(tmp_path) for name in files)
+
+def test_failed_fetch_is_shared_and_not_cached(tmp_path):
+    cache = RasterCache(str(tmp_path), memory_bytes=1024, disk_bytes=1024 * 1024)
+    key = f'{0:064x}'
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def failing_fetch():
+        started.set()
+        release.wait(2)
+        raise IOError("upstream down")
+
+    def request(fetch):
+        try:
+            cache.get_or_fetch(key, fetch)
+        except IOError as e:
+            errors.append(e)
+
+    owner = threading.Thread(target=request, args=(failing_fetch,))
+    owner.start()
+    started.wait(2)
+    waiter = threading.Thread(target=request, args=(lambda: b'second fetch',))
+    waiter.start()
+    deadline = time.monotonic() + 2
+    while cache.stats()['coalesced'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    owner.join()
+    waiter.join()
+
+    # The waiter got the owner's error instead of fetching again
+    assert len(errors) == 2
+    assert cache.get_or_fetch(key, lambda: b'raster') == b'raster'
@@ -0,0 +1,331 @@
+import numpy as np
+import torch
+from model.RIFE.model.RIFE import Model
+
+def _pair(h=40, w=50):
+    torch.manual_seed(0)
+    return torch.rand(1, 3, h, w), torch.rand(1, 3, h, w)
+
+def test_inference_matches_split_flow_and_warp():
+    model = Model()
+    model.eval()
+    img0, img1 = _pair()
+    with torch.no_grad():
+        state = model.estimate_flow(img0, img1)
+        for t in (0.25, 0.5, 0.9):
+            expected = model.inference(img0, img1, timestep=t)
+            actual = model.warp_blend(state, timestep=t)
+            assert actual.shape == (1, 3, 40, 50)
+            assert torch.allclose(actual, expected, atol=1e-6)
+
+def test_rife_interpolator_runs_network_once_per_pair():
+    from app.interpolator import RIFEInterpolator
+
+    interpolator = RIFEInterpolator()
+    calls = []
+    interpolator.model.flownet.register_forward_hook(lambda *args: calls.append(1))
+
+    rng = np.random.default_rng(0)
+    img1 = rng.integers(0, 256, (40, 50, 3), dtype=np.uint8)
+    img2 = rng.integers(0, 256, (40, 50, 3), dtype=np.uint8)
+    frames = interpolator.interpolate_frames(img1, img2, 15)
+
+    assert len(frames) == 17
+    # One IFNet pass per pyramid scale, not per timestep
+    assert len(calls) == 4
+
+def test_batched_warp_matches_single_timesteps():
+    model = Model()
+    model.eval()
+    img0, img1 = _pair()
+    timesteps = [0.1, 0.3, 0.5, 0.7, 0.9]
+    with torch.no_grad():
+        state = model.estimate_flow(img0, img1)
+        batch = model.warp_blend_batch(state, timesteps)
+        # A budget of roughly two timesteps per chunk gives the same frames
+        chunks = list(model.iter_warp_blend(state, timesteps, max_batch_bytes=2 * 17 * 64 * 64 * 4))
+        for i, t in enumerate(timesteps):
+            assert torch.allclose(batch[i:i + 1], model.warp_blend(state, t), atol=1e-6)
+    assert batch.shape == (5, 3, 40, 50)
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+def test_load_model_strips_data_parallel_prefix(tmp_path):
+    source = Model()
+    state_dict = {'module.' + k: v for k, v in source.flownet.state_dict().items()}
+    torch.save(state_dict, tmp_path / 'flownet.pkl')
+
+    model = Model()
+    model.load_model(str(tmp_path))
+    for key, value in source.flownet.state_dict().items():
+        assert torch.equal(model.flownet.state_dict()[key], value)
+
+def test_create_app_preloads_one_rife_service(tmp_path):
+    from app import create_app
+    from app.config import Config
+    from app.rife_service import get_rife_service
+
+    class TestConfig(Config):
+        RIFE_WEIGHTS_DIR = str(tmp_path)
+        RIFE_COMPILED_CACHE_DIR = str(tmp_path / 'compiled')
+        TORCH_NUM_THREADS = 1
+        LOG_FILE = None
+
+    previous_threads = torch.get_num_threads()
+    try:
+        app = create_app(TestConfig)
+        service = app.extensions['rife_service']
+        with app.app_context():
+            assert get_rife_service() is service
+        assert torch.get_num_threads() == 1
+    finally:
+        torch.set_num_threads(previous_threads)
+
+def _reference_warp(img, flow):
+    B, C, H, W = img.size()
+    xx = torch.linspace(-1, 1, W).view(1, 1, 1, W).expand(B, -1, H, -1)
+    yy = torch.linspace(-1, 1, H).view(1, 1, H, 1).expand(B, -1, -1, W)
+    grid = torch.cat([xx, yy], 1)
+    flow = flow.clone()
+    flow[:, 0] = flow[:, 0] / ((W-1.0) / 2.0)
+    flow[:, 1] = flow[:, 1] / ((H-1.0) / 2.0)
+    grid_ = (grid + flow).permute(0, 2, 3, 1)
+    return torch.nn.functional.grid_sample(img, grid_, mode='bilinear', padding_mode='border', align_corners=True)
+
+def test_cached_grid_warp_matches_reference():
+    model = Model()
+    torch.manual_seed(1)
+    img = torch.rand(3, 3, 32, 48)
+    flow = torch.randn(3, 2, 32, 48) * 4
+    with torch.no_grad():
+        first = model.warp(img, flow)
+        second = model.warp(img, flow)
+    assert torch.allclose(first, _reference_warp(img, flow), atol=1e-5)
+    assert torch.equal(first, second)
+    assert len(model._grids) == 1
+
+def test_grid_cache_keeps_only_recent_sizes():
+    model = Model()
+    img = torch.rand(1, 3, 8, 8)
+    with torch.no_grad():
+        for width in range(8, 20):
+            model.warp(torch.rand(1, 3, 8, width), torch.zeros(1, 2, 8, width))
+        model.warp(img, torch.zeros(1, 2, 8, 8))
+    assert len(model._grids) == Model.GRID_CACHE_SIZE
+    assert next(reversed(model._grids))[:2] == (8, 8)
+
+def test_render_rife_animation_pipeline(tmp_path):
+    from datetime import datetime
+    from app.interpolator import RIFEInterpolator
+    from app.render import render_rife_animation
+
+    rng = np.random.default_rng(0)
+
+    class FakeFetcher:
+        def iter_image_sequence(self, **kwargs):
+            for _ in range(3):
+                yield rng.integers(0, 256, (64, 96, 4), dtype=np.uint8)
+
+    interpolator = RIFEInterpolator(weights_dir=str(tmp_path))
+    written = []
+    interpolator.create_video = lambda frames, path, fps: written.extend(frames)
+
+    render_rife_animation(
+        FakeFetcher(), interpolator, bbox=(0, 0, 1, 1), size=(96, 64),
+        start_date=datetime(2024, 1, 1), end_date=datetime(2024, 1, 3),
+        output_path=str(tmp_path / 'out.mp4'), frames_between=3
+    )
+    assert len(written) == 2 * 4 + 1
+    assert all(frame.shape == (64, 96, 3) for frame in written)
+
+def test_render_rife_animation_reports_and_cancels_per_pair(tmp_path):
+    from datetime import datetime
+    from app.jobs import JobCancelled
+    from app.render import FETCH_PROGRESS_SHARE, render_rife_animation
+
+    class FakeFetcher:
+        def iter_image_sequence(self, progress_callback=None, **kwargs):
+            for i in range(4):
+                progress_callback((i + 1) / 4 * 100)
+                yield np.full((8, 8, 3), i * 60, dtype=np.uint8)
+
+    class FakeInterpolator:
+        pairs = 0
+
+        def prepare_pair(self, img0, img1):
+            return img0, img1
+
+        def interpolate_prepared(self, pair, frames_between, flow_profile):
+            self.pairs += 1
+            return [pair[0]] * frames_between + [pair[1]]
+
+        def create_video(self, frames, path, fps):
+            for _ in frames:
+                pass
+
+    progress = []
+
+    def progress_callback(percent):
+        progress.append(percent)
+        # Cancelled once the first pair is interpolated
+        if percent > FETCH_PROGRESS_SHARE:
+            raise JobCancelled("cancelled")
+
+    interpolator = FakeInterpolator()
+    try:
+        render_rife_animation(
+            FakeFetcher(), interpolator, bbox=(0, 0, 1, 1), size=(8, 8),
+            start_date=datetime(2024, 1, 1), end_date=datetime(2024, 1, 4),
+            output_path=str(tmp_path / 'out.mp4'), frames_between=3, progress_callback=progress_callback
+        )
+    except JobCancelled:
+        pass
+    else:
+        raise AssertionError("render was not cancelled")
+    # Fetching only accounts for a small share; each pair moves progress on
+    assert all(p <= FETCH_PROGRESS_SHARE for p in progress[:-1])
+    assert progress[-1] == FETCH_PROGRESS_SHARE + (100 - FETCH_PROGRESS_SHARE) / 3
+    assert interpolator.pairs == 1
+
+def test_tiled_flow_bounds_ifnet_input_and_feathers_seams():
+    from model.RIFE.model.RIFE import FlowState
+    model = Model()
+    tile = Model.tile_size_for_budget(64 * 64 * Model.FLOW_ELEMENTS_PER_PIXEL * 4)
+    assert tile == 64
+
+    img0, img1 = _pair(100, 150)
+    shapes = []
+
+    def fake_estimate(a, b, profile=None):
+        shapes.append(a.shape[2:])
+        # Constant flow per tile; feathering must renormalise to the same constant
+        return FlowState(a, b, torch.full((1, 4, a.shape[2], a.shape[3]), 3.0), a.shape[2], a.shape[3])
+
+    model.estimate_flow = fake_estimate
+    state = model.estimate_flow_tiled(img0, img1, max_bytes=64 * 64 * Model.FLOW_ELEMENTS_PER_PIXEL * 4, overlap=32)
+    assert state.flow.shape == (1, 4, 100, 150)
+    assert torch.allclose(state.flow, torch.full_like(state.flow, 3.0))
+    assert all(h == 64 and w == 64 for h, w in shapes)
+    assert len(shapes) == 3 * 4
+
+def test_tiled_flow_without_budget_matches_single_pass():
+    model = Model()
+    model.eval()
+    img0, img1 = _pair(64, 96)
+    with torch.no_grad():
+        expected = model.estimate_flow(img0, img1)
+        tiled = model.estimate_flow_tiled(img0, img1, max_bytes=None)
+        assert torch.equal(tiled.flow, expected.flow)
+
+        # Real tiles produce a full-size flow that warps like any other
+        small = model.estimate_flow_tiled(img0, img1, max_bytes=1, overlap=32)
+        assert small.flow.shape == (1, 4, 64, 96)
+        assert model.warp_blend(small, 0.5).shape == (1, 3, 64, 96)
+
+def test_flow_profiles_cap_working_resolution():
+    import pytest
+    model = Model()
+    model.eval()
+    img0, img1 = _pair(200, 1100)
+    inputs = []
+    model.flownet.register_forward_hook(lambda module, args, out: inputs.append(args[0].shape[2:]))
+    with torch.no_grad():
+        fast = model.estimate_flow(img0, img1, profile='fast')
+        assert fast.flow.shape == (1, 4, 200, 1100)
+        # No full-resolution pass, and the largest pass is at most 512 wide
+        assert len(inputs) == 3
+        assert max(w for _, w in inputs) <= 512 // 2
+
+        inputs.clear()
+        model.estimate_flow(img0, img1, profile='quality')
+        assert len(inputs) == 4
+        assert max(w for _, w in inputs) == 1120
+
+    with pytest.raises(ValueError):
+        model.estimate_flow(img0, img1, profile='ludicrous')
+
+def test_flow_benchmark_reports_every_profile():
+    from benchmarks.flow_benchmark import benchmark_profiles, synthetic_triplet
+    from app.interpolator import RIFEInterpolator
+    results = benchmark_profiles(*synthetic_triplet(96, 64), interpolator=RIFEInterpolator(), repeats=1)
+    assert [row['profile'] for row in results] == ['quality', 'balanced', 'fast']
+    assert all(row['seconds_per_pair'] > 0 and row['psnr_db'] > 0 for row in results)
+
+def test_compiled_ifnet_matches_eager_and_is_cached(tmp_path, monkeypatch):
+    import pytest
+    from model.RIFE.model import cpu_backend
+    model = Model()
+    model.eval()
+    eager = model.flownet
+    inputs = cpu_backend.example_inputs((1, 6, 64, 96), count=2, seed=3)
+
+    compiled = cpu_backend.compile_ifnet(eager, 'fp32', cache_dir=str(tmp_path))
+    assert isinstance(compiled, cpu_backend.CompiledIFNet)
+    assert cpu_backend.check_accuracy(eager, compiled, inputs)['relative'] < 1e-4
+    assert len(list(tmp_path.glob('ifnet-fp32-*.pt'))) == 1
+
+    # A second process would load the artifact instead of recompiling
+    monkeypatch.setattr(cpu_backend, '_build', lambda *args: pytest.fail("recompiled"))
+    cached = cpu_backend.compile_ifnet(eager, 'fp32', cache_dir=str(tmp_path))
+    with torch.no_grad():
+        assert torch.allclose(cached(inputs[0]), compiled(inputs[0]))
+
+def test_compiled_untrained_ifnet_is_not_cached(tmp_path):
+    model = Model()
+    model.eval()
+    model.compile('fp32', cache_dir=str(tmp_path / 'compiled'))
+    assert not (tmp_path / 'compiled').exists()
+
+    torch.save(Model().flownet.state_dict(), tmp_path / 'flownet.pkl')
+    model = Model()
+    model.load_model(str(tmp_path))
+    model.eval()
+    model.compile('fp32', cache_dir=str(tmp_path / 'compiled'))
+    assert len(list((tmp_path / 'compiled').glob('ifnet-fp32-*.pt'))) == 1
+
+def test_reduced_precision_ifnet_stays_within_tolerance():
+    from model.RIFE.model import cpu_backend
+    model = Model()
+    model.eval()
+    inputs = cpu_backend.example_inputs((1, 6, 64, 64), count=2, seed=3)
+    for precision in ('bf16', 'int8'):
+        compiled = cpu_backend.compile_ifnet(model.flownet, precision)
+        assert isinstance(compiled, cpu_backend.CompiledIFNet)
+        error = cpu_backend.check_accuracy(model.flownet, compiled, inputs)
+        assert error['relative'] < cpu_backend.DEFAULT_TOLERANCE[precision]
+
+def test_failed_compile_falls_back_to_eager(tmp_path, monkeypatch):
+    from model.RIFE.model import cpu_backend
+
+    def broken_build(*args):
+        raise RuntimeError("no bf16 conv kernels")
+
+    monkeypatch.setattr(cpu_backend, '_build', broken_build)
+    model = Model()
+    model.eval()
+    eager = model.flownet
+    assert model.compile('bf16', cache_dir=str(tmp_path)) is eager
+    assert model.flownet is eager
+
+def test_int8_falls_back_to_fp32_without_fx_quantization(monkeypatch):
+    from model.RIFE.model import cpu_backend
+    monkeypatch.setattr(cpu_backend, 'int8_supported', lambda: False)
+    model = Model()
+    model.eval()
+    compiled = cpu_backend.compile_ifnet(model.flownet, 'int8')
+    assert isinstance(compiled, cpu_backend.CompiledIFNet)
+    assert compiled.precision == 'fp32'
+
+def test_inaccurate_compile_falls_back_to_eager(tmp_path):
+    from model.RIFE.model import cpu_backend
+    model = Model()
+    model.eval()
+    eager = model.flownet
+    # Nothing can beat a negative tolerance
+    assert model.compile('int8', cache_dir=str(tmp_path), tolerance=-1) is eager
+    assert model.flownet is eager
+    assert list(tmp_path.iterdir()) == []
+
+    img0, img1 = _pair(64, 64)
+    model.compile('fp32')
+    with torch.no_grad():
+        assert model.warp_blend(model.estimate_flow(img0, img1)).shape == (1, 3, 64, 64)
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+import pytest
+from app import create_app
+from app.config import Config
+
+class _FakeFetcher:
+    def __init__(self, release=None):
+        self.release = release
+        self.calls = 0
+
+    def get_daily_video(self, bbox, size, date, output_path, fps, progress_callback):
+        self.calls += 1
+        progress_callback(50)
+        if self.release is not None:
+            self.release.wait(2)
+        with open(output_path, 'wb') as f:
+            f.write(b'video')
+        return output_path
+
+@pytest.fixture
+def client(tmp_path):
+    class _TestConfig(Config):
+        RIFE_PRELOAD = False
+        VIDEO_DIR = str(tmp_path)
+        LOG_FILE = None
+    return create_app(_TestConfig).test_client()
+
+def _wait_for_job(client, status_url, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = client.get(status_url).get_json()
+        if data['state'] not in ('queued', 'running'):
+            return data
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+def _request_daily(client, **overrides):
+    body = {'bbox': [0, 0, 1, 1], 'date': '2024-01-01'}
+    body.update(overrides)
+    return client.post('/generate-daily-video', json=body)
+
+def test_generate_daily_video_runs_as_job(monkeypatch, client, tmp_path):
+    from app import routes
+    monkeypatch.setattr(routes, 'get_fetcher', lambda url, layer: _FakeFetcher())
+
+    response = _request_daily(client)
+    assert response.status_code == 202
+    body = response.get_json()
+
+    data = _wait_for_job(client, body['status_url'])
+    assert data['state'] == 'done'
+    assert data['progress'] == 100
+    filename = os.path.basename(data['video_url'])
+    assert os.listdir(tmp_path) == [filename]
+    assert client.get(f'/videos/{filename}').data == b'video'
+
+def test_identical_requests_share_render_and_cache(monkeypatch, client):
+    from app import routes
+    release = threading.Event()
+    fetcher = _FakeFetcher(release)
+    monkeypatch.setattr(routes, 'get_fetcher', lambda url, layer: fetcher)
+
+    first = _request_daily(client).get_json()
+    # Equivalent request: float bbox, explicit default fps
+    second = _request_daily(client, bbox=[0.0, 0.0, 1.0, 1.0], fps=10).get_json()
+    assert second['job_id'] == first['job_id']
+    release.set()
+    done = _wait_for_job(client, first['status_url'])
+
+    hit = _request_daily(client)
+    assert hit.status_code == 200
+    assert hit.get_json()['video_url'] == done['video_url']
+    assert fetcher.calls == 1
+
+    other = _request_daily(client, date='2024-01-02')
+    assert other.status_code == 202
+
+def test_failed_render_leaves_no_file(monkeypatch, client, tmp_path):
+    from app import routes
+
+    class _Failing:
+        def get_daily_video(self, output_path, **kwargs):
+            with open(output_path, 'wb') as f:
+                f.write(b'partial')
+            raise RuntimeError("no imagery")
+
+    monkeypatch.setattr(routes, 'get_fetcher', lambda url, layer: _Failing())
+    monkeypatch.setattr(routes, 'streaming_supported', lambda: True)
+    body = _request_daily(client).get_json()
+    assert _wait_for_job(client, body['status_url'])['state'] == 'failed'
+    assert os.listdir(tmp_path) in ([], ['streams'])
+    assert not os.listdir(tmp_path / 'streams')
+
+def test_render_is_streamed_while_encoding(monkeypatch, client, tmp_path):
+    from app import encoder, routes
+    segment_written = threading.Event()
+    release = threading.Event()
+
+    class _Streaming:
+        def get_daily_video(self, output_path, **kwargs):
+            stream_dir = encoder._stream_dir.get()
+            with open(os.path.join(stream_dir, 'segment_00000.m4s'), 'wb') as f:
+                f.write(b'0123456789')
+            with open(os.path.join(stream_dir, 'index.m3u8'), 'w') as f:
+                f.write('#EXTM3U\n#EXTINF:2.0,\nsegment_00000.m4s\n')
+            segment_written.set()
+            release.wait(2)
+            with open(output_path, 'wb') as f:
+                f.write(b'video')
+
+    monkeypatch.setattr(routes, 'get_fetcher', lambda url, layer: _Streaming())
+    monkeypatch.setattr(routes, 'streaming_supported', lambda: True)
+    body = _request_daily(client).get_json()
+    assert segment_written.wait(2)
+
+    job = client.get(body['status_url']).get_json()
+    assert job['state'] == 'running'
+    playlist = client.get(job['stream_url'])
+    assert playlist.mimetype == 'application/vnd.apple.mpegurl'
+    assert playlist.headers['Cache-Control'] == 'no-cache'
+    assert b'segment_00000.m4s' in playlist.data
+
+    segment_url = job['stream_url'].replace('index.m3u8', 'segment_00000.m4s')
+    partial = client.get(segment_url, headers={'Range': 'bytes=2-5'})
+    assert partial.status_code == 206
+    assert partial.data == b'2345'
+
+    release.set()
+    done = _wait_for_job(client, body['status_url'])
+    assert done['state'] == 'done'
+    assert done['stream_url'] == job['stream_url']
+    assert client.get('/streams/missing/index.m3u8').status_code == 404
+
+def test_stream_playlist_is_served_before_first_segment(client, tmp_path):
+    os.makedirs(tmp_path / 'streams' / 'daily_video_abc')
+    response = client.get('/streams/daily_video_abc/index.m3u8')
+    assert response.status_code == 200
+    assert b'#EXT-X-PLAYLIST-TYPE:EVENT' in response.data
+    assert b'#EXT-X-ENDLIST' not in response.data
+
+def test_unknown_job_is_404(client):
+    assert client.get('/jobs/missing').status_code == 404
+    assert client.post('/jobs/missing/cancel').status_code == 404
+
+def test_unknown_flow_profile_is_rejected(monkeypatch, client):
+    from app import routes
+    monkeypatch.setattr(routes, 'get_fetcher', lambda url, layer: _FakeFetcher())
+    monkeypatch.setattr(routes, 'get_rife_service', lambda: None)
+    response = client.post('/generate-rife-animation', json={
+        'bbox': [0, 0, 1, 1], 'start_date': '2024-01-01', 'end_date': '2024-01-02',
+        'size': [64, 64], 'flow_profile': 'ludicrous'
+    })
+    assert response.status_code == 400
+
+def test_multi_day_job_reports_failed_days(monkeypatch, client):
+    from app import routes
+
+    class _PartialFetcher:
+        def get_multi_day_video(self, output_path, on_day_failed, **kwargs):
+            on_day_failed('2024-01-02', RuntimeError("503 Server Error"))
+            with open(output_path, 'wb') as f:
+                f.write(b'video')
+
+    monkeypatch.setattr(routes, 'get_fetcher', lambda url, layer: _PartialFetcher())
+    body = client.post('/generate-multi-day-video', json={
+        'bbox': [0, 0, 1, 1], 'start_date': '2024-01-01', 'end_date': '2024-01-03'
+    }).get_json()
+    data = _wait_for_job(client, body['status_url'])
+    assert data['state'] == 'done'
+    assert data['failed_days'] == [{'date': '2024-01-02', 'error': '503 Server Error'}]
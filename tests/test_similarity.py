@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from app.similarity import DUPLICATE, MOVING, STATIC, classify_pair, downsampled_psnr
+
+def _scene(shift=0, shape=(120, 160)):
+    ys, xs = np.mgrid[0:shape[0], 0:shape[1]].astype(np.float32)
+    base = 128 + 80 * np.sin((xs - shift) / 9.0) * np.cos(ys / 13.0)
+    return np.repeat(base[..., None], 3, axis=2).astype(np.uint8)
+
+def test_pairs_are_classified_by_content():
+    img = _scene()
+    rng = np.random.default_rng(0)
+    noisy = np.clip(img + rng.normal(0, 2, img.shape), 0, 255).astype(np.uint8)
+
+    assert classify_pair(img, img) == DUPLICATE
+    assert classify_pair(img, img.copy()) == DUPLICATE
+    assert classify_pair(img, noisy) == STATIC
+    assert classify_pair(img, _scene(shift=12)) == MOVING
+    assert classify_pair(img, noisy, check_static=False) == MOVING
+    assert downsampled_psnr(img, img.copy()) == float('inf')
+
+def test_linear_paths_hold_duplicate_frames(monkeypatch):
+    from app import interpolator, wms_handler
+
+    def no_blend(*args, **kwargs):
+        raise AssertionError("duplicate pair was blended")
+
+    monkeypatch.setattr(interpolator, 'iter_blend', no_blend)
+    monkeypatch.setattr(wms_handler, 'iter_blend', no_blend)
+    img = _scene()
+
+    frames = interpolator.FrameInterpolator().interpolate_sequence([img, img.copy()], n_frames=3)
+    assert len(frames) == 5
+    assert all(frame is img for frame in frames[:4])
+
+    fetcher = wms_handler.WMSImageFetcher('http://wms.test', 'layer')
+    frames = fetcher._interpolate_frames([img, img], fps=720)
+    assert len(frames) == 6
+    assert all(frame is img for frame in frames)
+
+@pytest.mark.parametrize('second, expected', [('same', DUPLICATE), ('noisy', STATIC)])
+def test_rife_skips_network_for_unchanged_pairs(second, expected):
+    from app.interpolator import RIFEInterpolator
+
+    interpolator = RIFEInterpolator()
+    calls = []
+    interpolator.model.flownet.register_forward_hook(lambda *args: calls.append(1))
+
+    img1 = _scene()
+    rng = np.random.default_rng(1)
+    img2 = img1.copy() if second == 'same' else \
+        np.clip(img1 + rng.normal(0, 2, img1.shape), 0, 255).astype(np.uint8)
+    frames = interpolator.interpolate_frames(img1, img2, 5)
+
+    assert len(frames) == 7
+    assert calls == []
+    assert np.array_equal(frames[0], img1) and np.array_equal(frames[-1], img2)
+    if expected == STATIC:
+        # Smoothstep-weighted blend stays between the endpoints
+        low, high = np.minimum(img1, img2), np.maximum(img1, img2)
+        assert all(((f >= low) & (f <= high)).all() for f in frames[1:-1])
@@ -0,0 +1,155 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import create_app, tile_proxy
+from app.config import Config
+
+TILE = {
+    'SERVICE': 'WMS', 'REQUEST': 'GetMap', 'VERSION': '1.3.0', 'LAYERS': 'VIIRS_SNPP_CorrectedReflectance_TrueColor',
+    'FORMAT': 'image/jpeg', 'CRS': 'EPSG:4326', 'WIDTH': '512', 'HEIGHT': '512',
+    'BBOX': '-90,-180,0,-90', 'TIME': '2024-03-01', 'TILED': 'true',
+}
+
+class _FakeResponse:
+    def __init__(self, content, content_type='image/jpeg'):
+        self.content = content
+        self.text = content.decode('latin-1')
+        self.headers = {'Content-Type': content_type}
+
+class _FakeWMS:
+    def __init__(self, delay=0.0, content_type='image/jpeg'):
+        self.delay = delay
+        self.content_type = content_type
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, url, params=None):
+        with self._lock:
+            self.calls.append(dict(params))
+        time.sleep(self.delay)
+        return _FakeResponse(f"{params['LAYERS']}|{params.get('TIME')}".encode(), self.content_type)
+
+@pytest.fixture
+def app(tmp_path):
+    class _TestConfig(Config):
+        RIFE_PRELOAD = False
+        VIDEO_DIR = str(tmp_path / 'videos')
+        TILE_CACHE_DIR = str(tmp_path / 'tiles')
+        LOG_FILE = None
+    return create_app(_TestConfig)
+
+@pytest.fixture
+def wms(monkeypatch):
+    fake = _FakeWMS()
+    monkeypatch.setattr(tile_proxy, 'get_with_retry', fake)
+    return fake
+
+def test_equivalent_requests_share_one_tile(app, wms):
+    client = app.test_client()
+    first = client.get('/wms', query_string=TILE)
+    # Different case, order, float spelling and a cache buster
+    same = {k.lower(): v for k, v in reversed(list(TILE.items()))}
+    same.update(bbox='-90.0,-180.0000000000001,0,-90', tiled='false', _='12345')
+    second = client.get('/wms', query_string=same)
+
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data
+    assert first.mimetype == 'image/jpeg'
+    assert len(wms.calls) == 1
+    assert 'TILED' not in wms.calls[0]
+
+def test_invalid_requests_are_rejected(app, wms):
+    client = app.test_client()
+    assert client.get('/wms', query_string=dict(TILE, REQUEST='GetFeatureInfo')).status_code == 400
+    assert client.get('/wms', query_string=dict(TILE, FORMAT='text/html')).status_code == 400
+    assert client.get('/wms', query_string=dict(TILE, WIDTH='100000')).status_code == 400
+    assert client.get('/wms', query_string=dict(TILE, BBOX='1,2,3')).status_code == 400
+    assert wms.calls == []
+
+def test_upstream_errors_are_not_cached(app, monkeypatch):
+    fake = _FakeWMS(content_type='application/vnd.ogc.se_xml')
+    monkeypatch.setattr(tile_proxy, 'get_with_retry', fake)
+    client = app.test_client()
+    assert client.get('/wms', query_string=TILE).status_code == 502
+    assert client.get('/wms', query_string=TILE).status_code == 502
+    assert len(fake.calls) == 2
+
+def test_etag_and_cache_control(app, wms):
+    client = app.test_client()
+    response = client.get('/wms', query_string=TILE)
+    assert response.headers['ETag']
+    assert response.headers['Cache-Control'] == f'public, max-age={Config.TILE_MAX_AGE}'
+
+    revalidated = client.get('/wms', query_string=TILE, headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+    today = client.get('/wms', query_string=dict(TILE, TIME=datetime.now(timezone.utc).date().isoformat()))
+    assert today.headers['Cache-Control'] == f'public, max-age={Config.TILE_RECENT_MAX_AGE}'
+
+def test_static_layers_ignore_time_and_are_immutable(app, wms):
+    client = app.test_client()
+    coastlines = dict(TILE, LAYERS='Coastlines_15m', FORMAT='image/png', TRANSPARENT='true')
+    first = client.get('/wms', query_string=coastlines)
+    second = client.get('/wms', query_string=dict(coastlines, TIME='2023-07-15'))
+
+    assert first.data == second.data
+    assert len(wms.calls) == 1
+    assert 'TIME' not in wms.calls[0]
+    assert 'immutable' in first.headers['Cache-Control']
+    # No expiry, but a finite disk quota since clients choose the bbox
+    assert app.extensions['tile_proxy'].static_cache.disk_bytes == Config.TILE_STATIC_DISK_BYTES
+
+def test_concurrent_misses_are_coalesced(app, monkeypatch):
+    fake = _FakeWMS(delay=0.2)
+    monkeypatch.setattr(tile_proxy, 'get_with_retry', fake)
+    proxy = app.extensions['tile_proxy']
+    params = proxy.normalize(TILE)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(proxy.get_tile(params))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(fake.calls) == 1
+    assert len(results) == 8 and len(set(results)) == 1
+    assert proxy.stats()['dated']['coalesced'] == 7
+
+def test_playing_slider_prefetches_following_days(app, wms):
+    client = app.test_client()
+    response = client.get('/wms', query_string=dict(TILE, PREFETCH='5'))
+    assert response.status_code == 200
+
+    deadline = time.monotonic() + 2
+    while len(wms.calls) < 1 + Config.TILE_PREFETCH_DAYS and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(call['TIME'] for call in wms.calls) == ['2024-03-01', '2024-03-02', '2024-03-03']
+
+    # The animation then finds the next day in the cache
+    app.extensions['tile_proxy'].shutdown(wait=True)
+    client.get('/wms', query_string=dict(TILE, TIME='2024-03-02'))
+    assert len(wms.calls) == 3
+
+def test_prefetch_stops_at_today(app, wms):
+    proxy = app.extensions['tile_proxy']
+    yesterday = (datetime.now(timezone.utc).date() - timedelta(days=1)).isoformat()
+    assert proxy.prefetch(proxy.normalize(dict(TILE, TIME=yesterday)), 2) == 1
+    proxy.shutdown(wait=True)
+    assert [call['TIME'] for call in wms.calls] == [datetime.now(timezone.utc).date().isoformat()]
+
+def test_static_tiles_are_bounded_on_disk(tmp_path, wms):
+    class _SmallConfig(Config):
+        RIFE_PRELOAD = False
+        VIDEO_DIR = str(tmp_path / 'videos')
+        TILE_CACHE_DIR = str(tmp_path / 'tiles')
+        TILE_CACHE_MEMORY_BYTES = 0
+        TILE_STATIC_DISK_BYTES = 200
+        LOG_FILE = None
+    client = create_app(_SmallConfig).test_client()
+    for i in range(20):
+        bbox = f'{i},0,{i + 1},1'
+        assert client.get('/wms', query_string=dict(TILE, LAYERS='Coastlines_15m', BBOX=bbox)).status_code == 200
+    stored = sum(path.stat().st_size for path in (tmp_path / 'tiles' / 'static').rglob('*') if path.is_file())
+    assert 0 < stored <= 200
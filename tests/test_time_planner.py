@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+from app.time_planner import TimeDimension, is_recent, parse_duration, plan_timestamps
+
+def test_parse_duration():
+    assert parse_duration('P1D') == (0, timedelta(days=1))
+    assert parse_duration('PT10M') == (0, timedelta(minutes=10))
+    assert parse_duration('P1Y2M') == (14, timedelta(0))
+
+def test_daily_layer_collapses_hourly_requests():
+    dimension = TimeDimension.from_positions(['2000-02-24/2024-05-01/P1D'])
+    requested = [datetime(2024, 1, 1) + timedelta(hours=h) for h in range(48)]
+
+    times, index_map = plan_timestamps(requested, dimension)
+
+    assert times == ['2024-01-01', '2024-01-02']
+    assert index_map == [0] * 24 + [1] * 24
+
+def test_subdaily_layer_snaps_to_period():
+    dimension = TimeDimension.from_positions(['2024-01-01T00:00:00Z/2024-01-02T00:00:00Z/PT10M'])
+    requested = [datetime(2024, 1, 1, 0, 5, tzinfo=timezone.utc),
+                 datetime(2024, 1, 1, 0, 9),
+                 datetime(2024, 1, 1, 0, 10)]
+
+    times, index_map = plan_timestamps(requested, dimension)
+
+    assert times == ['2024-01-01T00:00:00Z', '2024-01-01T00:10:00Z']
+    assert index_map == [0, 0, 1]
+
+def test_requests_past_the_end_use_latest_and_discrete_instants():
+    dimension = TimeDimension.from_positions(['2024-01-01', '2024-01-08', '2024-01-15'])
+    assert dimension.snap(datetime(2024, 1, 10)) == datetime(2024, 1, 8)
+    assert dimension.snap(datetime(2023, 12, 31)) is None
+
+    monthly = TimeDimension.from_positions(['2023-01-31/2023-12-31/P1M'])
+    assert monthly.snap(datetime(2023, 3, 15)) == datetime(2023, 2, 28)
+    assert monthly.snap(datetime(2024, 6, 1)) == datetime(2023, 12, 31)
+
+def test_without_dimension_falls_back_to_daily():
+    requested = [datetime(2024, 1, 1, h) for h in (0, 12)] + [datetime(2024, 1, 2)]
+    assert plan_timestamps(requested) == (['2024-01-01', '2024-01-02'], [0, 0, 1])
+
+def test_is_recent():
+    now = datetime.now(timezone.utc)
+    assert is_recent(now.strftime('%Y-%m-%dT%H:%M:%SZ'))
+    assert is_recent(now.date().isoformat())
+    assert is_recent(now.date())
+    assert not is_recent('2024-01-01')
+    assert not is_recent(datetime(2024, 1, 1, 23, tzinfo=timezone.utc))
+    assert not is_recent('VIIRS_SNPP_CorrectedReflectance_TrueColor')
+    assert not is_recent(512)
@@ -0,0 +1,54 @@
+import os
+from datetime import datetime
+import pytest
+from app.video_cache import VideoCache
+
+def test_key_is_canonical():
+    a = VideoCache.make_key('video', {'bbox': [0, 1.0000001, 2, 3], 'start': datetime(2024, 1, 1)})
+    b = VideoCache.make_key('video', {'start': datetime(2024, 1, 1), 'bbox': (0, 1, 2, 3)})
+    assert a == b
+    assert a != VideoCache.make_key('daily-video', {'bbox': [0, 1, 2, 3], 'start': datetime(2024, 1, 1)})
+
+def test_renders_covering_today_expire_by_key(monkeypatch):
+    import time
+    from datetime import timezone
+    from app.config import Config
+    past = {'bbox': [0, 0, 1, 1], 'start_date': '2024-01-01', 'end_date': '2024-01-03'}
+    current = dict(past, end_date=datetime.now(timezone.utc).date().isoformat())
+    keys = VideoCache.make_key('multi-day-video', past), VideoCache.make_key('multi-day-video', current)
+    later = time.time() + Config.RECENT_IMAGERY_MAX_AGE
+    monkeypatch.setattr(time, 'time', lambda: later)
+    assert VideoCache.make_key('multi-day-video', past) == keys[0]
+    assert VideoCache.make_key('multi-day-video', current) != keys[1]
+
+def test_render_is_atomic_and_evicts_lru(tmp_path):
+    cache = VideoCache(str(tmp_path), max_bytes=25)
+
+    def write(n):
+        def render(path):
+            with open(path, 'wb') as f:
+                f.write(b'x' * n)
+        return render
+
+    for i, name in enumerate(['a.mp4', 'b.mp4']):
+        cache.render(name, write(10))
+        os.utime(cache.path(name), (i, i))
+    assert cache.lookup('a.mp4')  # Bumps a above b
+
+    cache.render('c.mp4', write(10))
+    assert sorted(os.listdir(tmp_path)) == ['a.mp4', 'c.mp4']
+    assert not cache.lookup('b.mp4')
+
+    with pytest.raises(RuntimeError):
+        def fail(path):
+            write(5)(path)
+            raise RuntimeError("encoder crashed")
+        cache.render('d.mp4', fail)
+    assert sorted(os.listdir(tmp_path)) == ['a.mp4', 'c.mp4']
+    assert cache.stats()['hits'] == 1
+
+def test_render_that_writes_nothing_is_not_published(tmp_path):
+    cache = VideoCache(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        cache.render('empty.mp4', lambda path: None)
+    assert os.listdir(tmp_path) == []
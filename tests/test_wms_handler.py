@@ -1,7 +1,9 @@
+import time
 from datetime import datetime, timedelta
 import numpy as np
 from app.config import Config
 from app.wms_handler import WMSImageFetcher
+from app.raster_cache import RasterCache
 
 def test_image_sequence_fetching():
     fetcher = WMSImageFetcher(Config.WMS_URL, Config.WMS_LAYER)
@@ -13,4 +15,249 @@ def test_image_sequence_fetching():
         interval_minutes=60
     )
     assert len(images) > 0
-    assert all(isinstance(img, np.ndarray) for img in images) 
\ No newline at end of file
+    assert all(isinstance(img, np.ndarray) for img in images) 
+def test_registry_parses_capabilities_once(monkeypatch):
+    from app import wms_handler
+
+    loads = []
+
+    class FakeWMS:
+        def __init__(self, url):
+            loads.append(url)
+
+    monkeypatch.setattr(wms_handler, 'WebMapService', FakeWMS)
+    registry = wms_handler.WMSClientRegistry(ttl=3600)
+
+    fetcher = registry.get_fetcher('http://wms.test', 'layer_a')
+    assert registry.get_fetcher('http://wms.test', 'layer_a') is fetcher
+    assert registry.get_fetcher('http://wms.test', 'layer_b') is not fetcher
+
+    assert fetcher.wms is registry.get_fetcher('http://wms.test', 'layer_b').wms
+    assert loads == ['http://wms.test']
+
+def test_registry_refreshes_stale_capabilities(monkeypatch):
+    from app import wms_handler
+
+    loads = []
+
+    class FakeWMS:
+        def __init__(self, url):
+            loads.append(url)
+
+    monkeypatch.setattr(wms_handler, 'WebMapService', FakeWMS)
+    registry = wms_handler.WMSClientRegistry(ttl=0)
+
+    first = registry.get_client('http://wms.test')
+    # Stale entries are still served while the refresh runs in the background
+    assert registry.get_client('http://wms.test') is first
+    for _ in range(100):
+        if registry.get_client('http://wms.test') is not first:
+            break
+        time.sleep(0.01)
+    assert len(loads) >= 2
+
+class _FakeCapabilities:
+    version = '1.1.1'
+
+    def __init__(self, url):
+        self.url = url
+
+    def getOperationByName(self, name):
+        class Operation:
+            methods = [{'type': 'Get', 'url': 'http://wms.test/wms?'}]
+        return Operation()
+
+class _FakeResponse:
+    def __init__(self, content, content_type='image/png'):
+        self.content = content
+        self.headers = {'Content-Type': content_type}
+        self.text = ''
+
+def _png_bytes(bright_rows, size=(8, 6)):
+    import io
+    from PIL import Image
+    pixels = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    pixels[:bright_rows] = 255
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def test_image_sequence_fetches_concurrently_in_order(monkeypatch, tmp_path):
+    import threading
+    from app import wms_handler
+
+    monkeypatch.setattr(wms_handler, 'WebMapService', _FakeCapabilities)
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_get(url, params=None):
+        with lock:
+            in_flight.append(params['TIME'])
+            peak.append(len(in_flight))
+        # Later days answer first to check results are still returned in order
+        day = int(params['TIME'][-2:])
+        time.sleep(0.05 * (5 - day))
+        with lock:
+            in_flight.remove(params['TIME'])
+        return _FakeResponse(_png_bytes(day))
+
+    monkeypatch.setattr(wms_handler, 'get_with_retry', fake_get)
+    fetcher = wms_handler.WMSClientRegistry().get_fetcher('http://wms.test', 'layer')
+    fetcher.cache = RasterCache(str(tmp_path))
+
+    start = time.monotonic()
+    images = fetcher.get_image_sequence(
+        bbox=(-10, -10, 10, 10),
+        size=(8, 6),
+        time_start=datetime(2024, 1, 1),
+        time_end=datetime(2024, 1, 4),
+        interval_minutes=1440,
+        max_workers=4
+    )
+    elapsed = time.monotonic() - start
+
+    assert len(images) == 4
+    assert max(peak) > 1
+    assert elapsed < 0.4
+    means = [img.mean() for img in images]
+    assert means == sorted(means) and means[0] < means[-1]
+
+def test_cached_image_skips_repeat_fetches(monkeypatch, tmp_path):
+    from app import wms_handler
+
+    monkeypatch.setattr(wms_handler, 'WebMapService', _FakeCapabilities)
+    calls = []
+
+    def fake_get(url, params=None):
+        calls.append(params['TIME'])
+        return _FakeResponse(_png_bytes(2))
+
+    monkeypatch.setattr(wms_handler, 'get_with_retry', fake_get)
+    fetcher = wms_handler.WMSClientRegistry().get_fetcher('http://wms.test', 'layer')
+    fetcher.cache = RasterCache(str(tmp_path))
+
+    for _ in range(2):
+        fetcher.get_image_sequence(
+            bbox=(-10, -10, 10, 10),
+            size=(8, 6),
+            time_start=datetime(2024, 1, 1),
+            time_end=datetime(2024, 1, 2),
+            interval_minutes=1440
+        )
+    assert sorted(calls) == ['2024-01-01', '2024-01-02']
+    assert fetcher.cache.stats()['hits_memory'] == 2
+
+def test_daily_layer_is_fetched_once_per_day(monkeypatch, tmp_path):
+    from app import wms_handler
+
+    class DailyCapabilities(_FakeCapabilities):
+        class _Layer:
+            timepositions = ['2000-02-24/2024-05-01/P1D']
+
+        contents = {'layer': _Layer()}
+
+    monkeypatch.setattr(wms_handler, 'WebMapService', DailyCapabilities)
+    calls = []
+
+    def fake_get(url, params=None):
+        calls.append(params['TIME'])
+        return _FakeResponse(_png_bytes(2))
+
+    monkeypatch.setattr(wms_handler, 'get_with_retry', fake_get)
+    fetcher = wms_handler.WMSClientRegistry().get_fetcher('http://wms.test', 'layer')
+    fetcher.cache = RasterCache(str(tmp_path))
+
+    images = fetcher.get_image_sequence(
+        bbox=(-10, -10, 10, 10),
+        size=(8, 6),
+        time_start=datetime(2024, 1, 1),
+        time_end=datetime(2024, 1, 1, 23, 59),
+        interval_minutes=60
+    )
+    assert len(images) == 24
+    assert calls == ['2024-01-01']
+
+def test_multi_day_video_streams_days(monkeypatch, tmp_path):
+    from app import wms_handler
+
+    monkeypatch.setattr(wms_handler, 'WebMapService', _FakeCapabilities)
+    monkeypatch.setattr(wms_handler, 'get_with_retry',
+                        lambda url, params=None: _FakeResponse(_png_bytes(int(params['TIME'][-1]))))
+    fetcher = wms_handler.WMSClientRegistry().get_fetcher('http://wms.test', 'layer')
+    fetcher.cache = RasterCache(str(tmp_path))
+    fetcher.default_interval = 1440
+
+    frames = fetcher.get_multi_day_video(
+        bbox=(-10, -10, 10, 10),
+        size=(8, 6),
+        start_date='2024-01-01',
+        end_date='2024-01-03',
+        fps=43200
+    )
+    # Three daily images with one blended frame in each gap
+    assert len(frames) == 3 + 2 * 1
+    assert all(frame.dtype == np.uint8 for frame in frames)
+
+def _daily_fetcher(monkeypatch, tmp_path, fail_day=None):
+    from app import wms_handler
+
+    def fake_get(url, params=None):
+        if params['TIME'] == fail_day:
+            raise RuntimeError("503 Server Error")
+        # Later days are brighter, so order is visible in the images
+        return _FakeResponse(_png_bytes(int(params['TIME'][-1])))
+
+    monkeypatch.setattr(wms_handler, 'WebMapService', _FakeCapabilities)
+    monkeypatch.setattr(wms_handler, 'get_with_retry', fake_get)
+    fetcher = wms_handler.WMSClientRegistry().get_fetcher('http://wms.test', 'layer')
+    fetcher.cache = RasterCache(str(tmp_path))
+    fetcher.default_interval = 1440
+    return fetcher
+
+def test_days_are_fetched_in_parallel_and_failures_reported(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, 'ENHANCE_PROCESSES', 0)
+    fetcher = _daily_fetcher(monkeypatch, tmp_path, fail_day='2024-01-03')
+    failed = []
+    progress = []
+
+    days = list(fetcher.iter_days(
+        (-10, -10, 10, 10), (8, 6), datetime(2024, 1, 1), datetime(2024, 1, 5), max_days=3,
+        on_day_failed=lambda day, error: failed.append(day), progress_callback=progress.append
+    ))
+    assert [len(images) for images in days] == [1, 1, 1, 1]
+    means = [images[0].mean() for images in days]
+    assert means == sorted(means)
+    assert failed == ['2024-01-03']
+    assert progress == [20, 40, 60, 80, 100]
+
+def test_all_days_failing_is_an_error(monkeypatch, tmp_path):
+    import pytest
+    monkeypatch.setattr(Config, 'ENHANCE_PROCESSES', 0)
+    fetcher = _daily_fetcher(monkeypatch, tmp_path, fail_day='2024-01-01')
+    with pytest.raises(RuntimeError, match="All 1 days failed"):
+        list(fetcher.iter_days((-10, -10, 10, 10), (8, 6), datetime(2024, 1, 1), datetime(2024, 1, 1)))
+
+def test_days_are_enhanced_in_worker_processes(monkeypatch, tmp_path):
+    from app import wms_handler
+    monkeypatch.setattr(Config, 'ENHANCE_PROCESSES', 1)
+    monkeypatch.setattr(wms_handler, '_enhance_pool', None)
+    fetcher = _daily_fetcher(monkeypatch, tmp_path)
+    try:
+        days = list(fetcher.iter_days((-10, -10, 10, 10), (8, 6), datetime(2024, 1, 1), datetime(2024, 1, 2)))
+        assert wms_handler._enhance_pool is not None
+    finally:
+        if wms_handler._enhance_pool is not None:
+            wms_handler._enhance_pool.shutdown()
+    expected = wms_handler.decode_and_enhance([_png_bytes(1)])[0]
+    assert np.array_equal(days[0][0], expected)
+
+def test_enhance_workers_do_not_build_the_app(monkeypatch):
+    import os
+    import runpy
+    import pytest
+    import app as app_package
+    # Spawned workers import the parent's main script as __mp_main__
+    monkeypatch.setattr(app_package, 'create_app', lambda *args: pytest.fail("app built in a worker"))
+    run_py = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'run.py')
+    assert 'app' not in runpy.run_path(run_py, run_name='__mp_main__')